@@ -0,0 +1,329 @@
+import asyncio
+import copy
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+from crawl_logger import close_loggers
+from fetcher import FetchResult, archive_page, archived_page, breakers, is_replaying, timeouts
+from id_discovery import IdIndex
+from job_state import JobStateStore
+from output_writer import JsonlWriter
+from resilience import backoff_delays, host_of, is_transient, retries_total, retry_after_seconds
+from recipeDbParser_v0 import (
+    build_recipe_record,
+    check_recipe_page,
+    click_show_more_button,
+    driver_pool,
+    extract_source_page,
+    extract_source_with_browser,
+    extract_tables,
+    ids_pending,
+    log_recipe_outcome,
+    recipe_stage_seconds,
+    recipe_url,
+    recipes_in_flight,
+    record_recipe_result,
+    source_cache,
+    source_stage_seconds,
+)
+from source_cache import normalize_source_url
+from source_extractor import empty_source_data
+
+RECIPEDB_HOST = 'cosylab.iiitd.edu.in'
+
+
+class HostLimiter:
+    """Caps concurrent requests to one host and spaces them out to at most `rate` per second."""
+
+    def __init__(self, concurrency, rate=None):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.min_interval = 1.0 / rate if rate else 0.0
+        self._next_slot = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        if self.min_interval:
+            # Reserve the next free start time before sleeping so waiters queue up in order
+            now = asyncio.get_running_loop().time()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.min_interval
+            if delay > 0:
+                await asyncio.sleep(delay)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.semaphore.release()
+
+
+class _InFlightSource:
+    def __init__(self):
+        self.done = asyncio.Event()
+        self.data = None
+        self.error = None
+
+
+class AsyncCrawler:
+    """Crawls RecipeDB IDs on one event loop with a shared, connection-pooled HTTP client.
+
+    `host_limits` maps a hostname to `(concurrency, requests_per_second)`; hosts not listed
+    get `default_host_limit`. Only the "Show More" step and source pages that need
+    JavaScript are sent to a small thread pool sized to the driver pool.
+    """
+
+    def __init__(self, log_file, source_log_file, max_in_flight=200, host_limits=None,
+                 default_host_limit=(4, 2.0), browser_workers=None, timeout=30):
+        self.log_file = log_file
+        self.source_log_file = source_log_file
+        self.max_in_flight = max_in_flight
+        self.host_limits = {RECIPEDB_HOST: (16, 8.0)}
+        self.host_limits.update(host_limits or {})
+        self.default_host_limit = default_host_limit
+        self.browser_workers = browser_workers or driver_pool.size
+        self.timeout = timeout
+
+        self._limiters = {}
+        self._source_in_flight = {}
+        self._session = None
+        self._browser_executor = None
+
+    def _limiter_for(self, url):
+        host = host_of(url)
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            concurrency, rate = self.host_limits.get(host, self.default_host_limit)
+            limiter = HostLimiter(concurrency, rate)
+            self._limiters[host] = limiter
+        return limiter
+
+    async def fetch(self, url, retries=2, wait_if_open=False):
+        """Download a URL through the shared session, retrying transient failures. Errors are captured in the result.
+
+        Shares the per-host adaptive timeouts and circuit breakers of `fetcher.fetch_page`.
+        """
+        if is_replaying():
+            return archived_page(url)
+
+        delays = backoff_delays(retries)
+        while True:
+            wait = breakers.wait_time(url)
+            if wait:
+                if not wait_if_open:
+                    return FetchResult(url, 0, "", f"Circuit open for {host_of(url)}")
+                await asyncio.sleep(wait)
+                continue
+
+            page, retry_after = await self._fetch_once(url)
+            if not is_transient(page):
+                breakers.record_success(url)
+                break
+            breakers.record_failure(url, retry_after)
+            delay = next(delays, None)
+            if delay is None:
+                break
+            retries_total.inc(host=host_of(url))
+            await asyncio.sleep(max(delay, min(retry_after or 0.0, 30.0)))
+
+        if not is_transient(page):
+            await asyncio.to_thread(archive_page, page)
+        return page
+
+    async def _fetch_once(self, url):
+        timeout = min(timeouts.timeout_for(url), self.timeout)
+        try:
+            async with self._limiter_for(url):
+                # Timed inside the limiter so queueing for a slot doesn't count as host latency
+                start = asyncio.get_running_loop().time()
+                async with self._session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                    text = await response.text(errors='replace')
+                    page = FetchResult(url, response.status, text, None, dict(response.headers))
+                    retry_after = retry_after_seconds(response.headers)
+                timeouts.observe(url, asyncio.get_running_loop().time() - start)
+        except asyncio.TimeoutError as e:
+            timeouts.observe(url, timeout)
+            return FetchResult(url, 0, "", f"Timed out after {timeout:.1f}s: {e}"), None
+        except Exception as e:
+            return FetchResult(url, 0, "", str(e)), None
+        return page, retry_after
+
+    async def run_in_browser(self, func, *args):
+        """Run a blocking Selenium stage on the small browser executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._browser_executor, func, *args)
+
+    async def extract_source(self, source_url):
+        """Return the source data, sharing one extraction between recipes with the same source URL."""
+        key = normalize_source_url(source_url)
+        found, data = source_cache.get(key)
+        if found:
+            return data
+
+        in_flight = self._source_in_flight.get(key)
+        if in_flight is not None:
+            await in_flight.done.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return copy.deepcopy(in_flight.data)
+
+        in_flight = _InFlightSource()
+        self._source_in_flight[key] = in_flight
+        try:
+            data, cacheable = await self._fetch_and_extract_source(source_url)
+            in_flight.data = data
+            if cacheable:
+                source_cache.put(key, data)
+            return copy.deepcopy(data)
+        except Exception as e:
+            in_flight.error = e
+            raise
+        finally:
+            del self._source_in_flight[key]
+            in_flight.done.set()
+
+    async def _fetch_and_extract_source(self, source_url):
+        if not source_url.strip():
+            return empty_source_data(), True
+
+        latencies = {}
+        with source_stage_seconds.time(latencies, stage='fetch'):
+            page = await self.fetch(source_url)
+        # Parsing is CPU work, so the shared extraction runs off the event loop
+        return await asyncio.to_thread(extract_source_page, source_url, page, self.source_log_file, latencies,
+                                       self._render_source)
+
+    def _render_source(self, source_url, page):
+        # Called from a worker thread; the browser itself is still only driven from the browser executor
+        return self._browser_executor.submit(extract_source_with_browser, source_url, page).result()
+
+    async def process_id(self, i):
+        recipes_in_flight.inc()
+        try:
+            return await self._process_id(i)
+        finally:
+            recipes_in_flight.dec()
+
+    async def _process_id(self, i):
+        url = recipe_url(i)
+        latencies = {}
+        with recipe_stage_seconds.time(latencies, stage='fetch'):
+            page = await self.fetch(url, wait_if_open=True)
+        if not check_recipe_page(url, i, page, self.log_file, latencies):
+            return None
+
+        # The stages of process_url, with the blocking ones moved off the event loop
+        try:
+            # Table parsing is CPU work, keep it off the event loop
+            with recipe_stage_seconds.time(latencies, stage='tables'):
+                nutritional_profile, ingredients = await asyncio.to_thread(extract_tables, url, page)
+
+            with recipe_stage_seconds.time(latencies, stage='show_more'):
+                detailed_data = await self.run_in_browser(click_show_more_button, url, page)
+
+            with recipe_stage_seconds.time(latencies, stage='source'):
+                servings_data = await self.extract_source(detailed_data["Source Info"])
+        except Exception as e:
+            log_recipe_outcome(url, i, page, self.log_file, latencies, e)
+            raise
+
+        log_recipe_outcome(url, i, page, self.log_file, latencies)
+        return build_recipe_record(nutritional_profile, ingredients, detailed_data, servings_data)
+
+    async def crawl(self, ids, on_result, on_error=None):
+        """Process `ids` with at most `max_in_flight` recipes in progress at once.
+
+        `on_result(i, result)` is called for every processed ID, with None for missing
+        recipes, and `on_error(i, exception)` for IDs that failed. An exception from
+        `on_result`, such as the output writer failing, isn't the ID's fault: it stops
+        the crawl and is raised once the workers have wound down.
+        """
+        id_queue = asyncio.Queue(maxsize=self.max_in_flight)
+        ids_pending.set_function(id_queue.qsize)
+        fatal = []
+
+        async def worker():
+            while True:
+                i = await id_queue.get()
+                try:
+                    if i is None:
+                        return
+                    if fatal:
+                        # Drain what is already queued without processing it
+                        continue
+                    try:
+                        result = await self.process_id(i)
+                    except Exception as e:
+                        print(f"Error processing ID {i}: {e}")
+                        if on_error is not None:
+                            on_error(i, e)
+                        continue
+                    on_result(i, result)
+                except Exception as e:
+                    print(f"Stopping the crawl: {e}")
+                    fatal.append(e)
+                finally:
+                    id_queue.task_done()
+
+        # Limiters and in-flight markers hold asyncio primitives, so each event loop gets fresh ones
+        self._limiters = {}
+        self._source_in_flight = {}
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        self._browser_executor = ThreadPoolExecutor(max_workers=self.browser_workers)
+        try:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                self._session = session
+                workers = [asyncio.create_task(worker()) for _ in range(self.max_in_flight)]
+                # The bounded queue makes this loop wait instead of materialising every ID up front
+                for i in ids:
+                    if fatal:
+                        break
+                    await id_queue.put(i)
+                for _ in workers:
+                    await id_queue.put(None)
+                await asyncio.gather(*workers)
+        finally:
+            self._session = None
+            self._browser_executor.shutdown(wait=True)
+        if fatal:
+            raise fatal[0]
+
+
+# Function to crawl a range of IDs with the asyncio engine, streaming results to JSONL output
+def handle_multiple_urls_async(start, end, output_file_prefix, log_file, source_log_file, max_in_flight=200,
+                               state_file='crawl_state.db', rotate_records=10000, compression=None,
+                               id_index_file=None):
+    crawler = AsyncCrawler(log_file, source_log_file, max_in_flight=max_in_flight)
+    job_state = JobStateStore(state_file)
+    id_index = IdIndex(id_index_file) if id_index_file else None
+    writer = JsonlWriter(output_file_prefix, rotate_records=rotate_records, compression=compression)
+
+    def on_result(i, result):
+        record_recipe_result(i, result, job_state, writer)
+
+    try:
+        ids = job_state.ids_to_process(start, end)
+        if id_index is not None:
+            # Only scrape IDs the discovery stage found to exist
+            live_ids = set(id_index.live_ids(start, end))
+            ids = [i for i in ids if i in live_ids]
+
+        while ids:
+            asyncio.run(crawler.crawl(ids, on_result, job_state.mark_failed))
+            # Retry failed IDs until they run out of attempts
+            ids = job_state.retryable_failures(start, end)
+
+        print(f"Finished IDs {start}-{end}, {writer.records_written} recipes written")
+        print(f"Source cache stats: {source_cache.stats()}")
+        print(f"Crawl state: {job_state.summary()}")
+    finally:
+        writer.close()
+        # Shut down the idle browsers once the crawl is finished
+        driver_pool.close()
+        job_state.close()
+        if id_index is not None:
+            id_index.close()
+        close_loggers()
+
+
+if __name__ == '__main__':
+    handle_multiple_urls_async(5000, 200000, 'output', 'url_log.csv', 'source_log.csv')
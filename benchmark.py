@@ -0,0 +1,358 @@
+import argparse
+import csv
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import recipeDbParser_v0 as parser_module
+from crawl_logger import close_loggers
+from driver_pool import BLOCKED_URL_PATTERNS, BROWSER_PROFILES, create_headless_driver
+from fetcher import breakers, timeouts, use_archive
+from fixture_server import SOURCE_PATH, THIRD_PARTY_PATH, FixtureServer
+from source_cache import SourceCache
+
+SCENARIOS = ('process_url', 'handle_multiple_urls', 'browser')
+
+
+# Function to return the nearest-rank percentile of a list of numbers
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100.0 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+# Function to summarize per-stage latencies as p50/p99 in seconds
+def stage_summary(latency_dicts):
+    by_stage = {}
+    for latencies in latency_dicts:
+        for stage, seconds in latencies.items():
+            by_stage.setdefault(stage, []).append(seconds)
+    return {stage: {"p50": percentile(values, 50), "p99": percentile(values, 99), "count": len(values)}
+            for stage, values in sorted(by_stage.items())}
+
+
+class PeakRssSampler:
+    """Samples the resident memory of this process and its children (the browsers) in the background.
+
+    Uses psutil when it is installed; otherwise falls back to this process's own
+    peak from `resource`, which does not include the browsers.
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+        try:
+            import psutil
+            self._process = psutil.Process()
+        except ImportError:
+            self._process = None
+
+    def _sample(self):
+        if self._process is None:
+            import resource
+            # ru_maxrss is in kilobytes on Linux
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        total = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except Exception:
+                # The child exited between listing and sampling
+                pass
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self._sample())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self._sample())
+
+
+def _reset_crawler_state(server):
+    # Every run starts cold: no archive, an empty source cache, no learned timeouts and no idle browsers
+    use_archive(None)
+    breakers.reset()
+    timeouts.reset()
+    parser_module.navigation_timeouts.reset()
+    parser_module.show_more_timeouts.reset()
+    parser_module.set_recipedb_url(server.recipe_url_prefix)
+    parser_module.source_cache = SourceCache(max_entries=10000)
+    parser_module.driver_pool.close()
+
+
+# Function to time process_url over the fixture recipes that exist
+def bench_process_url(server, ids, workers, workdir):
+    _reset_crawler_state(server)
+    source_log_file = os.path.join(workdir, 'source_log.csv')
+    urls = [parser_module.recipe_url(i) for i in ids if not server.is_missing(i)]
+    latency_dicts = []
+    failures = 0
+
+    def run(url):
+        latencies = {}
+        start = time.perf_counter()
+        try:
+            parser_module.process_url(url, source_log_file, latencies=latencies)
+        except Exception as e:
+            print(f"process_url failed for {url}: {e}")
+            return None
+        latencies["total"] = time.perf_counter() - start
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for latencies in executor.map(run, urls):
+            if latencies is None:
+                failures += 1
+            else:
+                latency_dicts.append(latencies)
+    elapsed = time.perf_counter() - start
+    parser_module.driver_pool.close()
+    close_loggers()
+
+    return {
+        "recipes": len(latency_dicts),
+        "failures": failures,
+        "seconds": elapsed,
+        "recipes_per_second": len(latency_dicts) / elapsed if elapsed else 0.0,
+        "stages": stage_summary(latency_dicts),
+    }
+
+
+# Function to time a full handle_multiple_urls run against the fixture server
+def bench_handle_multiple_urls(server, ids, workers, workdir):
+    _reset_crawler_state(server)
+    log_file = os.path.join(workdir, 'url_log.csv')
+    start = time.perf_counter()
+    parser_module.handle_multiple_urls(ids[0], ids[-1], os.path.join(workdir, 'output'), log_file,
+                                       os.path.join(workdir, 'source_log.csv'),
+                                       state_file=os.path.join(workdir, 'crawl_state.db'), workers=workers)
+    elapsed = time.perf_counter() - start
+
+    # handle_multiple_urls closes the loggers, so the per-stage timings are all in the log by now
+    latency_dicts = []
+    failures = 0
+    with open(log_file, newline='') as file:
+        for row in csv.DictReader(file):
+            if row["Failure Reason"] and row["HTTP Status"] != '404':
+                failures += 1
+            elif row["Exists"] == 'True' and row["Latencies (s)"]:
+                latency_dicts.append(json.loads(row["Latencies (s)"]))
+
+    return {
+        "recipes": len(latency_dicts),
+        "failures": failures,
+        "seconds": elapsed,
+        "recipes_per_second": len(latency_dicts) / elapsed if elapsed else 0.0,
+        "stages": stage_summary(latency_dicts),
+    }
+
+
+# Function to measure the resident memory of a driver's chromedriver and browser processes, or None without psutil
+def driver_rss_bytes(driver):
+    try:
+        import psutil
+    except ImportError:
+        return None
+    root = psutil.Process(driver.service.process.pid)
+    total = 0
+    for process in [root] + root.children(recursive=True):
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            # The process exited between listing and sampling
+            pass
+    return total
+
+
+# Function to time recipe and source page loads in a single driver started with a browser profile
+def bench_browser(server, ids, profile, workdir):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    # The fixture's third-party scripts are served from the same host, so block them by path too
+    driver = create_headless_driver(profile, BLOCKED_URL_PATTERNS + [f'*{THIRD_PARTY_PATH}*'])
+    pages = [(i, stage, url, locator) for i in ids if not server.is_missing(i) for stage, url, locator in
+             (('recipe_page', parser_module.recipe_url(i), (By.ID, 'myBtn')),
+              ('source_page', f'{server.url}{SOURCE_PATH}{i}', (By.ID, 'mntl-recipe-details_1-0')))]
+    latency_dicts = {}
+    failures = 0
+    peak_rss = 0
+    start = time.perf_counter()
+    try:
+        for i, stage, url, locator in pages:
+            page_start = time.perf_counter()
+            try:
+                driver.get(url)
+                WebDriverWait(driver, 30).until(EC.presence_of_element_located(locator))
+            except Exception as e:
+                print(f"Loading {url} failed: {e}")
+                failures += 1
+                continue
+            latency_dicts.setdefault(i, {})[stage] = time.perf_counter() - page_start
+            peak_rss = max(peak_rss, driver_rss_bytes(driver) or 0)
+    finally:
+        driver.quit()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "recipes": len(latency_dicts),
+        "failures": failures,
+        "seconds": elapsed,
+        "recipes_per_second": len(latency_dicts) / elapsed if elapsed else 0.0,
+        "stages": stage_summary(latency_dicts.values()),
+        "driver_rss_mb": peak_rss / (1024 * 1024) if peak_rss else None,
+    }
+
+
+# Function to print how the lean browser profile compares with the standard one
+def compare_profiles(results):
+    by_profile = {result["key"]["profile"]: result for result in results if result["key"]["scenario"] == 'browser'}
+    standard, lean = by_profile.get('standard'), by_profile.get('lean')
+    if standard is None or lean is None:
+        return
+    print("Lean vs standard browser profile:")
+    for stage, summary in lean["stages"].items():
+        baseline = standard["stages"].get(stage)
+        if baseline and summary["p50"]:
+            print(f"  {stage}: p50 {baseline['p50']:.3f}s -> {summary['p50']:.3f}s "
+                  f"({baseline['p50'] / summary['p50']:.1f}x faster)")
+    if standard.get("driver_rss_mb") and lean.get("driver_rss_mb"):
+        print(f"  RSS per driver: {standard['driver_rss_mb']:.0f} MB -> {lean['driver_rss_mb']:.0f} MB "
+              f"({standard['driver_rss_mb'] / lean['driver_rss_mb']:.1f}x as many drivers per GB)")
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _last_result(results_file, key):
+    """Return the most recent saved result with the same scenario and settings, or None."""
+    if not os.path.exists(results_file):
+        return None
+    previous = None
+    with open(results_file) as file:
+        for line in file:
+            if line.strip():
+                result = json.loads(line)
+                if result.get("key") == key:
+                    previous = result
+    return previous
+
+
+# Function to print how a result compares with the previous run and flag regressions
+def compare_results(previous, current, threshold=0.2):
+    if previous is None:
+        print("  no previous run to compare with")
+        return []
+
+    def change(old, new):
+        return (new - old) / old if old else 0.0
+
+    regressions = []
+    checks = [("recipes/s", previous["recipes_per_second"], current["recipes_per_second"], -1),
+              ("peak RSS", previous["peak_rss_mb"], current["peak_rss_mb"], 1)]
+    for stage, summary in current["stages"].items():
+        old = previous["stages"].get(stage)
+        if old and old.get("p99") is not None and summary["p99"] is not None:
+            checks.append((f"{stage} p99", old["p99"], summary["p99"], 1))
+
+    for name, old, new, worse_direction in checks:
+        delta = change(old, new)
+        flag = " REGRESSION" if delta * worse_direction > threshold else ""
+        print(f"  {name}: {old:.4g} -> {new:.4g} ({delta:+.1%}){flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def run_benchmarks(scenarios=SCENARIOS, worker_counts=(1, 4, 8), recipe_count=50, start_id=5000, latency=0.05,
+                   jitter=0.02, error_rate=0.0, missing_rate=0.1, results_file='benchmark_results.jsonl',
+                   threshold=0.2, asset_latency=0.02):
+    """Run every scenario at every worker count against a local fixture server and save the results.
+
+    The browser scenario runs once per browser profile instead of per worker count.
+    Each result is appended to `results_file` as one JSON line and compared with the
+    previous result for the same scenario and settings; changes for the worse larger
+    than `threshold` are reported as regressions. Returns the new results.
+    """
+    ids = list(range(start_id, start_id + recipe_count))
+    revision = _git_revision()
+    results = []
+    with FixtureServer(latency, jitter, error_rate, missing_rate, asset_latency=asset_latency) as server:
+        for scenario in scenarios:
+            bench = {'process_url': bench_process_url, 'handle_multiple_urls': bench_handle_multiple_urls,
+                     'browser': bench_browser}[scenario]
+            variant = 'profile' if scenario == 'browser' else 'workers'
+            for value in (BROWSER_PROFILES if scenario == 'browser' else worker_counts):
+                key = {"scenario": scenario, variant: value, "recipes": recipe_count, "latency": latency,
+                       "jitter": jitter, "error_rate": error_rate, "missing_rate": missing_rate,
+                       "asset_latency": asset_latency}
+                print(f"Running {scenario} with {variant} {value}...")
+                with tempfile.TemporaryDirectory() as workdir, PeakRssSampler() as sampler:
+                    measured = bench(server, ids, value, workdir)
+
+                result = {
+                    "key": key,
+                    "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    "git_revision": revision,
+                    "peak_rss_mb": sampler.peak_bytes / (1024 * 1024),
+                    **measured,
+                }
+                print(f"  {result['recipes']} recipes in {result['seconds']:.1f}s "
+                      f"({result['recipes_per_second']:.2f}/s), {result['failures']} failed, "
+                      f"peak RSS {result['peak_rss_mb']:.0f} MB")
+                for stage, summary in result["stages"].items():
+                    print(f"  {stage}: p50 {summary['p50']:.3f}s, p99 {summary['p99']:.3f}s")
+                result["regressions"] = compare_results(_last_result(results_file, key), result, threshold)
+
+                with open(results_file, 'a') as file:
+                    file.write(json.dumps(result) + '\n')
+                results.append(result)
+    compare_profiles(results)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the scraper offline against a local fixture server.")
+    parser.add_argument('--scenario', choices=SCENARIOS + ('all',), default='all')
+    parser.add_argument('--workers', default='1,4,8', help="comma-separated worker counts")
+    parser.add_argument('--recipes', type=int, default=50, help="recipe IDs per run")
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.02, help="up to this many extra seconds per response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument('--missing-rate', type=float, default=0.1, help="fraction of recipe IDs that return 404")
+    parser.add_argument('--asset-latency', type=float, default=0.02,
+                        help="seconds added to every image, font, media and third-party script")
+    parser.add_argument('--results', default='benchmark_results.jsonl')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="relative change for the worse that counts as a regression")
+    args = parser.parse_args()
+
+    run_benchmarks(SCENARIOS if args.scenario == 'all' else (args.scenario,),
+                   tuple(int(count) for count in args.workers.split(',')), args.recipes,
+                   latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                   missing_rate=args.missing_rate, results_file=args.results, threshold=args.threshold,
+                   asset_latency=args.asset_latency)
@@ -0,0 +1,211 @@
+import argparse
+import os
+import time
+
+import metrics
+
+MODES = ('thread', 'async', 'pipeline', 'replay', 'discover', 'coordinator', 'worker', 'merge', 'refresh')
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Scrape RecipeDB recipes and their source pages.")
+    parser.add_argument('--mode', choices=MODES, default='thread',
+                        help="thread: thread-pool crawl; async: asyncio crawl; pipeline: staged crawl with "
+                             "CPU-bound parsing in a process pool; replay: re-parse the HTML "
+                             "archive offline; discover: index which recipe IDs exist; coordinator: queue the "
+                             "ID range for workers on any number of nodes; worker: crawl chunks claimed from "
+                             "the queue; merge: combine worker shards, dropping duplicate recipes; refresh: "
+                             "re-extract only recipes whose pages changed since the last refresh")
+    # Older invocations used a bare --replay flag
+    parser.add_argument('--replay', dest='mode', action='store_const', const='replay', help=argparse.SUPPRESS)
+    parser.add_argument('--start', type=int, default=5000, help="first recipe ID")
+    parser.add_argument('--end', type=int, default=200000, help="last recipe ID (inclusive)")
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help="worker threads (thread, replay, discover), recipes in flight (async) or fetch "
+                             "threads (pipeline)")
+    parser.add_argument('--cpu-workers', type=int, default=None,
+                        help="pipeline: parsing processes (default: one per core)")
+    parser.add_argument('--output', default=None,
+                        help="output file prefix (default: 'output', or 'replay' in replay mode)")
+    parser.add_argument('--compression', choices=('gzip', 'zstd'), default=None)
+    parser.add_argument('--rotate-records', type=int, default=10000, help="records per output part")
+    parser.add_argument('--log-file', default='url_log.csv')
+    parser.add_argument('--source-log-file', default='source_log.csv')
+    parser.add_argument('--state-file', default='crawl_state.db')
+    parser.add_argument('--archive-dir', default='html_archive')
+    parser.add_argument('--source-cache', default='source_cache.db',
+                        help="SQLite file keeping source page extractions between crawls ('' keeps them in memory "
+                             "only; replay never uses it)")
+    parser.add_argument('--no-archive', action='store_true', help="don't archive fetched pages while crawling")
+    parser.add_argument('--id-index', default=None,
+                        help="ID index from discover mode; crawls then only visit IDs known to exist")
+    parser.add_argument('--browser-profile', choices=('standard', 'lean'), default='standard',
+                        help="lean: eager page loads, no images/media/fonts/ad hosts and low-memory Chrome flags")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="serve Prometheus-style metrics at http://127.0.0.1:<port>/metrics")
+    parser.add_argument('--metrics-interval', type=float, default=60.0,
+                        help="seconds between printed metrics summaries (0 disables them)")
+    discovery = parser.add_argument_group('ID discovery (discover mode)')
+    discovery.add_argument('--probe-method', choices=('head', 'get'), default='head',
+                           help="how IDs are probed: HEAD requests, or streamed GETs for servers that mishandle HEAD")
+    discovery.add_argument('--max-stride', type=positive_int, default=16,
+                           help="largest jump through runs of missing IDs; IDs jumped over are never indexed, so "
+                                "use 1 to probe every ID")
+    refresh = parser.add_argument_group('incremental refreshes (refresh mode)')
+    refresh.add_argument('--recrawl-state', default='recrawl_state.db',
+                         help="page validators and content hashes kept between refreshes")
+    refresh.add_argument('--change-report', default='change_report.json',
+                         help="where to write the new, modified and removed recipe IDs")
+    sharding = parser.add_argument_group('sharded crawls (coordinator, worker and merge modes)')
+    sharding.add_argument('--queue', default='work_queue.db',
+                          help="work queue: a SQLite file, or the coordinator's http://host:port for workers")
+    sharding.add_argument('--queue-port', type=int, default=None,
+                          help="coordinator: serve the queue on this port to workers on other machines")
+    sharding.add_argument('--chunk-size', type=int, default=1000, help="recipe IDs per queued chunk")
+    sharding.add_argument('--lease-seconds', type=float, default=300.0,
+                          help="chunks not heartbeated for this long go back to the queue")
+    sharding.add_argument('--worker-id', default=None, help="worker name (default: <hostname>-<pid>)")
+    sharding.add_argument('--engine', choices=('thread', 'async', 'pipeline'), default='thread', help="worker crawl engine")
+    sharding.add_argument('--shard-dir', default='shards', help="where workers write and merge reads their outputs")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    start_time = time.time()
+
+    if args.metrics_port is not None:
+        metrics.start_http_server(args.metrics_port)
+    reporter = metrics.SummaryReporter(args.metrics_interval).start() if args.metrics_interval > 0 else None
+    try:
+        run_mode(args)
+    finally:
+        if reporter is not None:
+            reporter.stop()
+    print(f"Finished {args.mode} run in {time.time() - start_time:.1f} seconds")
+
+
+def run_mode(args):
+    # Crawler modules are imported per mode so a replay or discovery run never loads what it doesn't use
+    if args.mode == 'discover':
+        from id_discovery import IdIndex, discover_ids
+        from recipeDbParser_v0 import recipe_url
+
+        id_index = IdIndex(args.id_index or 'id_index.db')
+        try:
+            total = discover_ids(args.start, args.end, recipe_url, id_index, workers=args.concurrency or 16,
+                                 method=args.probe_method, max_stride=args.max_stride)
+            print(f"{total} live recipe IDs indexed")
+        finally:
+            id_index.close()
+
+    elif args.mode == 'replay':
+        from recipeDbParser_v0 import replay_archive
+
+        configure_browsers(args)
+        replay_archive(args.archive_dir, args.output or 'replay', args.log_file, args.source_log_file,
+                       workers=args.concurrency, compression=args.compression)
+
+    elif args.mode in ('coordinator', 'merge'):
+        from sharded_crawl import merge_shards, shard_paths, wait_for_queue
+
+        if args.mode == 'coordinator':
+            from work_queue import WorkQueue, serve_queue
+
+            queue = WorkQueue(args.queue, lease_seconds=args.lease_seconds)
+            try:
+                queue.add_range(args.start, args.end, args.chunk_size)
+                if args.queue_port is not None:
+                    serve_queue(queue, args.queue_port)
+                wait_for_queue(queue)
+            finally:
+                queue.close()
+
+        paths = shard_paths(args.shard_dir)
+        if paths:
+            merge_shards(paths, args.output or 'merged', args.rotate_records, args.compression)
+        else:
+            # Workers on other machines write their shards locally; copy them here and run merge mode
+            print(f"No shard outputs in {args.shard_dir} to merge")
+
+    else:
+        from fetcher import use_archive
+        from html_archive import HtmlArchive
+
+        configure_browsers(args)
+        configure_source_cache(args)
+        if not args.no_archive:
+            # Archive every fetched page so later parser changes can be replayed offline
+            use_archive(HtmlArchive(args.archive_dir))
+        options = dict(state_file=args.state_file, rotate_records=args.rotate_records,
+                       compression=args.compression, id_index_file=args.id_index)
+        if args.mode == 'refresh':
+            from recrawl import refresh_range
+
+            refresh_range(args.start, args.end, args.output or 'changes', args.log_file, args.source_log_file,
+                          args.recrawl_state, args.change_report, args.rotate_records, args.compression,
+                          args.id_index, workers=args.concurrency or 40)
+            return
+
+        engine = args.engine if args.mode == 'worker' else args.mode
+        if engine == 'async':
+            from async_crawler import handle_multiple_urls_async
+
+            def crawl_range(start, end, output):
+                handle_multiple_urls_async(start, end, output, args.log_file, args.source_log_file,
+                                           max_in_flight=args.concurrency or 200, **options)
+        elif engine == 'pipeline':
+            from pipeline import handle_multiple_urls_pipeline
+
+            def crawl_range(start, end, output):
+                handle_multiple_urls_pipeline(start, end, output, args.log_file, args.source_log_file,
+                                              fetch_workers=args.concurrency or 32, cpu_workers=args.cpu_workers,
+                                              **options)
+        else:
+            from recipeDbParser_v0 import handle_multiple_urls
+
+            def crawl_range(start, end, output):
+                handle_multiple_urls(start, end, output, args.log_file, args.source_log_file,
+                                     workers=args.concurrency or 40, **options)
+
+        if args.mode == 'worker':
+            from sharded_crawl import default_worker_id, run_worker
+            from work_queue import open_queue
+
+            worker_id = args.worker_id or default_worker_id()
+            # Each worker writes its own shard; merge mode drops recipes crawled twice after a lease expired
+            os.makedirs(args.shard_dir, exist_ok=True)
+            output = os.path.join(args.shard_dir, f'{worker_id}_output')
+            queue = open_queue(args.queue, lease_seconds=args.lease_seconds)
+            try:
+                run_worker(queue, lambda start, end: crawl_range(start, end, output), worker_id,
+                           heartbeat_interval=args.lease_seconds / 3)
+            finally:
+                queue.close()
+        else:
+            crawl_range(args.start, args.end, args.output or 'output')
+
+
+def configure_browsers(args):
+    if args.browser_profile != 'standard':
+        from recipeDbParser_v0 import driver_pool
+
+        driver_pool.use_profile(args.browser_profile)
+
+
+def configure_source_cache(args):
+    if args.source_cache:
+        from recipeDbParser_v0 import source_cache
+
+        source_cache.use_disk(args.source_cache)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import glob
+import os
+import shutil
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from json_stream import iter_output_records
+from recipe_parsers import NUTRIENT_PROFILES, parse_quantity, split_nutrient_key, to_float, to_int
+
+RECIPE_SCHEMA = pa.schema([
+    ("recipe_id", pa.int64()),
+    ("title", pa.string()),
+    ("continent", pa.string()),
+    ("region", pa.string()),
+    ("country", pa.string()),
+    ("states", pa.list_(pa.string())),
+    ("dietary_details", pa.string()),
+    ("source_url", pa.string()),
+    ("servings", pa.float64()),
+    ("yield", pa.string()),
+    ("prep_minutes", pa.int32()),
+    ("cook_minutes", pa.int32()),
+    ("total_minutes", pa.int32()),
+    ("source_prep_minutes", pa.int32()),
+    ("source_cook_minutes", pa.int32()),
+    ("source_additional_minutes", pa.int32()),
+    ("source_total_minutes", pa.int32()),
+    ("instruction_count", pa.int32()),
+    ("bucket", pa.int64()),
+])
+
+INGREDIENT_SCHEMA = pa.schema([
+    ("recipe_id", pa.int64()),
+    ("position", pa.int32()),
+    ("name", pa.string()),
+    ("quantity", pa.float64()),
+    ("quantity_text", pa.string()),
+    ("unit", pa.string()),
+    ("preparation", pa.string()),
+    ("energy_kcal", pa.float64()),
+    ("carbohydrates_g", pa.float64()),
+    ("protein_g", pa.float64()),
+    ("fat_g", pa.float64()),
+    ("bucket", pa.int64()),
+])
+
+NUTRIENT_SCHEMA = pa.schema([
+    ("recipe_id", pa.int64()),
+    ("profile", pa.dictionary(pa.int8(), pa.string())),
+    ("nutrient", pa.dictionary(pa.int32(), pa.string())),
+    ("unit", pa.dictionary(pa.int8(), pa.string())),
+    ("value", pa.float64()),
+    ("bucket", pa.int64()),
+])
+
+TABLES = {"recipes": RECIPE_SCHEMA, "ingredients": INGREDIENT_SCHEMA, "nutrients": NUTRIENT_SCHEMA}
+
+class ColumnarBatch:
+    """Column lists for one batch of recipes, flattened into the recipe, ingredient and nutrient tables."""
+
+    def __init__(self, bucket_size):
+        self.bucket_size = bucket_size
+        self.columns = {name: {field.name: [] for field in schema} for name, schema in TABLES.items()}
+        self.recipes = 0
+
+    def _append(self, table, **values):
+        for name, column in self.columns[table].items():
+            column.append(values.get(name))
+
+    def add(self, recipe_id, recipe):
+        bucket = recipe_id // self.bucket_size
+        origin = recipe.get("Cuisine Origin") or {}
+        states = origin.get("state") or []
+        if isinstance(states, str):
+            states = [states]
+        times = recipe.get("Time") or {}
+        source_times = recipe.get("Time (from Source)") or {}
+        self._append(
+            "recipes", recipe_id=recipe_id, bucket=bucket,
+            title=recipe.get("title"),
+            continent=origin.get("continent"),
+            region=origin.get("region"),
+            country=origin.get("country"),
+            states=[str(state) for state in states],
+            dietary_details=str(recipe.get("Dietary Details") or ""),
+            source_url=str(recipe.get("Source Info") or ""),
+            servings=to_float(recipe.get("Servings")),
+            **{"yield": str(recipe.get("Yield") or "")},
+            prep_minutes=to_int(times.get("Preparation Time (Minutes)")),
+            cook_minutes=to_int(times.get("Cooking Time (Minutes)")),
+            total_minutes=to_int(times.get("Total Time (Minutes)")),
+            source_prep_minutes=to_int(source_times.get("Prep Time (Minutes)")),
+            source_cook_minutes=to_int(source_times.get("Cook Time (Minutes)")),
+            source_additional_minutes=to_int(source_times.get("Additional Time (Minutes)")),
+            source_total_minutes=to_int(source_times.get("Total Time (Minutes)")),
+            instruction_count=len(recipe.get("Instructions") or []),
+        )
+
+        ingredients = recipe.get("Ingredients") or {}
+        for key, ingredient in ingredients.items():
+            if not isinstance(ingredient, dict):
+                continue
+            self._append(
+                "ingredients", recipe_id=recipe_id, bucket=bucket,
+                position=to_int(ingredient.get("index", key)),
+                name=ingredient.get("Ingredient Name"),
+                quantity=parse_quantity(ingredient.get("Quantity")),
+                quantity_text=str(ingredient.get("Quantity") or ""),
+                unit=ingredient.get("Unit") or "",
+                preparation=ingredient.get("State") or "",
+                energy_kcal=to_float(ingredient.get("Energy (kcal)")),
+                carbohydrates_g=to_float(ingredient.get("Carbohydrates")),
+                protein_g=to_float(ingredient.get("Protein (g)")),
+                fat_g=to_float(ingredient.get("Total Lipid (Fat) (g)")),
+            )
+
+        for profile, field in NUTRIENT_PROFILES.items():
+            values = recipe.get(field) or {}
+            if not isinstance(values, dict):
+                continue
+            for key, value in values.items():
+                nutrient, unit = split_nutrient_key(key)
+                self._append("nutrients", recipe_id=recipe_id, bucket=bucket, profile=profile,
+                             nutrient=nutrient, unit=unit, value=to_float(value))
+        self.recipes += 1
+
+    def tables(self):
+        return {name: pa.Table.from_pydict(self.columns[name], schema=schema) for name, schema in TABLES.items()}
+
+
+def export_columnar(paths, out_dir, batch_size=5000, bucket_size=10000, overwrite=False):
+    """Export scraper output files to partitioned Parquet tables under `out_dir`.
+
+    Writes `recipes/`, `ingredients/` and `nutrients/` datasets, hive-partitioned by
+    `bucket = recipe_id // bucket_size` and joined on `recipe_id`. Records are read and
+    written `batch_size` at a time. Records without a "Recipe ID" (older outputs) get
+    their position in the input instead.
+    """
+    for name in TABLES:
+        table_dir = os.path.join(out_dir, name)
+        if os.path.exists(table_dir) and os.listdir(table_dir):
+            if not overwrite:
+                raise FileExistsError(f"{table_dir} is not empty; pass overwrite=True to replace it")
+            shutil.rmtree(table_dir)
+
+    counts = {name: 0 for name in TABLES}
+    batch_number = 0
+
+    def flush(batch):
+        for name, table in batch.tables().items():
+            if table.num_rows:
+                pq.write_to_dataset(table, os.path.join(out_dir, name), partition_cols=["bucket"],
+                                    basename_template=f"part-{batch_number:05d}-{{i}}.parquet")
+                counts[name] += table.num_rows
+
+    batch = ColumnarBatch(bucket_size)
+    for position, recipe in enumerate(iter_output_records(paths)):
+        recipe_id = recipe.get("Recipe ID")
+        batch.add(int(recipe_id) if recipe_id is not None else position, recipe)
+        if batch.recipes >= batch_size:
+            flush(batch)
+            batch_number += 1
+            batch = ColumnarBatch(bucket_size)
+            print(f"Exported {counts['recipes']} recipes")
+    if batch.recipes:
+        flush(batch)
+
+    print(f"Exported {counts['recipes']} recipes, {counts['ingredients']} ingredients "
+          f"and {counts['nutrients']} nutrient values to {out_dir}")
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export scraper output to partitioned Parquet tables.")
+    parser.add_argument('inputs', nargs='+', help="output files or glob patterns, e.g. 'output_*.jsonl*'")
+    parser.add_argument('--out', default='recipes_parquet')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--bucket-size', type=int, default=10000)
+    parser.add_argument('--overwrite', action='store_true')
+    args = parser.parse_args()
+
+    paths = sorted(path for pattern in args.inputs for path in (glob.glob(pattern) or [pattern]))
+    export_columnar(paths, args.out, args.batch_size, args.bucket_size, args.overwrite)
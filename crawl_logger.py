@@ -0,0 +1,128 @@
+import atexit
+import csv
+import json
+import os
+import threading
+import time
+from queue import Queue, Empty
+
+LOG_FIELDS = ["URL", "Exists", "ID", "HTTP Status", "Latencies (s)", "Failure Reason", "Timestamp"]
+
+
+# Function to make sure rows appended to a log file match its header; returns True if a header is needed
+def prepare_log_file(log_file):
+    if not os.path.exists(log_file) or os.path.getsize(log_file) == 0:
+        return True
+    with open(log_file, 'r', newline='') as file:
+        header = next(csv.reader(file), None)
+    if header == LOG_FIELDS:
+        return False
+
+    # Written with other columns (e.g. the old "URL,Exists" log); keep it, but start a new file
+    root, extension = os.path.splitext(log_file)
+    old_path = f"{root}.{time.strftime('%Y%m%dT%H%M%S')}{extension}"
+    os.replace(log_file, old_path)
+    print(f"{log_file} has different columns; moved it to {old_path}")
+    return True
+
+
+class CrawlLogger:
+    """CSV logger fed by a queue and written by one background thread.
+
+    Rows are buffered and flushed every `flush_rows` rows or `flush_interval`
+    seconds, whichever comes first. The file stays open for the life of the logger.
+
+    `log` blocks once `queue_size` rows are waiting. If the file can't be opened or
+    written, the error is kept in `error`, the thread keeps draining the queue so
+    callers never block on it, and further rows are dropped and counted in
+    `rows_dropped`: a broken log never stops a crawl.
+    """
+
+    def __init__(self, log_file, flush_rows=500, flush_interval=2.0, queue_size=10000):
+        self.log_file = log_file
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.rows_dropped = 0
+        self.error = None
+        self._queue = Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name=f'crawl-logger-{log_file}', daemon=True)
+        self._thread.start()
+
+    def log(self, url, exists, recipe_id=None, http_status=None, latencies=None, reason=""):
+        """Queue one row. Never blocks on file I/O; rows are dropped once the logger has failed or closed."""
+        if self.error is not None or not self._thread.is_alive():
+            self.rows_dropped += 1
+            return
+        latencies_text = json.dumps({stage: round(seconds, 4) for stage, seconds in latencies.items()}) if latencies else ""
+        self._queue.put([url, exists, recipe_id if recipe_id is not None else "",
+                         http_status if http_status is not None else "", latencies_text, reason,
+                         time.strftime('%Y-%m-%dT%H:%M:%S')])
+
+    def _run(self):
+        rows = []
+        try:
+            write_header = prepare_log_file(self.log_file)
+            with open(self.log_file, 'a', newline='') as file:
+                writer = csv.writer(file)
+                if write_header:
+                    writer.writerow(LOG_FIELDS)
+
+                deadline = time.monotonic() + self.flush_interval
+                stopping = False
+                while not stopping:
+                    try:
+                        row = self._queue.get(timeout=max(deadline - time.monotonic(), 0.0))
+                        if row is None:
+                            stopping = True
+                        else:
+                            rows.append(row)
+                    except Empty:
+                        pass
+
+                    if stopping or len(rows) >= self.flush_rows or time.monotonic() >= deadline:
+                        if rows:
+                            writer.writerows(rows)
+                            file.flush()
+                            rows = []
+                        deadline = time.monotonic() + self.flush_interval
+        except Exception as e:
+            self.error = e
+            print(f"Logging to {self.log_file} failed, dropping further rows: {e}")
+            self.rows_dropped += len(rows)
+            # Keep taking rows until close() so callers never block on a full queue
+            while self._queue.get() is not None:
+                self.rows_dropped += 1
+
+    def close(self):
+        """Flush buffered rows and stop the logger thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self.rows_dropped:
+            print(f"{self.rows_dropped} rows were not written to {self.log_file}")
+
+
+_loggers = {}
+_loggers_lock = threading.Lock()
+
+
+def get_logger(log_file):
+    """Return the shared logger for a file, creating it on first use."""
+    with _loggers_lock:
+        logger = _loggers.get(log_file)
+        if logger is None:
+            logger = CrawlLogger(log_file)
+            _loggers[log_file] = logger
+        return logger
+
+
+def close_loggers():
+    """Flush and close every open logger. Registered to run at interpreter exit."""
+    with _loggers_lock:
+        loggers = list(_loggers.values())
+        _loggers.clear()
+    for logger in loggers:
+        logger.close()
+
+
+atexit.register(close_loggers)
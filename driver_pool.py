@@ -0,0 +1,222 @@
+import functools
+import re
+import threading
+import time
+from contextlib import contextmanager
+from queue import LifoQueue, Empty
+
+import metrics
+
+browser_start_seconds = metrics.histogram('browser_start_seconds', "Time to start a new WebDriver")
+driver_wait_seconds = metrics.histogram('driver_wait_seconds', "Time spent waiting for a free pooled WebDriver")
+drivers_busy = metrics.gauge('drivers_busy', "WebDrivers currently checked out of the pool")
+
+
+# "standard" loads pages like a normal browser; "lean" skips what extraction never looks at
+BROWSER_PROFILES = ('standard', 'lean')
+
+# URL patterns the lean profile never downloads: images, media, fonts and ad/analytics hosts
+BLOCKED_URL_PATTERNS = [
+    '*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+    '*.mp4', '*.webm', '*.m3u8', '*.mp3',
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*doubleclick.net*', '*googlesyndication.com*', '*googletagmanager.com*', '*google-analytics.com*',
+    '*googletagservices.com*', '*adservice.google.com*', '*amazon-adsystem.com*', '*facebook.net*',
+    '*scorecardresearch.com*', '*quantserve.com*', '*taboola.com*', '*outbrain.com*', '*criteo.com*',
+    '*pubmatic.com*', '*rubiconproject.com*', '*adnxs.com*', '*moatads.com*', '*chartbeat.com*',
+]
+
+# Chrome flags that trim background work and memory for the lean profile
+_LEAN_ARGUMENTS = [
+    '--blink-settings=imagesEnabled=false',
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--disable-background-timer-throttling',
+    '--disable-renderer-backgrounding',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication',
+    '--metrics-recording-only',
+    '--mute-audio',
+    '--no-first-run',
+    '--js-flags=--max-old-space-size=256',
+    '--window-size=1280,800',
+]
+
+
+# Function to create a headless Chrome WebDriver using one of BROWSER_PROFILES
+def create_headless_driver(profile='standard', blocked_urls=None):
+    """The lean profile returns from `get` at DOMContentLoaded and blocks `blocked_urls`
+    (default BLOCKED_URL_PATTERNS); pages are only ever read through explicit waits, so
+    neither the full `load` event nor the blocked resources are needed.
+    """
+    # Selenium is only imported once a browser is actually needed
+    from selenium import webdriver
+
+    if profile not in BROWSER_PROFILES:
+        raise ValueError(f"Unknown browser profile: {profile}")
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless=new')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    if profile == 'lean':
+        options.page_load_strategy = 'eager'
+        for argument in _LEAN_ARGUMENTS:
+            options.add_argument(argument)
+        options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'profile.default_content_setting_values.notifications': 2,
+        })
+
+    driver = webdriver.Chrome(options=options)
+    if profile == 'lean':
+        # Blocked at the network layer, so this also covers pages rendered with load_page_source
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs',
+                               {'urls': BLOCKED_URL_PATTERNS if blocked_urls is None else blocked_urls})
+    return driver
+
+
+# Function to render an already downloaded page in a driver without fetching it again
+def load_page_source(driver, page):
+    # A <base> tag keeps the page's relative scripts and links resolving against the original URL
+    base_tag = f'<base href="{page.url}">'
+    html, count = re.subn(r'(<head[^>]*>)', lambda m: m.group(1) + base_tag, page.text, count=1, flags=re.IGNORECASE)
+    if not count:
+        html = base_tag + html
+
+    driver.get('about:blank')
+    driver.execute_script("document.open(); document.write(arguments[0]); document.close();", html)
+
+
+class DriverPool:
+    """Bounded, thread-safe pool of long-lived WebDriver instances.
+
+    Drivers are created lazily up to `size`, reset between uses and recycled
+    after `max_pages_per_driver` checkouts or when they stop responding.
+    """
+
+    def __init__(self, size=8, max_pages_per_driver=50, driver_factory=create_headless_driver):
+        self.size = size
+        self.max_pages_per_driver = max_pages_per_driver
+        self.driver_factory = driver_factory
+
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = LifoQueue()
+        self._lock = threading.Lock()
+        self._page_counts = {}
+
+        # Statistics
+        self.created = 0
+        self.recycled = 0
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def acquire(self):
+        """Check out a driver, blocking until one of the `size` slots is free."""
+        start = time.perf_counter()
+        self._slots.acquire()
+        waited = time.perf_counter() - start
+
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        driver_wait_seconds.observe(waited)
+        drivers_busy.inc()
+
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+
+        try:
+            with browser_start_seconds.time():
+                driver = self.driver_factory()
+        except Exception:
+            drivers_busy.dec()
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.created += 1
+            self._page_counts[id(driver)] = 0
+        return driver
+
+    def release(self, driver):
+        """Return a driver to the pool, resetting or recycling it as needed."""
+        try:
+            with self._lock:
+                self._page_counts[id(driver)] = self._page_counts.get(id(driver), 0) + 1
+                worn_out = self._page_counts[id(driver)] >= self.max_pages_per_driver
+
+            if worn_out or not self._reset(driver):
+                self._discard(driver)
+            else:
+                self._idle.put(driver)
+        finally:
+            drivers_busy.dec()
+            self._slots.release()
+
+    @contextmanager
+    def driver(self):
+        """Context manager that checks a driver out and always returns it."""
+        driver = self.acquire()
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def _reset(self, driver):
+        # Clear cookies and navigation state; a failure here means the browser crashed
+        try:
+            driver.delete_all_cookies()
+            driver.get('about:blank')
+            return True
+        except Exception as e:
+            print(f"Driver reset failed, recycling: {e}")
+            return False
+
+    def _discard(self, driver):
+        with self._lock:
+            self._page_counts.pop(id(driver), None)
+            self.recycled += 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def use_profile(self, profile, blocked_urls=None):
+        """Start new drivers with another browser profile; idle drivers are quit so they are replaced."""
+        self.driver_factory = functools.partial(create_headless_driver, profile, blocked_urls)
+        self.close()
+
+    def stats(self):
+        """Return a snapshot of pool usage and wait time."""
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self.created,
+                "recycled": self.recycled,
+                "checkouts": self.checkouts,
+                "avg_wait_seconds": self.total_wait / self.checkouts if self.checkouts else 0.0,
+                "max_wait_seconds": self.max_wait,
+            }
+
+    def close(self):
+        """Quit every idle driver. The pool can still be used afterwards."""
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except Empty:
+                break
+            with self._lock:
+                self._page_counts.pop(id(driver), None)
+            try:
+                driver.quit()
+            except Exception:
+                pass
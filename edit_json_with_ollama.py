@@ -1,14 +1,11 @@
+import argparse
+import itertools
 import json
-import ollama
+import os
 import time
-
-INDIAN_STATES = [
-    "Andhra Pradesh", "Arunachal Pradesh", "Assam", "Bihar", "Chhattisgarh", "Goa", "Gujarat", 
-    "Haryana", "Himachal Pradesh", "Jharkhand", "Karnataka", "Kerala", "Madhya Pradesh", "Maharashtra",
-    "Manipur", "Meghalaya", "Mizoram", "Nagaland", "Odisha", "Punjab", "Rajasthan", "Sikkim", "Tamil Nadu",
-    "Telangana", "Tripura", "Uttar Pradesh", "Uttarakhand", "West Bengal", "Andaman and Nicobar Islands", 
-    "Chandigarh", "Dadra and Nagar Haveli and Daman and Diu", "Lakshadweep", "Delhi", "Puducherry", "Ladakh", "Jammu and Kashmir"
-]
+from json_stream import RecordStreamWriter, StreamCheckpoint, iter_records
+from state_classifier import INDIAN_STATES, StateClassifier, extract_state_names
+from state_enrichment import StateEnricher
 
 def read_json(file_path):
     """Read a JSON file and return the data."""
@@ -23,6 +20,8 @@ def write_json(file_path, data):
 
 def get_recipe_state(recipe_title):
     """Get the state(s) associated with a recipe title using Ollama."""
+    import ollama
+
     prompt = f"Identify the Indian state(s) associated with the recipe titled '{recipe_title}'. If it belongs to multiple states, list them all."
     response = ollama.generate(model='llama3', prompt=prompt)
     generated_value = response['response']
@@ -31,16 +30,6 @@ def get_recipe_state(recipe_title):
     states = extract_state_names(generated_value)
     return states
 
-def extract_state_names(response):
-    """Extract state names from the response."""
-    response_lower = response.lower()
-    found_states = []
-    for state in INDIAN_STATES:
-        state_lower = state.lower()
-        if state_lower in response_lower:
-            found_states.append(state)
-    return found_states
-
 # def get_nutritional_info(ingredient_name, quantity, unit):
 #     """Get nutritional information for an ingredient using Ollama."""
 #     prompt = f"Provide the nutritional information specifically for {quantity} {unit} of {ingredient_name} including Energy (kcal), Carbohydrates (g), Protein (g), and Total Lipid (Fat) (g)."
@@ -97,15 +86,32 @@ def update_ingredients(ingredients):
             # value['Protein (g)'] = nutritional_info.get('Protein (g)', "")
             # value['Total Lipid (Fat) (g)'] = nutritional_info.get('Total Lipid (Fat) (g)', "")
 
-def edit_json(data):
+def edit_json(data, enricher=None, classifier=None, min_confidence=0.8):
     """Edit the JSON data by updating the 'state' key for each recipe and adding/updating 'Ingredients (from LLM)' key."""
     if isinstance(data, list):
-        for recipe in data:
-            title = recipe.get('title', '')
-            cuisine_origin = recipe.get('Cuisine Origin', {})
-            if title and 'state' in cuisine_origin:
-                states = get_recipe_state(title)
-                cuisine_origin['state'] = states
+        targets = [recipe for recipe in data
+                   if recipe.get('title', '') and 'state' in recipe.get('Cuisine Origin', {})]
+
+        # Rule-based first pass; only recipes it isn't sure about go to the LLM
+        llm_recipes = []
+        for recipe in targets:
+            states, confidence = classifier.classify(recipe) if classifier is not None else ([], 0.0)
+            if confidence >= min_confidence:
+                recipe['Cuisine Origin']['state'] = states
+            else:
+                llm_recipes.append(recipe)
+        print(f"Rule-based classifier resolved {len(targets) - len(llm_recipes)} of {len(targets)} recipes")
+
+        # Look up the remaining titles in one go: cached titles skip the model, the rest are batched and run concurrently
+        titles = [recipe['title'] for recipe in llm_recipes]
+        states_by_title = enricher.enrich(titles) if enricher is not None else {}
+
+        for recipe in llm_recipes:
+            title = recipe['title']
+            states = states_by_title[title] if title in states_by_title else get_recipe_state(title)
+            if states is not None:
+                # None means the lookup failed; leave the state for a later run
+                recipe['Cuisine Origin']['state'] = states
             # Copy the content of the "Ingredients" key to "Ingredients (from LLM)"
             # if 'Ingredients' in recipe:
             #     recipe['Ingredients (from LLM)'] = recipe['Ingredients']
@@ -114,20 +120,68 @@ def edit_json(data):
         print("Data format is not as expected. Expected a list of recipes.")
     return data
 
+def stream_json(input_file, output_file, enricher=None, classifier=None, chunk_size=100, checkpoint_file=None):
+    """Enrich a JSON array or JSONL file chunk by chunk, writing results as they are ready.
+
+    Only `chunk_size` recipes are held in memory at a time. After every chunk the
+    output is flushed and the number of processed records is checkpointed, so a
+    restarted run skips what is already on disk.
+    """
+    checkpoint = StreamCheckpoint(checkpoint_file or output_file + '.checkpoint')
+    index, output_offset = checkpoint.load(input_file, output_file)
+    if index:
+        print(f"Resuming after record {index}")
+
+    writer = RecordStreamWriter(output_file, resume_offset=output_offset)
+    records = itertools.islice(iter_records(input_file), index, None)
+    try:
+        while True:
+            chunk = list(itertools.islice(records, chunk_size))
+            if not chunk:
+                break
+            for recipe in edit_json(chunk, enricher, classifier):
+                writer.write(recipe)
+            index += len(chunk)
+            checkpoint.save(input_file, output_file, index, writer.flush())
+            print(f"Processed {index} records")
+    except BaseException:
+        # Leave the output unterminated; the checkpoint says where to pick up
+        writer.abort()
+        raise
+    writer.close()
+    checkpoint.clear()
+    return index
+
 def main():
-    input_file = '/Users/kabyabasu/Desktop/learning/selenium_task/output_copy.json'
-    output_file = '/Users/kabyabasu/Desktop/learning/selenium_task/output_new38.json'
+    parser = argparse.ArgumentParser(description="Fill in the Indian state(s) of each scraped recipe.")
+    parser.add_argument('--input', default='/Users/kabyabasu/Desktop/learning/selenium_task/output_copy.json')
+    parser.add_argument('--output', default='/Users/kabyabasu/Desktop/learning/selenium_task/output_new38.json')
+    parser.add_argument('--stream', action='store_true',
+                        help="process the input incrementally (JSON array or JSONL) and resume from the last checkpoint")
+    parser.add_argument('--chunk-size', type=int, default=100, help="recipes per chunk in --stream mode")
+    parser.add_argument('--checkpoint', default=None, help="checkpoint file (default: <output>.checkpoint)")
+    args = parser.parse_args()
 
-    # Read the JSON file
-    data = read_json(input_file)
+    # OLLAMA_HOST can point at a local stand-in server
+    enricher = StateEnricher(model='llama3', host=os.environ.get('OLLAMA_HOST'))
+    classifier = StateClassifier()
 
     # Edit the JSON data
     print("Starting JSON data editing...")
-    data = edit_json(data)
-    print("Finished JSON data editing.")
-
-    # Write the modified data back to the JSON file
-    write_json(output_file, data)
+    start_time = time.time()
+    try:
+        if args.stream:
+            stream_json(args.input, args.output, enricher, classifier, args.chunk_size, args.checkpoint)
+        else:
+            # Read the JSON file
+            data = read_json(args.input)
+            data = edit_json(data, enricher, classifier)
+            # Write the modified data back to the JSON file
+            write_json(args.output, data)
+    finally:
+        enricher.close()
+    print(f"Finished JSON data editing in {time.time() - start_time:.1f} seconds.")
+    print(f"Enrichment stats: {enricher.stats()}")
     print("Data written to output file.")
 
 if __name__ == '__main__':
@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import namedtuple
+
+import requests
+
+from resilience import AdaptiveTimeouts, CircuitBreakers, backoff_delays, host_of, is_transient, \
+    retries_total, retry_after_seconds
+
+# Each worker thread keeps its own session so connections are reused
+_thread_local = threading.local()
+
+# Optional HtmlArchive that records every fetched page, or serves them in replay mode
+_archive = None
+_replay = False
+
+# Per-host timeouts learned from observed latency, and circuit breakers for hosts that keep failing
+timeouts = AdaptiveTimeouts(default=30.0, minimum=2.0, maximum=60.0)
+breakers = CircuitBreakers(failure_threshold=5, reset_timeout=60.0)
+
+
+class FetchResult(namedtuple('FetchResult', ['url', 'status_code', 'text', 'error', 'headers'], defaults=(None,))):
+    """A downloaded page that can be handed to every later stage. `headers` is None for archived pages."""
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.status_code == 200
+
+
+def get_session():
+    """Return the requests session owned by the calling thread."""
+    session = getattr(_thread_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        _thread_local.session = session
+    return session
+
+
+def use_archive(archive, replay=False):
+    """Record fetched pages into `archive`; with replay=True serve them from it and never touch the network."""
+    global _archive, _replay
+    _archive = archive
+    _replay = replay and archive is not None
+
+
+def is_replaying():
+    return _replay
+
+
+def archived_page(url, kind='page'):
+    """Return a page from the archive in replay mode, or a failed result when it was never archived."""
+    page = _archive.latest(url, kind)
+    if page is None:
+        return FetchResult(url, 0, "", f"{url} is not in the archive")
+    return page
+
+
+def archive_page(page, kind='page'):
+    """Store a page in the archive when recording. Failed requests and bodiless 304s are not archived."""
+    if _archive is not None and not _replay and page.error is None and page.status_code != 304:
+        _archive.store(page, kind)
+
+
+def fetch_page(url, timeout=None, retries=2, wait_if_open=False, headers=None):
+    """Download a URL, retrying transient failures with jittered backoff. Errors are captured in the result.
+
+    `timeout` defaults to one learned from the host's recent latency. While the host's
+    circuit breaker is open the call fails fast, or with `wait_if_open` sleeps until the
+    host may be tried again. Extra request `headers` (e.g. If-None-Match) are sent as given.
+    """
+    if _replay:
+        return archived_page(url)
+
+    delays = backoff_delays(retries)
+    while True:
+        wait = breakers.wait_time(url)
+        if wait:
+            if not wait_if_open:
+                return FetchResult(url, 0, "", f"Circuit open for {host_of(url)}")
+            time.sleep(wait)
+            continue
+
+        page, retry_after = _fetch_once(url, timeout or timeouts.timeout_for(url), headers)
+        if not is_transient(page):
+            breakers.record_success(url)
+            break
+        breakers.record_failure(url, retry_after)
+        delay = next(delays, None)
+        if delay is None:
+            break
+        retries_total.inc(host=host_of(url))
+        # Honour a short Retry-After; longer ones keep the circuit open instead of blocking here
+        time.sleep(max(delay, min(retry_after or 0.0, 30.0)))
+
+    # Rate-limit and server error pages are not worth replaying
+    if not is_transient(page):
+        archive_page(page)
+    return page
+
+
+def _fetch_once(url, timeout, headers=None):
+    start = time.perf_counter()
+    try:
+        response = get_session().get(url, timeout=timeout, headers=headers)
+    except requests.Timeout as e:
+        # Count the timeout as a slow response so the learned timeout grows for a slowing host
+        timeouts.observe(url, timeout)
+        return FetchResult(url, 0, "", str(e)), None
+    except Exception as e:
+        return FetchResult(url, 0, "", str(e)), None
+    timeouts.observe(url, time.perf_counter() - start)
+    return (FetchResult(url, response.status_code, response.text, None, response.headers),
+            retry_after_seconds(response.headers))
@@ -0,0 +1,275 @@
+import hashlib
+import html
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RECIPE_PATH = '/recipedb/search_recipeInfo/'
+SOURCE_PATH = '/source/'
+# Images, media and fonts, and scripts standing in for third-party ad and analytics hosts
+ASSET_PATH = '/assets/'
+THIRD_PARTY_PATH = '/thirdparty/'
+
+_ASSET_TYPES = {'.jpg': ('image/jpeg', 150_000), '.woff2': ('font/woff2', 40_000), '.mp4': ('video/mp4', 1_000_000)}
+# Roughly what an ad or analytics tag costs: some script work and memory
+_TRACKER_JS = b"window._tracker = []; for (var i = 0; i < 200000; i++) { window._tracker.push({i: i}); }"
+_PAGE_STYLE = (f"<style>@font-face {{ font-family: Fixture; src: url({ASSET_PATH}fixture.woff2); }} "
+               f"body {{ font-family: Fixture; }}</style>")
+
+_INGREDIENTS = ["basmati rice", "chicken breast", "onion", "garlic", "ginger", "tomato", "yogurt", "ghee",
+                "cumin seeds", "turmeric", "garam masala", "green chili", "coriander leaves", "potato", "paneer"]
+_UNITS = ["cup", "tablespoon", "teaspoon", "clove", "g", "piece"]
+_DETAILED_NUTRIENTS = ["Calcium, Ca", "Iron, Fe", "Magnesium, Mg", "Potassium, K", "Sodium, Na", "Zinc, Zn",
+                       "Vitamin C, total ascorbic acid", "Thiamin", "Riboflavin", "Niacin",
+                       "Fatty acids, total saturated", "Fatty acids, total monounsaturated"]
+
+
+# Function to render a RecipeDB-style recipe page; the detailed rows only appear after clicking "Show More"
+def render_recipe_page(recipe_id, source_url):
+    rng = random.Random(recipe_id)
+    ingredients = rng.sample(_INGREDIENTS, rng.randint(4, 12))
+    ingredient_rows = ''.join(
+        f"<tr><td>{name}</td><td>{rng.randint(1, 4)}</td><td>{rng.choice(_UNITS)}</td><td>chopped</td>"
+        f"<td>{rng.uniform(5, 300):.2f}</td><td>{rng.uniform(0, 40):.2f}</td><td>{rng.uniform(0, 30):.2f}</td>"
+        f"<td>{rng.uniform(0, 20):.2f}</td></tr>"
+        for name in ingredients)
+    big_rows = [f"{name} ({rng.choice(['g', 'mg'])}) {rng.uniform(0, 50):.2f}" for name in _DETAILED_NUTRIENTS]
+    steps = ''.join(f"<p>{i + 1}. Cook the {name} until done.</p>" for i, name in enumerate(ingredients))
+    return f"""<!DOCTYPE html>
+<html><head><title>Recipe {recipe_id}</title>{_PAGE_STYLE}</head>
+<body>
+<h3>Fixture Recipe {recipe_id}</h3>
+{''.join(f'<img src="{ASSET_PATH}recipe-{recipe_id}-{k}.jpg" alt="">' for k in range(3))}
+<ul class="collection">
+  <li><b>Cuisine</b><br>Asian &gt;&gt; Indian Subcontinent &gt;&gt; Indian</li>
+  <li><b>Dietary Details</b><br><span id="dietary-text">Vegetarian</span></li>
+  <li><b>Preparation Time</b><br>Cooking Time - {rng.randint(5, 90)} minutes Preparation Time - {rng.randint(5, 60)} minutes</li>
+  <li><b>Source</b><br><a href="{html.escape(source_url)}">Source recipe</a></li>
+</ul>
+<table>
+  <tr><th>Nutrient</th><th>Quantity</th></tr>
+  <tr><td>Protein (g)</td><td>{rng.uniform(5, 200):.4f}</td></tr>
+  <tr><td>Energy (kCal)</td><td>{rng.uniform(100, 2000):.4f}</td></tr>
+  <tr><td>Carbohydrates (g)</td><td>{rng.uniform(5, 300):.4f}</td></tr>
+  <tr><td>Total fats (g)</td><td>{rng.uniform(1, 100):.4f}</td></tr>
+</table>
+<table>
+  <tr><th>Ingredient Name</th><th>Quantity</th><th>Unit</th><th>State</th><th>Energy (kcal)</th>
+      <th>Carbohydrates</th><th>Protein (g)</th><th>Total Lipid (Fat) (g)</th></tr>
+  {ingredient_rows}
+</table>
+<button id="myBtn">Show More</button>
+<div id="more"></div>
+<div id="steps">{steps}</div>
+<script>
+  var rows = {big_rows!r};
+  document.getElementById('myBtn').onclick = function () {{
+    var more = document.getElementById('more');
+    rows.forEach(function (text) {{
+      var div = document.createElement('div');
+      div.className = 'bigRows';
+      div.textContent = text;
+      more.appendChild(div);
+    }});
+  }};
+</script>
+<script src="{THIRD_PARTY_PATH}tracker.js"></script>
+</body></html>"""
+
+
+# Function to render a source page with the mntl-* blocks the source extractor reads
+def render_source_page(recipe_id):
+    rng = random.Random(-recipe_id)
+    details = [("Prep Time:", f"{rng.randint(5, 60)} mins"), ("Cook Time:", f"{rng.randint(5, 90)} mins"),
+               ("Total Time:", f"1 hr {rng.randint(0, 59)} mins"), ("Servings:", str(rng.randint(1, 8))),
+               ("Yield:", f"{rng.randint(2, 12)} pieces")]
+    detail_items = ''.join(
+        f'<div class="mntl-recipe-details__item"><div class="mntl-recipe-details__label">{label}</div>'
+        f'<div class="mntl-recipe-details__value">{value}</div></div>'
+        for label, value in details)
+    summary_rows = ''.join(
+        f'<tr class="mntl-nutrition-facts-summary__table-row"><td>{value}</td><td>{name}</td></tr>'
+        for name, value in [("Calories", str(rng.randint(100, 900))), ("Fat", f"{rng.randint(1, 60)}g"),
+                            ("Carbs", f"{rng.randint(5, 120)}g"), ("Protein", f"{rng.randint(2, 70)}g")])
+    label_rows = ''.join(
+        f'<tr><td><span class="mntl-nutrition-facts-label__nutrient-name">{name}</span>\n'
+        f'{rng.randint(1, 500)}mg</td><td>{rng.randint(1, 100)}%</td></tr>'
+        for name in ["Cholesterol", "Sodium", "Potassium", "Calcium", "Iron"])
+    ingredient_items = ''.join(
+        f'<li class="mntl-structured-ingredients__list-item"><p><span>{rng.randint(1, 3)}</span> '
+        f'<span>{rng.choice(_UNITS)}</span> <span>{name}</span></p></li>'
+        for name in rng.sample(_INGREDIENTS, rng.randint(4, 10)))
+    return f"""<!DOCTYPE html>
+<html><head><title>Source {recipe_id}</title>{_PAGE_STYLE}
+<script src="{THIRD_PARTY_PATH}tracker.js"></script></head>
+<body>
+<p class="article-subheading type--dog">A fixture source page for recipe {recipe_id}.</p>
+{''.join(f'<img src="{ASSET_PATH}source-{recipe_id}-{k}.jpg" alt="">' for k in range(8))}
+<video src="{ASSET_PATH}source-{recipe_id}.mp4" autoplay muted></video>
+<div id="mntl-recipe-details_1-0"><div class="mntl-recipe-details__content">{detail_items}</div></div>
+<div id="mntl-nutrition-facts-summary_1-0"><table><tbody class="mntl-nutrition-facts-summary__table-body">
+{summary_rows}</tbody></table></div>
+<div id="mntl-nutrition-facts-label_1-0"><div class="mntl-nutrition-facts-label__wrapper">
+<div class="mntl-nutrition-facts-label__contents"><table class="mntl-nutrition-facts-label__table">
+<tbody class="mntl-nutrition-facts-label__table-body">{label_rows}</tbody></table></div></div></div>
+<ul class="mntl-structured-ingredients__list">{ingredient_items}</ul>
+<script src="{THIRD_PARTY_PATH}ads.js"></script>
+</body></html>"""
+
+
+class FixtureServer:
+    """Local HTTP server that stands in for RecipeDB and the recipe source sites.
+
+    Serves `/recipedb/search_recipeInfo/<id>` and `/source/<id>` with generated
+    pages. Every response is delayed by `latency` seconds plus up to `jitter`
+    seconds, a fraction `error_rate` of requests get a 503, and a fraction
+    `missing_rate` of recipe IDs (chosen deterministically) return 404. Pages carry
+    an ETag and answer a matching If-None-Match with 304. The images, media, fonts and
+    third-party scripts the pages reference are served after `asset_latency` seconds
+    and never fail.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, missing_rate=0.0, seed=0, port=0,
+                 asset_latency=0.0):
+        self.latency = latency
+        self.asset_latency = asset_latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.missing_rate = missing_rate
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.asset_requests = 0
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def recipe_url_prefix(self):
+        return self.url + RECIPE_PATH
+
+    def is_missing(self, recipe_id):
+        return random.Random(f'{self.seed}-{recipe_id}').random() < self.missing_rate
+
+    def _respond(self, path):
+        """Return `(status, body)` for a request path, applying the configured delay and errors."""
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return 503, "<html><body>Service Unavailable</body></html>"
+
+        match = re.fullmatch(rf'({re.escape(RECIPE_PATH)}|{re.escape(SOURCE_PATH)})(\d+)/?', path)
+        if match is None:
+            return 404, "<html><body>Not Found</body></html>"
+        prefix, recipe_id = match.group(1), int(match.group(2))
+        if prefix == SOURCE_PATH:
+            return 200, render_source_page(recipe_id)
+        if self.is_missing(recipe_id):
+            return 404, "<html><body>Recipe not found</body></html>"
+        return 200, render_recipe_page(recipe_id, f'{self.url}{SOURCE_PATH}{recipe_id}')
+
+    def _respond_asset(self, path):
+        """Return `(status, content type, body)` for an asset or third-party script path."""
+        with self._lock:
+            self.asset_requests += 1
+        if self.asset_latency:
+            time.sleep(self.asset_latency)
+        if path.startswith(THIRD_PARTY_PATH):
+            return 200, 'application/javascript', _TRACKER_JS
+        content_type, size = _ASSET_TYPES.get(path[path.rfind('.'):], (None, 0))
+        if content_type is None:
+            return 404, 'text/plain', b'Not Found'
+        return 200, content_type, bytes(size)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path.startswith((ASSET_PATH, THIRD_PARTY_PATH)):
+                    status, content_type, body = server._respond_asset(path)
+                    self._send(status, body, content_type=content_type)
+                    return
+                status, body = server._respond(path)
+                body = body.encode('utf-8')
+                etag = f'"{hashlib.sha1(body).hexdigest()}"' if status == 200 else None
+                if etag is not None and self.headers.get('If-None-Match') == etag:
+                    self._send(304, b'', include_body=False, etag=etag)
+                else:
+                    self._send(status, body, etag=etag)
+
+            def do_HEAD(self):
+                status, body = server._respond(self.path.split('?', 1)[0])
+                self._send(status, body.encode('utf-8'), include_body=False)
+
+            def _send(self, status, body, include_body=True, etag=None, content_type='text/html; charset=utf-8'):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                if etag is not None:
+                    self.send_header('ETag', etag)
+                self.end_headers()
+                if include_body:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Keep benchmark output readable
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fixture-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve fixture RecipeDB and source pages locally.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--missing-rate', type=float, default=0.0)
+    parser.add_argument('--asset-latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FixtureServer(args.latency, args.jitter, args.error_rate, args.missing_rate, port=args.port,
+                           asset_latency=args.asset_latency)
+    print(f"Serving fixtures at {server.recipe_url_prefix}<id>")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,90 @@
+import gzip
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from fetcher import FetchResult
+
+# Kinds of archived documents
+PAGE = 'page'  # raw HTTP response body (RecipeDB and source pages)
+DOM = 'dom'    # browser DOM snapshot taken after clicking "Show More"
+
+
+class HtmlArchive:
+    """Content-addressed, gzip-compressed store of fetched pages.
+
+    Bodies are stored once per SHA-256 under `<root>/objects/ab/cdef...html.gz`;
+    an SQLite index maps (URL, kind, fetch time) to the body hash and HTTP status.
+    Safe to share between worker threads.
+    """
+
+    def __init__(self, root='html_archive'):
+        self.root = root
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, 'index.db'), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                status INTEGER NOT NULL,
+                sha256 TEXT NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS pages_url_kind ON pages (url, kind, fetched_at)')
+        self._conn.commit()
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], digest[2:] + '.html.gz')
+
+    def store(self, page, kind=PAGE):
+        """Archive a FetchResult and return the hash of its body."""
+        body = page.text.encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so readers never see a partial object
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as file:
+                file.write(gzip.compress(body))
+            os.replace(tmp_path, path)
+
+        with self._lock:
+            self._conn.execute('INSERT INTO pages (url, kind, fetched_at, status, sha256) VALUES (?, ?, ?, ?, ?)',
+                               (page.url, kind, time.time(), page.status_code, digest))
+            self._conn.commit()
+        return digest
+
+    def latest(self, url, kind=PAGE):
+        """Return the most recent archived FetchResult for a URL, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT status, sha256 FROM pages WHERE url = ? AND kind = ? ORDER BY fetched_at DESC LIMIT 1',
+                (url, kind)).fetchone()
+        if row is None:
+            return None
+        status, digest = row
+        with open(self._object_path(digest), 'rb') as file:
+            return FetchResult(url, status, gzip.decompress(file.read()).decode('utf-8'), None)
+
+    def urls(self, kind=PAGE, prefix='', status=None):
+        """Return every archived URL of a kind that starts with `prefix`, optionally only with a given status."""
+        query = "SELECT DISTINCT url FROM pages WHERE kind = ? AND url LIKE ? ESCAPE '\\'"
+        params = [kind, prefix.replace('%', r'\%').replace('_', r'\_') + '%']
+        if status is not None:
+            query += ' AND status = ?'
+            params.append(status)
+        with self._lock:
+            rows = self._conn.execute(query + ' ORDER BY url', params).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
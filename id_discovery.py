@@ -0,0 +1,140 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fetcher import get_session
+from resilience import TRANSIENT_STATUSES
+
+
+class IdIndex:
+    """Persistent map of which recipe IDs exist, backed by SQLite.
+
+    IDs that were never probed (skipped by the adaptive stride, or whose probe
+    failed) are simply absent and count as unknown.
+    """
+
+    def __init__(self, path='id_index.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS id_index (
+                recipe_id INTEGER PRIMARY KEY,
+                live INTEGER NOT NULL,
+                checked_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def record_many(self, outcomes):
+        """Store `{recipe_id: live}` probe outcomes."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO id_index (recipe_id, live, checked_at) VALUES (?, ?, ?)',
+                [(recipe_id, int(live), now) for recipe_id, live in outcomes.items()])
+            self._conn.commit()
+
+    def known(self, start, end):
+        """Return `{recipe_id: live}` for every probed ID in [start, end]."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT recipe_id, live FROM id_index WHERE recipe_id BETWEEN ? AND ?', (start, end)).fetchall()
+        return {recipe_id: bool(live) for recipe_id, live in rows}
+
+    def live_ids(self, start, end):
+        """Return the IDs in [start, end] known to exist, in order."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT recipe_id FROM id_index WHERE live = 1 AND recipe_id BETWEEN ? AND ? ORDER BY recipe_id',
+                (start, end)).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Function to check whether a URL exists without downloading the page body
+def url_exists(url, method='head', timeout=15):
+    """Return True/False for the page's existence, or None when the probe itself failed."""
+    try:
+        if method == 'head':
+            response = get_session().head(url, timeout=timeout, allow_redirects=True)
+        else:
+            # Streamed GET: read the status line and headers, then drop the connection body
+            response = get_session().get(url, timeout=timeout, stream=True)
+        response.close()
+    except Exception as e:
+        print(f"Probe failed for {url}: {e}")
+        return None
+    if response.status_code in TRANSIENT_STATUSES:
+        # Rate limited or overloaded: existence is still unknown
+        return None
+    return response.status_code == 200
+
+
+# Function to map one segment of the ID space, widening the stride through sparse stretches
+def scan_segment(seg_start, seg_end, url_for_id, known, method='head', max_stride=16, misses_before_widening=4):
+    outcomes = {}
+
+    def probe(i):
+        if i in known:
+            return known[i]
+        live = url_exists(url_for_id(i), method)
+        if live is not None:
+            outcomes[i] = live
+        return live
+
+    stride = 1
+    misses = 0
+    last_probed = seg_start - 1
+    i = seg_start
+    while i <= seg_end:
+        live = probe(i)
+        if live:
+            # A hit after a jump means the skipped IDs may be live too, so fill them in
+            for j in range(last_probed + 1, i):
+                probe(j)
+            stride = 1
+            misses = 0
+        elif live is False:
+            misses += 1
+            if misses >= misses_before_widening:
+                stride = min(stride * 2, max_stride)
+                misses = 0
+        last_probed = i
+        i += stride
+
+    return outcomes
+
+
+# Function to discover which IDs in a range exist and persist them to the ID index
+def discover_ids(start, end, url_for_id, index, workers=16, segment_size=1000, method='head', max_stride=16):
+    """Probe [start, end] in parallel segments and return the number of live IDs found."""
+    def run_segment(seg_start):
+        seg_end = min(seg_start + segment_size - 1, end)
+        outcomes = scan_segment(seg_start, seg_end, url_for_id, index.known(seg_start, seg_end),
+                                method, max_stride)
+        index.record_many(outcomes)
+        live = sum(1 for value in outcomes.values() if value)
+        print(f"Discovered IDs {seg_start}-{seg_end}: {live} live of {len(outcomes)} probed")
+        return live
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(run_segment, range(start, end + 1, segment_size)))
+
+    return len(index.live_ids(start, end))
+
+
+if __name__ == '__main__':
+    from recipeDbParser_v0 import recipe_url
+
+    id_index = IdIndex('id_index.db')
+    try:
+        total = discover_ids(5000, 200000, recipe_url, id_index)
+        print(f"{total} live recipe IDs indexed")
+    finally:
+        id_index.close()
@@ -0,0 +1,95 @@
+import sqlite3
+import threading
+import time
+
+PENDING = 'pending'
+DONE = 'done'
+MISSING = 'missing'
+FAILED = 'failed'
+
+
+class JobStateStore:
+    """Durable per-ID crawl state backed by SQLite.
+
+    Every recipe ID gets a status, an attempt count and the last error. An ID should
+    only be marked done once its record is safely in the output. Safe to share
+    between worker threads.
+    """
+
+    def __init__(self, path='crawl_state.db', max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                recipe_id INTEGER PRIMARY KEY,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def _record(self, recipe_id, status, error=None):
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO jobs (recipe_id, status, attempts, last_error, updated_at)
+                VALUES (?, ?, 1, ?, ?)
+                ON CONFLICT(recipe_id) DO UPDATE SET
+                    status = excluded.status,
+                    attempts = jobs.attempts + 1,
+                    last_error = excluded.last_error,
+                    updated_at = excluded.updated_at
+            """, (recipe_id, status, error, time.time()))
+            self._conn.commit()
+
+    def mark_done(self, recipe_id):
+        self._record(recipe_id, DONE)
+
+    def mark_missing(self, recipe_id):
+        self._record(recipe_id, MISSING)
+
+    def mark_failed(self, recipe_id, error):
+        self._record(recipe_id, FAILED, error=str(error))
+
+    def _statuses(self, start, end):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT recipe_id, status, attempts FROM jobs WHERE recipe_id BETWEEN ? AND ?',
+                (start, end)).fetchall()
+        return {recipe_id: (status, attempts) for recipe_id, status, attempts in rows}
+
+    def ids_to_process(self, start, end):
+        """Return the IDs in [start, end] that are new, unfinished or failed but still retryable."""
+        statuses = self._statuses(start, end)
+        ids = []
+        for recipe_id in range(start, end + 1):
+            status, attempts = statuses.get(recipe_id, (PENDING, 0))
+            if status in (DONE, MISSING):
+                continue
+            if status == FAILED and attempts >= self.max_attempts:
+                continue
+            ids.append(recipe_id)
+        return ids
+
+    def retryable_failures(self, start, end):
+        """Return the failed IDs in [start, end] that have attempts left."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT recipe_id FROM jobs WHERE status = ? AND attempts < ? AND recipe_id BETWEEN ? AND ? '
+                'ORDER BY recipe_id', (FAILED, self.max_attempts, start, end)).fetchall()
+        return [row[0] for row in rows]
+
+    def summary(self):
+        """Return the number of IDs in each status."""
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
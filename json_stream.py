@@ -0,0 +1,170 @@
+import gzip
+import json
+import os
+import tempfile
+
+
+# Function to yield records one at a time from a JSON array file or a JSONL file
+def iter_records(path, chunk_size=1 << 16):
+    with open(path, 'r') as file:
+        first = file.read(1)
+        while first and first.isspace():
+            first = file.read(1)
+        if first != '[':
+            # JSON Lines: one record per line
+            pending = first + file.readline()
+            if pending.strip():
+                yield json.loads(pending)
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        yield from _iter_array(file, chunk_size)
+
+
+def _iter_array(file, chunk_size):
+    """Decode the elements of a JSON array whose opening '[' was already consumed."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    while True:
+        # Skip whitespace and separators between elements
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ','):
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            buffer, pos = file.read(chunk_size), 0
+            eof = not buffer
+        if pos >= len(buffer):
+            raise ValueError("Unexpected end of file inside JSON array")
+        if buffer[pos] == ']':
+            return
+
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+            # A value that runs to the end of the buffer may continue in the next chunk
+            complete = end < len(buffer) or eof
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if complete:
+            yield record
+            pos = end
+            continue
+
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+# Function to yield records from scraper output files: JSONL parts (optionally .gz/.zst) or a JSON array
+def iter_output_records(paths):
+    for path in paths:
+        if not path.endswith(('.gz', '.zst')):
+            yield from iter_records(path)
+            continue
+        with _open_compressed(path) as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _open_compressed(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Reading .zst output needs the 'zstandard' package: pip install zstandard")
+    return zstandard.open(path, 'rt', encoding='utf-8')
+
+
+class StreamCheckpoint:
+    """Remembers how far a streaming job got so a restart can continue from there.
+
+    Stores the number of input records processed and the output size at that point;
+    the file is replaced atomically so a crash never leaves it half-written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, input_path, output_path):
+        """Return `(index, output_offset)` for a matching earlier run, or `(0, 0)`."""
+        try:
+            with open(self.path, 'r') as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return 0, 0
+        if state.get('input') != os.path.abspath(input_path) or state.get('output') != os.path.abspath(output_path):
+            return 0, 0
+        # The output must still hold everything the checkpoint vouches for
+        if not os.path.exists(output_path) or os.path.getsize(output_path) < state['output_offset']:
+            return 0, 0
+        return state['index'], state['output_offset']
+
+    def save(self, input_path, output_path, index, output_offset):
+        state = {
+            "input": os.path.abspath(input_path),
+            "output": os.path.abspath(output_path),
+            "index": index,
+            "output_offset": output_offset,
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)))
+        with os.fdopen(fd, 'w') as file:
+            json.dump(state, file)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class RecordStreamWriter:
+    """Appends records to a JSON array (indented like `write_json`) or, for `.jsonl` paths, to JSON Lines.
+
+    With `resume_offset` an existing output is truncated back to that size and
+    extended, so records written after the last checkpoint are not duplicated.
+    """
+
+    def __init__(self, path, resume_offset=0):
+        self.path = path
+        self.jsonl = path.endswith('.jsonl')
+        if resume_offset:
+            self._file = open(path, 'r+')
+            self._file.truncate(resume_offset)
+            self._file.seek(resume_offset)
+            # Anything after the opening '[' means the next element needs a separator
+            self.count = 0 if self.jsonl or resume_offset <= 1 else 1
+        else:
+            self._file = open(path, 'w')
+            if not self.jsonl:
+                self._file.write('[')
+            self.count = 0
+
+    def write(self, record):
+        if self.jsonl:
+            self._file.write(json.dumps(record) + '\n')
+        else:
+            text = json.dumps(record, indent=4).replace('\n', '\n    ')
+            self._file.write((',\n    ' if self.count else '\n    ') + text)
+            self.count += 1
+
+    def flush(self):
+        """Push written records to disk and return the output size to checkpoint."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def abort(self):
+        """Close without terminating the array so a resumed run can keep appending."""
+        self._file.close()
+
+    def close(self):
+        if not self.jsonl:
+            self._file.write('\n]\n' if self.count else ']\n')
+        self._file.close()
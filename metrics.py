@@ -0,0 +1,300 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float('inf'))
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels."""
+
+    type_name = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def values(self):
+        """Return `{label values: count}` for every label combination seen so far."""
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in sorted(self.values().items())]
+
+
+class Gauge(Counter):
+    """Value that can go up and down. `set_function` makes it read a callback at scrape time."""
+
+    type_name = 'gauge'
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._functions[key] = function
+
+    def values(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, function in functions.items():
+            try:
+                values[key] = function()
+            except Exception:
+                # A gauge whose source is gone just stops reporting
+                pass
+        return values
+
+
+class _Timer:
+    def __init__(self, histogram, labels, latencies, key):
+        self.histogram = histogram
+        self.labels = labels
+        self.latencies = latencies
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self.start
+        self.histogram.observe(self.elapsed, **self.labels)
+        if self.latencies is not None:
+            self.latencies[self.key] = self.elapsed
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, optionally split by labels."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) if buckets[-1] == float('inf') else tuple(buckets) + (float('inf'),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def time(self, latencies=None, key=None, **labels):
+        """Context manager that observes the duration of its block.
+
+        With a `latencies` dict the duration is also stored under `key` (default: the
+        `stage` label), so callers keeping per-request timings don't time twice.
+        """
+        return _Timer(self, labels, latencies, key or labels.get('stage'))
+
+    def snapshot(self):
+        """Return `{label values: (bucket counts, sum, count)}` with non-cumulative bucket counts."""
+        with self._lock:
+            return {key: (list(series["counts"]), series["sum"], series["count"])
+                    for key, series in self._series.items()}
+
+    def quantile(self, q, counts):
+        """Estimate a quantile from one series' bucket counts by interpolating inside the bucket."""
+        total = sum(counts)
+        if not total:
+            return None
+        target = q * total
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, counts):
+            if count and seen + count >= target:
+                if bound == float('inf'):
+                    return lower
+                return lower + (bound - lower) * (target - seen) / count
+            seen += count
+            if bound != float('inf'):
+                lower = bound
+        return lower
+
+    def render(self):
+        lines = []
+        for key, (counts, total, count) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+class Registry:
+    """Named collection of metrics that renders the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, cls, name, help, labelnames=(), **kwargs):
+        # Modules may be imported more than once (e.g. as __main__), so reuse existing metrics
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered with a different type or labels")
+            return metric
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self):
+        lines = []
+        for metric in self.metrics():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help, labelnames=()):
+    return REGISTRY.get_or_create(Counter, name, help, labelnames)
+
+
+def gauge(name, help, labelnames=()):
+    return REGISTRY.get_or_create(Gauge, name, help, labelnames)
+
+
+def histogram(name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+
+def start_http_server(port, host='127.0.0.1', registry=REGISTRY):
+    """Serve `registry` at http://<host>:<port>/metrics from a daemon thread and return the server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    print(f"Serving metrics at http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+# Function to describe every metric in a few human-readable lines
+def summarize(registry=REGISTRY):
+    lines = []
+    for metric in registry.metrics():
+        if isinstance(metric, Histogram):
+            for key, (counts, total, count) in sorted(metric.snapshot().items()):
+                if not count:
+                    continue
+                label = f"[{','.join(key)}]" if key else ''
+                lines.append(f"{metric.name}{label}: n={count} mean={total / count:.3f}s "
+                             f"p50={metric.quantile(0.5, counts):.3f}s p99={metric.quantile(0.99, counts):.3f}s")
+        else:
+            values = metric.values()
+            if values:
+                parts = [f"{','.join(key) or 'value'}={_format_value(value)}" for key, value in sorted(values.items())]
+                lines.append(f"{metric.name}: {' '.join(parts)}")
+    return lines
+
+
+class SummaryReporter:
+    """Prints `summarize()` every `interval` seconds from a daemon thread until stopped."""
+
+    def __init__(self, interval=60.0, registry=REGISTRY):
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-summary', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def report(self):
+        lines = summarize(self.registry)
+        if lines:
+            print("Metrics summary:\n  " + "\n  ".join(lines))
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop reporting and print one final summary."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.report()
@@ -0,0 +1,182 @@
+import glob
+import gzip
+import json
+import os
+import re
+import threading
+from queue import Queue, Empty
+
+import metrics
+
+output_write_seconds = metrics.histogram('output_write_seconds', "Time to serialize and flush one group of records")
+output_queue_depth = metrics.gauge('output_queue_depth', "Records queued for the output writer")
+
+_EXTENSIONS = {None: '.jsonl', 'gzip': '.jsonl.gz', 'zstd': '.jsonl.zst'}
+
+
+class OutputWriterError(RuntimeError):
+    """The output can't be written any more; crawls stop rather than blame the recipes."""
+
+
+# Function to open an output part for appending text, with optional compression
+def open_output_part(path, compression=None):
+    if compression is None:
+        return open(path, 'a', encoding='utf-8')
+    if compression == 'gzip':
+        return gzip.open(path, 'at', encoding='utf-8')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd compression needs the 'zstandard' package: pip install zstandard")
+        return zstandard.open(path, 'at', encoding='utf-8')
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+class JsonlWriter:
+    """Streams records to `<prefix>_<part>.jsonl` files, one compact JSON object per line.
+
+    Records are queued by any number of threads and written by a single writer thread.
+    A new part is started every `rotate_records` records or `rotate_bytes` bytes, and
+    each run starts a fresh part so existing files are never rewritten. `on_written`
+    callbacks run once the record has been flushed to disk.
+
+    A record that can't be serialized is logged and skipped. If the output itself
+    fails (e.g. the disk is full), the writer thread keeps draining the queue so
+    producers never block on it, and `write` and `close` raise OutputWriterError.
+    """
+
+    def __init__(self, prefix, rotate_records=None, rotate_bytes=None, compression=None, queue_size=1000):
+        if compression not in _EXTENSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        self.prefix = prefix
+        self.rotate_records = rotate_records
+        self.rotate_bytes = rotate_bytes
+        self.compression = compression
+        self.records_written = 0
+        self.records_skipped = 0
+        self.error = None
+
+        self._queue = Queue(maxsize=queue_size)
+        output_queue_depth.set_function(self._queue.qsize)
+        self._part = self._last_part_number()
+        self._file = None
+        self._part_records = 0
+        self._part_bytes = 0
+        self._thread = threading.Thread(target=self._run, name='jsonl-writer', daemon=True)
+        self._thread.start()
+
+    def _last_part_number(self):
+        pattern = re.compile(re.escape(os.path.basename(self.prefix)) + r'_(\d+)\.jsonl')
+        numbers = [int(match.group(1)) for match in
+                   (pattern.match(os.path.basename(path)) for path in glob.glob(f"{self.prefix}_*.jsonl*"))
+                   if match]
+        return max(numbers, default=0)
+
+    def _part_path(self):
+        return f"{self.prefix}_{self._part:05d}{_EXTENSIONS[self.compression]}"
+
+    def _open_next_part(self):
+        if self._file is not None:
+            self._file.close()
+        self._part += 1
+        self._part_records = 0
+        self._part_bytes = 0
+        self._file = open_output_part(self._part_path(), self.compression)
+        print(f"Writing output to {self._part_path()}")
+
+    def _needs_rotation(self):
+        if self._file is None:
+            return True
+        if self.rotate_records and self._part_records >= self.rotate_records:
+            return True
+        if self.rotate_bytes and self._part_bytes >= self.rotate_bytes:
+            return True
+        return False
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise OutputWriterError(f"Writing output to {self._part_path()} failed: {self.error}") from self.error
+
+    def write(self, record, on_written=None):
+        """Queue a record for writing. Blocks if the writer has fallen `queue_size` records behind."""
+        self._raise_error()
+        self._queue.put((record, on_written))
+
+    def _write_item(self, record, on_written, callbacks):
+        try:
+            line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        except (TypeError, ValueError) as e:
+            # Its `on_written` never runs, so the record isn't marked done and is crawled again next run
+            self.records_skipped += 1
+            print(f"Skipping a record that can't be written as JSON: {e}")
+            return
+        if self._needs_rotation():
+            self._open_next_part()
+        self._file.write(line)
+        self._part_records += 1
+        self._part_bytes += len(line)
+        self.records_written += 1
+        if on_written is not None:
+            callbacks.append(on_written)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            # Drain whatever is queued, then flush once for the whole group
+            items = [self._queue.get()]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except Empty:
+                    break
+
+            callbacks = []
+            with output_write_seconds.time():
+                for item in items:
+                    if item is None:
+                        stopping = True
+                    elif self.error is None:
+                        # After a failure, records are dropped so producers never block on a full queue
+                        try:
+                            self._write_item(*item, callbacks)
+                        except Exception as e:
+                            self.error = e
+                            print(f"Output writer failed, dropping further records: {e}")
+
+                try:
+                    if self._file is not None and self.error is None:
+                        self._file.flush()
+                except Exception as e:
+                    self.error = e
+                    print(f"Output writer failed, dropping further records: {e}")
+            if self.error is not None:
+                # Records in this group may not have reached the disk; don't mark them done
+                callbacks = []
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"Error in output callback: {e}")
+
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception as e:
+                self.error = self.error or e
+
+    def close(self):
+        """Write everything still queued and close the current part; raises if writing failed.
+
+        Closing an already closed writer only re-raises its error, if any.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,311 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from queue import Queue
+
+import metrics
+from crawl_logger import close_loggers
+from fetcher import fetch_page
+from id_discovery import IdIndex
+from job_state import JobStateStore
+from output_writer import JsonlWriter, OutputWriterError
+from recipeDbParser_v0 import (
+    click_show_more_button,
+    driver_pool,
+    extract_servings_from_source,
+    failure_outcome,
+    ids_pending,
+    log_url_status,
+    recipe_stage_seconds,
+    recipe_url,
+    recipes_in_flight,
+    recipes_total,
+    record_recipe_result,
+    source_cache,
+)
+from recipe_parsers import build_recipe_record, parse_recipe_tables
+from resilience import is_transient
+
+pipeline_items_total = metrics.counter('pipeline_items_total', "Items finished by each pipeline stage", ['stage'])
+pipeline_queue_depth = metrics.gauge('pipeline_queue_depth', "Items waiting in front of each pipeline stage",
+                                     ['stage'])
+pipeline_busy_workers = metrics.gauge('pipeline_busy_workers', "Workers of each pipeline stage currently busy",
+                                      ['stage'])
+
+_STOP = object()
+
+
+class Stage:
+    """One pipeline stage: `workers` threads take items from a bounded inbox and call `function(item)`.
+
+    A non-None result goes to the next stage's inbox, blocking while that inbox is
+    full, so a slow stage holds back the ones in front of it instead of letting work
+    pile up in memory. None drops the item.
+    """
+
+    def __init__(self, name, function, workers=1, queue_size=100):
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.inbox = Queue(maxsize=queue_size)
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+        self._threads = []
+        pipeline_queue_depth.set_function(self.inbox.qsize, stage=name)
+
+    def stats(self, elapsed):
+        with self._lock:
+            processed, busy_seconds = self.processed, self.busy_seconds
+        return {
+            "processed": processed,
+            "items_per_second": processed / elapsed if elapsed else 0.0,
+            # Average number of workers busy; near `workers` means this stage is the bottleneck
+            "utilization": busy_seconds / (elapsed * self.workers) if elapsed else 0.0,
+            "queue_depth": self.inbox.qsize(),
+        }
+
+
+class Pipeline:
+    """Stages connected by bounded queues.
+
+    Items enter with `put` and flow through the stages in order. `on_error(item, e)`
+    is called for items whose stage raised and `on_done(item)` for every item once
+    it leaves the pipeline, however it left. `join` waits until no item is in flight.
+    """
+
+    def __init__(self, stages, on_error=None, on_done=None):
+        self.stages = stages
+        self.on_error = on_error
+        self.on_done = on_done
+        self._in_flight = 0
+        self._idle = threading.Condition()
+        self._started_at = None
+
+    def start(self):
+        self._started_at = time.perf_counter()
+        for index, stage in enumerate(self.stages):
+            following = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            for n in range(stage.workers):
+                thread = threading.Thread(target=self._run_stage, args=(stage, following),
+                                          name=f'pipeline-{stage.name}-{n}', daemon=True)
+                thread.start()
+                stage._threads.append(thread)
+        return self
+
+    def put(self, item):
+        """Feed an item to the first stage, blocking while its inbox is full."""
+        with self._idle:
+            self._in_flight += 1
+        self.stages[0].inbox.put(item)
+
+    def _finish(self, item):
+        if self.on_done is not None:
+            self.on_done(item)
+        with self._idle:
+            self._in_flight -= 1
+            if not self._in_flight:
+                self._idle.notify_all()
+
+    def _run_stage(self, stage, following):
+        while True:
+            item = stage.inbox.get()
+            if item is _STOP:
+                return
+
+            pipeline_busy_workers.inc(stage=stage.name)
+            start = time.perf_counter()
+            try:
+                result = stage.function(item)
+            except Exception as e:
+                result = None
+                if self.on_error is not None:
+                    self.on_error(item, e)
+            finally:
+                pipeline_busy_workers.dec(stage=stage.name)
+                with stage._lock:
+                    stage.processed += 1
+                    stage.busy_seconds += time.perf_counter() - start
+                pipeline_items_total.inc(stage=stage.name)
+
+            if result is not None and following is not None:
+                following.inbox.put(result)
+            else:
+                self._finish(result if result is not None else item)
+
+    def join(self):
+        with self._idle:
+            while self._in_flight:
+                self._idle.wait()
+
+    def stats(self):
+        """Return throughput, utilization and queue depth for every stage."""
+        elapsed = time.perf_counter() - self._started_at if self._started_at else 0.0
+        return {stage.name: stage.stats(elapsed) for stage in self.stages}
+
+    def close(self):
+        """Stop the stages front to back; items already in the pipeline are finished first."""
+        self.join()
+        for stage in self.stages:
+            for _ in stage._threads:
+                stage.inbox.put(_STOP)
+            for thread in stage._threads:
+                thread.join()
+
+
+class RecipeJob:
+    """One recipe ID moving through the crawl pipeline, collecting each stage's output."""
+
+    __slots__ = ('recipe_id', 'url', 'latencies', 'page', 'tables', 'detailed', 'servings', 'record', 'stage')
+
+    def __init__(self, recipe_id):
+        self.recipe_id = recipe_id
+        self.url = recipe_url(recipe_id)
+        self.latencies = {}
+        self.page = None
+        self.tables = None
+        self.detailed = None
+        self.servings = None
+        self.record = None
+        self.stage = None
+
+
+# Function to crawl a range of IDs through fetch -> tables -> show more -> source -> build -> write stages
+def handle_multiple_urls_pipeline(start, end, output_file_prefix, log_file, source_log_file,
+                                  state_file='crawl_state.db', rotate_records=10000, compression=None,
+                                  id_index_file=None, fetch_workers=32, cpu_workers=None, queue_size=100):
+    """Network and browser stages run on threads; table parsing, the CPU-bound part, runs in a pool
+    of `cpu_workers` processes (default: one per core) so it doesn't compete with the fetchers for
+    the GIL. Building the record is cheap dict assembly and stays on the stage's thread, since
+    shipping it to a process would cost more than it saves.
+    """
+    cpu_workers = cpu_workers or os.cpu_count() or 1
+    job_state = JobStateStore(state_file)
+    id_index = IdIndex(id_index_file) if id_index_file else None
+    writer = JsonlWriter(output_file_prefix, rotate_records=rotate_records, compression=compression)
+    # Spawned rather than forked: the crawler's threads may hold locks at fork time
+    cpu_pool = ProcessPoolExecutor(max_workers=cpu_workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def timed(name, function):
+        def run(job):
+            job.stage = name
+            with recipe_stage_seconds.time(job.latencies, stage=name):
+                return function(job)
+        return run
+
+    def fetch(job):
+        job.page = fetch_page(job.url, wait_if_open=True)
+        if is_transient(job.page):
+            raise ConnectionError(f"Fetching {job.url} failed: {job.page.error or f'HTTP {job.page.status_code}'}")
+        return job
+
+    timed_fetch = timed('fetch', fetch)
+
+    def fetch_or_drop(job):
+        job = timed_fetch(job)
+        if not job.page.ok:
+            # Logged once the fetch is timed, so the row carries its latency like successful recipes do
+            recipes_total.inc(outcome='missing')
+            log_url_status(job.url, False, log_file, job.recipe_id, job.page.status_code, job.latencies,
+                           f"HTTP {job.page.status_code}")
+            print(f"Invalid URL: {job.url}")
+            job_state.mark_missing(job.recipe_id)
+            return None
+        return job
+
+    def tables(job):
+        job.tables = cpu_pool.submit(parse_recipe_tables, job.page.text).result()
+        return job
+
+    def show_more(job):
+        job.detailed = click_show_more_button(job.url, job.page)
+        return job
+
+    def source(job):
+        job.servings = extract_servings_from_source(job.detailed["Source Info"], source_log_file)
+        return job
+
+    def build(job):
+        nutritional_profile, ingredients = job.tables
+        job.record = build_recipe_record(nutritional_profile, ingredients, job.detailed, job.servings)
+        # The page body isn't needed any more; don't keep it alive while the record waits to be written
+        job.page = job.page._replace(text='')
+        return job
+
+    def write(job):
+        record_recipe_result(job.recipe_id, job.record, job_state, writer)
+        # Counted only once the record is queued, so a failed write isn't also counted as a success
+        recipes_total.inc(outcome='success')
+        log_url_status(job.url, True, log_file, job.recipe_id, job.page.status_code, job.latencies)
+        print(f"Processed URL: {job.url}")
+        return job
+
+    def on_error(job, e):
+        if isinstance(e, OutputWriterError):
+            # The output is down, not the recipe: the crawl stops below without using up the ID's retries
+            return
+        if job.stage == 'fetch':
+            recipes_total.inc(outcome='fetch_error')
+            log_url_status(job.url, False, log_file, job.recipe_id, job.page.status_code if job.page else None,
+                           job.latencies, str(e))
+        else:
+            recipes_total.inc(outcome=failure_outcome(e))
+            log_url_status(job.url, True, log_file, job.recipe_id, job.page.status_code, job.latencies,
+                           f"{type(e).__name__}: {e}")
+        print(f"Failed ID {job.recipe_id}: {e}")
+        job_state.mark_failed(job.recipe_id, e)
+
+    def on_done(job):
+        recipes_in_flight.dec()
+        ids_pending.dec()
+
+    stages = [
+        Stage('fetch', fetch_or_drop, fetch_workers, queue_size),
+        Stage('tables', timed('tables', tables), cpu_workers, queue_size),
+        Stage('show_more', timed('show_more', show_more), driver_pool.size, queue_size),
+        Stage('source', timed('source', source), max(fetch_workers // 4, 1), queue_size),
+        # Record building holds the GIL and takes microseconds; more threads wouldn't help
+        Stage('build', timed('build', build), 1, queue_size),
+        # Records are handed to the writer's own thread, so one worker is plenty
+        Stage('write', write, 1, queue_size),
+    ]
+    pipeline = Pipeline(stages, on_error, on_done).start()
+
+    try:
+        for batch_start in range(start, end + 1, 10000):
+            batch_end = min(batch_start + 9999, end)
+            ids = job_state.ids_to_process(batch_start, batch_end)
+            if id_index is not None:
+                live_ids = set(id_index.live_ids(batch_start, batch_end))
+                ids = [i for i in ids if i in live_ids]
+
+            while ids:
+                ids_pending.set(len(ids))
+                for i in ids:
+                    if writer.error is not None:
+                        break
+                    recipes_in_flight.inc()
+                    pipeline.put(RecipeJob(i))
+                pipeline.join()
+                if writer.error is not None:
+                    raise OutputWriterError(f"Output writer failed: {writer.error}") from writer.error
+                # Retry failed IDs until they run out of attempts
+                ids = job_state.retryable_failures(batch_start, batch_end)
+
+            print(f"Finished IDs {batch_start}-{batch_end}, {writer.records_written} recipes written")
+            for name, stats in pipeline.stats().items():
+                print(f"  {name}: {stats['processed']} items, {stats['items_per_second']:.2f}/s, "
+                      f"{stats['utilization']:.0%} busy, {stats['queue_depth']} queued")
+            print(f"Source cache stats: {source_cache.stats()}")
+            print(f"Crawl state: {job_state.summary()}")
+    finally:
+        pipeline.close()
+        cpu_pool.shutdown()
+        writer.close()
+        driver_pool.close()
+        job_state.close()
+        if id_index is not None:
+            id_index.close()
+        close_loggers()
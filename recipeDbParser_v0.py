@@ -1,457 +1,394 @@
-import os
-import pandas as pd
-import json
-import re
-import csv
-import requests
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
+import metrics
+from driver_pool import DriverPool, load_page_source
+from crawl_logger import close_loggers, get_logger
+from fetcher import FetchResult, archive_page, archived_page, fetch_page, is_replaying, use_archive
+from html_archive import DOM, HtmlArchive
+from id_discovery import IdIndex
+from job_state import JobStateStore
+from output_writer import JsonlWriter, OutputWriterError
+from resilience import AdaptiveTimeouts, is_transient
+from recipe_parsers import build_recipe_record, parse_cuisine_origin, parse_nutritional_data, parse_preparation_time, \
+    parse_recipe_details, parse_recipe_tables
+from source_cache import SourceCache, normalize_source_url
+from source_extractor import empty_source_data, extract_source_data_from_driver, extract_source_data_from_html
+
+# Shared pool of headless browsers; drivers are started lazily on first use
+driver_pool = DriverPool(size=8, max_pages_per_driver=50)
+
+# Source extraction results shared by every worker, keyed by normalized source URL
+source_cache = SourceCache(max_entries=10000, ttl=7 * 24 * 3600)
+
+# Browser waits learned per host, replacing fixed 10 second waits: one for page loads, one for the "Show More" rows
+navigation_timeouts = AdaptiveTimeouts(default=10.0, minimum=2.0, maximum=20.0)
+show_more_timeouts = AdaptiveTimeouts(default=10.0, minimum=1.0, maximum=20.0)
+
+# Recipe pages are this prefix followed by the recipe ID
+RECIPEDB_URL = 'https://cosylab.iiitd.edu.in/recipedb/search_recipeInfo/'
+
+# Crawl metrics; see metrics.start_http_server and metrics.SummaryReporter
+recipe_stage_seconds = metrics.histogram('recipe_stage_seconds', "Time spent in each stage of a recipe", ['stage'])
+source_stage_seconds = metrics.histogram('source_stage_seconds', "Time spent in each stage of a source page", ['stage'])
+recipes_total = metrics.counter('recipes_total', "Recipe IDs processed, by outcome", ['outcome'])
+source_pages_total = metrics.counter('source_pages_total', "Source pages extracted (cache misses), by outcome",
+                                     ['outcome'])
+browser_wait_timeouts_total = metrics.counter('browser_wait_timeouts_total',
+                                              "WebDriverWait timeouts, by whether the page was rendered or navigated",
+                                              ['step'])
+recipes_in_flight = metrics.gauge('recipes_in_flight', "Recipe IDs currently being processed")
+ids_pending = metrics.gauge('ids_pending', "Recipe IDs queued for the workers but not finished yet")
+metrics.gauge('source_cache_hit_ratio', "Share of source lookups served from the cache").set_function(
+    lambda: source_cache.stats()["hit_rate"])
 
 # Function to check if the URL is valid
 def is_valid_url(url):
-    try:
-        response = requests.get(url)
-        return response.status_code == 200
-    except:
-        return False
+    return fetch_page(url).ok
 
 # Function to extract and format the first two tables from the webpage
-def extract_tables(url):
-    df = pd.read_html(url)
-
-    # Extract the first and second tables
-    df1 = df[0]
-    df2 = df[1]
-
-    # Create json_file1 with the desired format
-    json_file1_content = df1.set_index('Nutrient')['Quantity'].to_dict()
-
-    # Create json_file2 with the desired format
-    df2.reset_index(inplace=True)
-    json_file2_content = df2.apply(lambda row: row.dropna().to_dict(), axis=1).to_dict()
-
-    return json_file1_content, json_file2_content
+def extract_tables(url, page=None):
+    # Parse the already downloaded body when we have one instead of fetching the URL again
+    if page is None:
+        page = fetch_page(url)
+    return parse_recipe_tables(page.text)
+
+# Function to open a page in the driver and wait for an element, reusing a downloaded body if possible
+def open_and_wait(driver, url, page, locator, condition=None):
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    condition = condition or EC.presence_of_element_located
+    if page is not None:
+        # The body is already local, so the element should appear almost immediately
+        load_page_source(driver, page)
+        try:
+            return WebDriverWait(driver, 2).until(condition(locator))
+        except TimeoutException:
+            browser_wait_timeouts_total.inc(step='rendered')
+            print(f"Rendering downloaded page failed, navigating instead: {url}")
+
+    start = time.perf_counter()
+    timeout = navigation_timeouts.timeout_for(url)
+    driver.get(url)
+    try:
+        element = WebDriverWait(driver, timeout).until(condition(locator))
+    except TimeoutException:
+        browser_wait_timeouts_total.inc(step='navigated')
+        # Count the timeout as a slow load so the learned timeout grows for a slowing host
+        navigation_timeouts.observe(url, timeout)
+        raise
+    navigation_timeouts.observe(url, time.perf_counter() - start)
+    return element
 
 # Function to click the "Show More" button and extract detailed nutritional information
-def click_show_more_button(url):
-    # Initialize the WebDriver (assuming Chrome)
-    driver = webdriver.Chrome()
+def click_show_more_button(url, page=None):
+    if is_replaying():
+        # The archived DOM snapshot was taken after the click, so it is parsed as is without a browser
+        snapshot = archived_page(url, DOM)
+        if snapshot.error:
+            raise LookupError(snapshot.error)
+        return parse_recipe_details(snapshot.text, url)
+
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    # Check out a WebDriver from the shared pool
+    driver = driver_pool.acquire()
 
     try:
-        # Open the provided URL
-        driver.get(url)
-
-        # Wait until the button is present and clickable
-        wait = WebDriverWait(driver, 10)
-        show_more_button = wait.until(EC.element_to_be_clickable((By.ID, 'myBtn')))
+        # Open the provided URL and wait until the button is present and clickable
+        show_more_button = open_and_wait(driver, url, page, (By.ID, 'myBtn'), EC.element_to_be_clickable)
 
         # Click the button
         show_more_button.click()
 
         # Wait for the elements with the class 'bigRows' to be present
-        big_rows_elements = wait.until(EC.presence_of_all_elements_located((By.CLASS_NAME, 'bigRows')))
-
-        # Collect the text of each element with the class 'bigRows'
-        big_rows_texts = [element.text for element in big_rows_elements]
-
-        # Grab the <h3> header text
-        h3_header = driver.find_element(By.TAG_NAME, 'h3').text
-
-        # Locate the <ul> element with the class 'collection'
-        collection_ul = driver.find_element(By.CLASS_NAME, 'collection')
-
-        # Extract the necessary information from the <li> elements
-        li_elements = collection_ul.find_elements(By.TAG_NAME, 'li')
-
-        cuisine_origin = li_elements[0].text.strip() if len(li_elements) > 0 else ""
-        dietary_details = driver.find_element(By.ID, 'dietary-text').text.strip() if len(li_elements) > 1 else ""
-        preparation_time = li_elements[2].text.strip() if len(li_elements) > 2 else ""
-        source_info = li_elements[3].find_element(By.TAG_NAME, 'a').get_attribute('href') if len(li_elements) > 3 else ""
-
-        # Wait for the element with the ID 'steps' to be present
+        start = time.perf_counter()
+        timeout = show_more_timeouts.timeout_for(url)
         try:
-            steps_element = wait.until(EC.presence_of_element_located((By.ID, 'steps')))
-            steps_paragraphs = steps_element.find_elements(By.TAG_NAME, 'p')
-            instructions = [p.get_attribute('innerHTML') for p in steps_paragraphs]
-        except:
-            instructions = []
-
-        # Return the collected data
-        return {
-            "title": h3_header,
-            "Cuisine Origin": cuisine_origin,
-            "Dietary Details": dietary_details,
-            "Preparation Time": preparation_time,
-            "Source Info": source_info,
-            "details": big_rows_texts,
-            "Instructions": instructions
-        }
-
+            WebDriverWait(driver, timeout).until(EC.presence_of_all_elements_located((By.CLASS_NAME, 'bigRows')))
+        except TimeoutException:
+            show_more_timeouts.observe(url, timeout)
+            raise
+        show_more_timeouts.observe(url, time.perf_counter() - start)
+
+        # Keep the post-click DOM so the parsers can be rerun offline; live and replayed
+        # records are read from it by the same parser
+        dom = driver.page_source
+        archive_page(FetchResult(url, 200, dom, None), DOM)
     finally:
-        # Close the WebDriver
-        driver.quit()
-
-# Function to modify the nutritional profile
-def transform_nutritional_profile(nutritional_profile):
-    transformed_profile = {}
-    for key, value in nutritional_profile.items():
-        if key == "Calories":
-            transformed_profile[key] = int(value.replace('g', '').strip())
-        else:
-            new_key = key.replace("Fat", "Fat(g)").replace("Carbs", "Carbs(g)").replace("Protein", "Protein(g)")
-            transformed_profile[new_key] = int(value.replace('g', '').strip())
-    return transformed_profile
-
-def convert_nutritional_profile(nutritional_profile):
-    # Initialize an empty dictionary for the converted profile
-    converted_profile = {}
-    
-    # Loop through each key-value pair in the nutritional profile
-    for key, value in nutritional_profile.items():
-        # Split the value to remove the "key\n" part and get the actual value
-        key_base, actual_value = value.split('\n')
-        
-        # Separate the numeric part from the unit
-        numeric_value = ''.join([char for char in actual_value if char.isdigit() or char == '.'])
-        unit = ''.join([char for char in actual_value if not char.isdigit() and char != '.'])
-        
-        # Create the new key by appending the unit in parentheses to the original key
-        new_key = "{}({})".format(key_base, unit)
-        
-        # Convert the numeric value to a float
-        numeric_value = float(numeric_value)
-        
-        # Add the new key-value pair to the converted profile
-        converted_profile[new_key] = numeric_value
-    
-    # Return the updated dictionary
-    return converted_profile
+        # Return the WebDriver to the pool
+        driver_pool.release(driver)
+
+    return parse_recipe_details(dom, url)
 
 # Function to extract servings and nutritional information from the source URL
 def extract_servings_from_source(source_url, source_log_file):
-    # Validate the URL before proceeding
-    if not is_valid_url(source_url):
-        log_url_status(source_url, False, source_log_file)
+    # Many recipes share a source URL (or have none); extract each one only once
+    return source_cache.get_or_compute(normalize_source_url(source_url),
+                                       lambda: fetch_and_extract_source(source_url, source_log_file))
+
+# Function to download and extract a source page; returns (data, cacheable)
+def fetch_and_extract_source(source_url, source_log_file, on_page=None):
+    # `on_page(page)` sees the downloaded page, e.g. to hash the same body that gets extracted
+    # Download the source page once and validate it before proceeding
+    if not source_url.strip():
+        # Recipes without a source have nothing to fetch
+        return empty_source_data(), True
+
+    latencies = {}
+    with source_stage_seconds.time(latencies, stage='fetch'):
+        page = fetch_page(source_url)
+    if on_page is not None:
+        on_page(page)
+    return extract_source_page(source_url, page, source_log_file, latencies)
+
+# Function to extract a downloaded source page; returns (data, cacheable)
+def extract_source_page(source_url, page, source_log_file, latencies, render=None):
+    # Shared by every crawler once the page is downloaded. `render(source_url, page)` extracts pages
+    # whose details need JavaScript and defaults to a pooled browser
+    if render is None:
+        render = extract_source_with_browser
+    if not page.ok:
+        source_pages_total.inc(outcome='fetch_error' if is_transient(page) else 'invalid')
+        log_url_status(source_url, False, source_log_file, http_status=page.status_code, latencies=latencies,
+                       reason=page.error or f"HTTP {page.status_code}")
         print(f"Invalid URL: {source_url}")
-        return {
-            "Time (from Source)": {
-                "Prep Time (Minutes)": 0,
-                "Cook Time (Minutes)": 0,
-                "Additional Time (Minutes)": 0,
-                "Total Time (Minutes)": 0
-            },
-            "Servings": 0,
-            "Yield": "",
-            "About Recipe": "",
-            "Nutritional Profile (from Source)": {},
-            "Nutritional Profile Detailed (from Source)": {},
-            "Ingredients (from source)": []
-        }
-
-    # Initialize the WebDriver (assuming Chrome)
-    driver = webdriver.Chrome()
-
+        # Connection errors and 5xx/429 responses may be transient, so only remember definite answers
+        return empty_source_data(), not is_transient(page)
+
+    # The recipe details are server-rendered, so parse the HTML directly
+    with source_stage_seconds.time(latencies, stage='parse'):
+        data = extract_source_data_from_html(page.text)
+
+    if data is None and is_replaying():
+        # Replay never starts a browser, and the rendered source page isn't archived
+        source_pages_total.inc(outcome='invalid')
+        log_url_status(source_url, False, source_log_file, http_status=page.status_code, latencies=latencies,
+                       reason="recipe details missing from the archived page")
+        return empty_source_data(), True
+
+    if data is None:
+        # Required nodes are missing from the raw HTML; fall back to a browser
+        with source_stage_seconds.time(latencies, stage='browser'):
+            data = render(source_url, page)
+    source_pages_total.inc(outcome='browser' if 'browser' in latencies else 'static')
+
+    log_url_status(source_url, True, source_log_file, http_status=page.status_code, latencies=latencies)
+    return data, True
+
+# Function to extract the source data by rendering the page in a pooled browser
+def extract_source_with_browser(source_url, page=None):
+    from selenium.webdriver.common.by import By
+
+    driver = driver_pool.acquire()
     try:
-        # Open the source URL
-        driver.get(source_url)
-
-        # Wait until the div with id 'mntl-recipe-details_1-0' is present
-        wait = WebDriverWait(driver, 10)
-        details_div = wait.until(EC.presence_of_element_located((By.ID, 'mntl-recipe-details_1-0')))
-
-        # Navigate to the required element
-        content_div = details_div.find_element(By.CLASS_NAME, 'mntl-recipe-details__content')
-        items = content_div.find_elements(By.CLASS_NAME, 'mntl-recipe-details__item')
-
-        data = {
-            "Time (from Source)": {
-                "Prep Time (Minutes)": 0,
-                "Cook Time (Minutes)": 0,
-                "Additional Time (Minutes)": 0,
-                "Total Time (Minutes)": 0
-            },
-            "Servings": 0,
-            "Yield": "",
-            "About Recipe": ""
-        }
-
-        def convert_to_minutes(time_str):
-            """Convert a time string into minutes."""
-            minutes = 0
-            time_parts = re.findall(r'(\d+)\s*(hr|min|hour|minute|hrs|hours|minutes)', time_str.lower())
-            for amount, unit in time_parts:
-                if 'hr' in unit or 'hour' in unit:
-                    minutes += int(amount) * 60
-                elif 'min' in unit or 'minute' in unit:
-                    minutes += int(amount)
-            return minutes
-        
-        def convert_to_numeric(servings_str):
-            """Convert servings string to a numeric value."""
-            match = re.search(r'\d+', servings_str)
-            if match:
-                return int(match.group())
-            return 0
-
-        for item_div in items:
-            try:
-                label_div = item_div.find_element(By.CLASS_NAME, 'mntl-recipe-details__label')
-                value_div = item_div.find_element(By.CLASS_NAME, 'mntl-recipe-details__value')
-                
-                # Use get_attribute('textContent') to capture the text
-                label_text = label_div.get_attribute('textContent').strip()
-                value_text = value_div.get_attribute('textContent').strip()
-
-                if label_text == "Prep Time:":
-                    data["Time (from Source)"]["Prep Time (Minutes)"] = convert_to_minutes(value_text)
-                elif label_text == "Cook Time:":
-                    data["Time (from Source)"]["Cook Time (Minutes)"] = convert_to_minutes(value_text)
-                elif label_text == "Additional Time:":
-                    data["Time (from Source)"]["Additional Time (Minutes)"] = convert_to_minutes(value_text)
-                elif label_text == "Total Time:":
-                    data["Time (from Source)"]["Total Time (Minutes)"] = convert_to_minutes(value_text)
-                elif label_text == "Servings:":
-                    data["Servings"] = convert_to_numeric(value_text)
-                elif label_text == "Yield:":
-                    data["Yield"] = value_text
-
-            except Exception as e:
-                print(f"Error processing item_div: {e}")
-
-        # Extract nutritional information
-        try:
-            nutrition_div = driver.find_element(By.ID, 'mntl-nutrition-facts-summary_1-0')
-            table_body = nutrition_div.find_element(By.CLASS_NAME, 'mntl-nutrition-facts-summary__table-body')
-            rows = table_body.find_elements(By.CLASS_NAME, 'mntl-nutrition-facts-summary__table-row')
-
-            nutritional_profile = {}
-            for row in rows:
-                cells = row.find_elements(By.TAG_NAME, 'td')
-                if len(cells) == 2:
-                    key = cells[0].get_attribute('textContent').strip()
-                    value = cells[1].get_attribute('textContent').strip()
-                    if key and value:
-                        nutritional_profile[value] = key  # Swap key and value
-
-            # Transform the nutritional profile
-            data["Nutritional Profile (from Source)"] = transform_nutritional_profile(nutritional_profile)
-
-            # Extract detailed nutritional information
-            detailed_nutrition_div = driver.find_element(By.ID, 'mntl-nutrition-facts-label_1-0')
-            wrapper_div = detailed_nutrition_div.find_element(By.CLASS_NAME, 'mntl-nutrition-facts-label__wrapper')
-            contents_div = wrapper_div.find_element(By.CLASS_NAME, 'mntl-nutrition-facts-label__contents')
-            table = contents_div.find_element(By.CLASS_NAME, 'mntl-nutrition-facts-label__table')
-            tbody = table.find_element(By.CLASS_NAME, 'mntl-nutrition-facts-label__table-body')
-            rows = tbody.find_elements(By.TAG_NAME, 'tr')
-
-            detailed_nutritional_profile = {}
-
-            for row in rows:
-                td_elements = row.find_elements(By.TAG_NAME, 'td')
-                # Extract the text from the <span> element
-                if len(td_elements) == 2:
-                    span_element = td_elements[0].find_element(By.CLASS_NAME, 'mntl-nutrition-facts-label__nutrient-name')
-                    key = span_element.get_attribute('textContent').strip()
-                    detailed_nutritional_profile[key] = td_elements[0].get_attribute('textContent').strip()
-
-            data["Nutritional Profile Detailed (from Source)"] = convert_nutritional_profile(detailed_nutritional_profile)
-
-        except Exception as e:
-            print(f"Error extracting nutritional information: {e}")
-            data["Nutritional Profile (from Source)"] = {}
-            data["Nutritional Profile Detailed (from Source)"] = {}
-
-        # Extract ingredient information
-        try:
-            ingredients_div = driver.find_element(By.CLASS_NAME, 'mntl-structured-ingredients__list')
-            ingredient_items = ingredients_div.find_elements(By.CLASS_NAME, 'mntl-structured-ingredients__list-item')
-
-            unicode_fractions = {
-                "\u00bd": "1/2",
-                "\u00bc": "1/4",
-                "\u00be": "3/4",
-                "\u2153": "1/3",
-                "\u2154": "2/3",
-                "\u215b": "1/8",
-                "\u215c": "3/8",
-                "\u215d": "5/8",
-                "\u215e": "7/8"
-            }
-
-            ingredients = []
-            for item in ingredient_items:
-                spans = item.find_elements(By.TAG_NAME, 'span')
-                quantity = spans[0].get_attribute('textContent').strip() if len(spans) > 0 else ""
-                unit = spans[1].get_attribute('textContent').strip() if len(spans) > 1 else ""
-                name = spans[2].get_attribute('textContent').strip() if len(spans) > 2 else ""
-
-                # Replace Unicode fractions with their textual representation
-                for unicode_char, fraction in unicode_fractions.items():
-                    quantity = quantity.replace(unicode_char, fraction)
-
-                ingredient = f"{quantity} {unit} {name}".strip()
-                ingredients.append(ingredient)
-
-            data["Ingredients (from source)"] = ingredients
-
-        except Exception as e:
-            print(f"Error extracting ingredients information: {e}")
-            data["Ingredients (from source)"] = []
-
-        # Extract the text inside <p> element with class "article-subheading type--dog"
-        try:
-            about_recipe_element = driver.find_element(By.CLASS_NAME, 'article-subheading.type--dog')
-            data["About Recipe"] = about_recipe_element.text.strip()
-        except Exception as e:
-            print(f"Error extracting about recipe information: {e}")
-            data["About Recipe"] = ""
-
-        log_url_status(source_url, True, source_log_file)
-        return data
-
+        open_and_wait(driver, source_url, page, (By.ID, 'mntl-recipe-details_1-0'))
+        return extract_source_data_from_driver(driver)
     finally:
-        # Close the WebDriver
-        driver.quit()
-
-# Function to parse the detailed nutritional data
-def parse_nutritional_data(data_list):
-    nutritional_dict = {}
-    for item in data_list:
-        # Use regular expression to separate the key and value
-        match = re.match(r'(.+)\s\((g|mg)\)\s(.+)', item)
-        if match:
-            key = match.group(1).strip()
-            unit = match.group(2)
-            value = match.group(3).strip()
-            nutritional_dict[f"{key} ({unit})"] = value
-    return nutritional_dict
-
-# Function to parse the Cuisine Origin into nested structure
-def parse_cuisine_origin(cuisine_origin):
-    cuisine_origin = cuisine_origin.replace("Cuisine\n", "").strip()  # Clean up the input
-    parts = cuisine_origin.split(" >> ")
-    cuisine_dict = {
-        "continent": parts[0] if len(parts) > 0 else "",
-        "region": parts[1] if len(parts) > 1 else "",
-        "country": parts[2] if len(parts) > 2 else ""
-    }
-    if cuisine_dict["country"] == "Indian":
-        cuisine_dict["state"] = ""
-    return cuisine_dict
-
-# Function to parse the preparation time into a nested structure
-def parse_preparation_time(preparation_time):
-    preparation_time = preparation_time.replace("Preparation Time\n", "").strip()
-    cooking_time_match = re.search(r'Cooking Time - (\d+) minutes', preparation_time)
-    prep_time_match = re.search(r'Preparation Time - (\d+) minutes', preparation_time)
-    
-    cooking_time = int(cooking_time_match.group(1)) if cooking_time_match else 0
-    prep_time = int(prep_time_match.group(1)) if prep_time_match else 0
-    total_time = cooking_time + prep_time
-    
-    return {
-        "Cooking Time (Minutes)": cooking_time,
-        "Preparation Time (Minutes)": prep_time,
-        "Total Time (Minutes)": total_time
-    }
+        # Return the WebDriver to the pool
+        driver_pool.release(driver)
 
 # Main function to combine everything
-def process_url(url, source_log_file):
+def process_url(url, source_log_file, page=None, latencies=None, extract_source=None):
+    # Per-stage timings are recorded into `latencies` when a dict is passed in
+    if latencies is None:
+        latencies = {}
+    # `extract_source(source_url, source_log_file)` replaces the shared, cached source extraction
+    if extract_source is None:
+        extract_source = extract_servings_from_source
+
+    # Download the page once; every stage below reuses this body
+    if page is None:
+        with recipe_stage_seconds.time(latencies, stage='fetch'):
+            page = fetch_page(url)
+
     # Extract table data
-    nutritional_profile, ingredients = extract_tables(url)
+    with recipe_stage_seconds.time(latencies, stage='tables'):
+        nutritional_profile, ingredients = extract_tables(url, page)
 
     # Click the "Show More" button and extract detailed nutritional data
-    detailed_data = click_show_more_button(url)
-
-    # Parse the detailed nutritional data
-    detailed_nutritional_profile = parse_nutritional_data(detailed_data["details"])
-    title = detailed_data["title"]
-    cuisine_origin = parse_cuisine_origin(detailed_data["Cuisine Origin"])
-    time_data = parse_preparation_time(detailed_data["Preparation Time"])
-    dietary_details = detailed_data["Dietary Details"]
-    source_info = detailed_data["Source Info"]
-    instructions = detailed_data["Instructions"]
+    with recipe_stage_seconds.time(latencies, stage='show_more'):
+        detailed_data = click_show_more_button(url, page)
 
     # Extract servings and nutritional information from the source URL
-    servings_data = extract_servings_from_source(source_info, source_log_file)
-
-    # Combine everything into the final JSON structure
-    final_json = {
-        "title": title,
-        "Cuisine Origin": cuisine_origin,
-        "Dietary Details": dietary_details,
-        "Time": time_data,
-        "Source Info": source_info,
-        "Servings": servings_data["Servings"],
-        "Yield": servings_data["Yield"],
-        "Time (from Source)": servings_data["Time (from Source)"],
-        "Nutritional Profile (from Source)": servings_data["Nutritional Profile (from Source)"],
-        "Nutritional Profile Detailed (from Source)": servings_data["Nutritional Profile Detailed (from Source)"],
-        "Estimated Nutritional Profile": nutritional_profile,
-        "Ingredients": ingredients,
-        "Ingredients (from source)": servings_data["Ingredients (from source)"],
-        "Estimated Nutritional Profile detailed": detailed_nutritional_profile,
-        "Instructions": instructions,
-        "About Recipe": servings_data["About Recipe"]
-    }
-
-    return final_json
-
-# Function to log the URL existence status
-def log_url_status(url, status, log_file):
-    log_exists = os.path.exists(log_file)
-    with open(log_file, 'a', newline='') as file:
-        writer = csv.writer(file)
-        if not log_exists:
-            writer.writerow(["URL", "Exists"])
-        writer.writerow([url, status])
+    with recipe_stage_seconds.time(latencies, stage='source'):
+        servings_data = extract_source(detailed_data["Source Info"], source_log_file)
+
+    return build_recipe_record(nutritional_profile, ingredients, detailed_data, servings_data)
+
+# Function to log the URL existence status; rows are buffered and written by a background thread
+def log_url_status(url, status, log_file, recipe_id=None, http_status=None, latencies=None, reason=""):
+    get_logger(log_file).log(url, status, recipe_id, http_status, latencies, reason)
+
+# Function to build the RecipeDB URL for a recipe ID
+def recipe_url(i):
+    return f'{RECIPEDB_URL}{i}'
+
+# Function to point the crawler at another RecipeDB host, such as the benchmark fixture server
+def set_recipedb_url(url):
+    global RECIPEDB_URL
+    RECIPEDB_URL = url
+
+# Function to recover the recipe ID from a RecipeDB URL
+def recipe_id_from_url(url):
+    return int(url.rstrip('/').rsplit('/', 1)[-1])
+
+# Function to name the outcome of a recipe that raised, for the recipes_total counter
+def failure_outcome(error):
+    # Selenium's TimeoutException is matched by name so Selenium needn't be imported here
+    return 'timeout' if type(error).__name__ == 'TimeoutException' else 'error'
+
+# Function to check a downloaded recipe page: raises when it's unknown whether the recipe exists,
+# returns False (after logging it) when it doesn't
+def check_recipe_page(url, i, page, log_file, latencies):
+    if is_transient(page):
+        # The request failed or the server was overloaded, so we don't know yet whether the recipe exists
+        reason = page.error or f"HTTP {page.status_code}"
+        recipes_total.inc(outcome='fetch_error')
+        log_url_status(url, False, log_file, i, page.status_code, latencies, reason)
+        raise ConnectionError(f"Fetching {url} failed: {reason}")
+    if not page.ok:
+        recipes_total.inc(outcome='missing')
+        log_url_status(url, False, log_file, i, page.status_code, latencies, f"HTTP {page.status_code}")
+        print(f"Invalid URL: {url}")
+        return False
+    return True
+
+# Function to count and log how processing an existing recipe page went
+def log_recipe_outcome(url, i, page, log_file, latencies, error=None):
+    if error is not None:
+        recipes_total.inc(outcome=failure_outcome(error))
+        log_url_status(url, True, log_file, i, page.status_code, latencies, f"{type(error).__name__}: {error}")
+        return
+    recipes_total.inc(outcome='success')
+    log_url_status(url, True, log_file, i, page.status_code, latencies)
+    print(f"Processed URL: {url}")
 
 # Function to process a single URL (helper function for parallel execution)
 def process_single_url(i, log_file, source_log_file):
-    url = f'https://cosylab.iiitd.edu.in/recipedb/search_recipeInfo/{i}'
-    if is_valid_url(url):
-        log_url_status(url, True, log_file)
-        data = process_url(url, source_log_file)
-        print(f"Processed URL: {url}")
+    url = recipe_url(i)
+    recipes_in_flight.inc()
+    try:
+        latencies = {}
+        with recipe_stage_seconds.time(latencies, stage='fetch'):
+            # RecipeDB is the only host, so wait out an open circuit rather than failing every queued ID
+            page = fetch_page(url, wait_if_open=True)
+        if not check_recipe_page(url, i, page, log_file, latencies):
+            return None
+        try:
+            data = process_url(url, source_log_file, page, latencies)
+        except Exception as e:
+            log_recipe_outcome(url, i, page, log_file, latencies, e)
+            raise
+        log_recipe_outcome(url, i, page, log_file, latencies)
         return data
+    finally:
+        recipes_in_flight.dec()
+
+# Function to record the outcome of one ID, streaming found recipes to the output writer
+def record_recipe_result(i, result, job_state, writer):
+    if result:
+        # Only mark the ID done once its record has been flushed to the output
+        writer.write({"Recipe ID": i, **result}, on_written=lambda: job_state.mark_done(i))
     else:
-        log_url_status(url, False, log_file)
-        print(f"Invalid URL: {url}")
-        return None
+        job_state.mark_missing(i)
 
 # Function to handle multiple URLs in parallel
-def handle_multiple_urls(start, end, output_file_prefix, log_file, source_log_file):
-    all_data = []
-    batch_number = 1
-
-    # Create a thread pool to process URLs in parallel
-    with ThreadPoolExecutor(max_workers=40) as executor:
-        for i in range(start, end + 1, 10000):
-            batch_start = i
-            batch_end = min(i + 9999, end)
-            futures = [executor.submit(process_single_url, j, log_file, source_log_file) for j in range(batch_start, batch_end + 1)]
-
-            for future in as_completed(futures):
-                result = future.result()
-                if result:
-                    all_data.append(result)
-            
-            # Save batch to file
-            batch_output_file = f"{output_file_prefix}_{batch_number}.json"
-            with open(batch_output_file, 'w') as file:
-                json.dump(all_data, file, indent=2)
-            
-            print(f"Saved batch {batch_number} to {batch_output_file}")
-            batch_number += 1
-            all_data = []  # Clear the list for the next batch
-
-# Example usage
-start_id = 5000
-end_id = 200000  # Adjust this range for testing
-output_file_prefix = 'output'
-log_file = 'url_log.csv'
-source_log_file = 'source_log.csv'
-handle_multiple_urls(start_id, end_id, output_file_prefix, log_file, source_log_file)
+def handle_multiple_urls(start, end, output_file_prefix, log_file, source_log_file, state_file='crawl_state.db',
+                         rotate_records=10000, compression=None, id_index_file=None, workers=40):
+    # Per-ID state survives crashes, so a rerun skips finished IDs and retries failures
+    job_state = JobStateStore(state_file)
+    # With an ID index from id_discovery, only IDs known to exist are scraped
+    id_index = IdIndex(id_index_file) if id_index_file else None
+    # Results are streamed to disk as they arrive instead of being held per batch
+    writer = JsonlWriter(output_file_prefix, rotate_records=rotate_records, compression=compression)
+
+    try:
+        # Create a thread pool to process URLs in parallel
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Submit at most 10,000 IDs at a time to bound the number of pending futures
+            for i in range(start, end + 1, 10000):
+                batch_start = i
+                batch_end = min(i + 9999, end)
+                ids = job_state.ids_to_process(batch_start, batch_end)
+                if id_index is not None:
+                    live_ids = set(id_index.live_ids(batch_start, batch_end))
+                    ids = [j for j in ids if j in live_ids]
+
+                while ids:
+                    futures = {executor.submit(process_single_url, j, log_file, source_log_file): j for j in ids}
+                    ids_pending.set(len(futures))
+
+                    for future in as_completed(futures):
+                        ids_pending.dec()
+                        j = futures[future]
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            print(f"Failed ID {j}: {e}")
+                            job_state.mark_failed(j, e)
+                            continue
+                        try:
+                            record_recipe_result(j, result, job_state, writer)
+                        except OutputWriterError:
+                            # The output is down, not the recipe: stop the crawl without using up any retries
+                            for pending in futures:
+                                pending.cancel()
+                            raise
+
+                    # Retry failed IDs until they run out of attempts
+                    ids = job_state.retryable_failures(batch_start, batch_end)
+
+                print(f"Finished IDs {batch_start}-{batch_end}, {writer.records_written} recipes written")
+                print(f"Driver pool stats: {driver_pool.stats()}")
+                print(f"Source cache stats: {source_cache.stats()}")
+                print(f"Crawl state: {job_state.summary()}")
+    finally:
+        # Flush pending records before closing the state store they report back to
+        writer.close()
+        # Shut down the idle browsers once the crawl is finished
+        driver_pool.close()
+        job_state.close()
+        if id_index is not None:
+            id_index.close()
+        close_loggers()
+
+# Function to rerun the whole pipeline over an HTML archive without any network access
+def replay_archive(archive_dir, output_file_prefix, log_file, source_log_file, workers=None, compression=None):
+    archive = HtmlArchive(archive_dir)
+    use_archive(archive, replay=True)
+    writer = JsonlWriter(output_file_prefix, rotate_records=10000, compression=compression)
+
+    def replay_url(url):
+        recipe_id = recipe_id_from_url(url)
+        try:
+            result = process_url(url, source_log_file)
+            log_url_status(url, True, log_file, recipe_id)
+            writer.write({"Recipe ID": recipe_id, **result})
+        except OutputWriterError:
+            raise
+        except Exception as e:
+            log_url_status(url, True, log_file, recipe_id, reason=f"{type(e).__name__}: {e}")
+            print(f"Failed to replay {url}: {e}")
+
+    try:
+        urls = archive.urls(prefix=recipe_url(''), status=200)
+        print(f"Replaying {len(urls)} archived recipes")
+        with ThreadPoolExecutor(max_workers=workers or driver_pool.size) as executor:
+            list(executor.map(replay_url, urls))
+        print(f"Replayed {writer.records_written} recipes")
+    finally:
+        writer.close()
+        driver_pool.close()
+        use_archive(None)
+        archive.close()
+        close_loggers()
+
+if __name__ == '__main__':
+    # Kept so `python recipeDbParser_v0.py [--replay]` still works; see cli.py for every option
+    from cli import main
+    main()
@@ -0,0 +1,385 @@
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+from json_stream import iter_output_records
+from recipe_parsers import NUTRIENT_PROFILES, split_nutrient_key, to_float
+from state_classifier import StateClassifier
+
+# Inverted index fields
+INGREDIENT = 'ingredient'
+TITLE = 'title'
+STATE = 'state'
+COUNTRY = 'country'
+
+# Words in ingredient lines that never name the ingredient itself
+_INGREDIENT_STOPWORDS = frozenset("""
+    a an and or of to the for with in into as at by if
+    cup teaspoon tablespoon tsp tbsp tbs g gram kg kilogram mg ml l liter litre oz ounce lb pound
+    pinch dash clove piece slice can package packet bunch sprig stick inch quart pint
+    chopped diced sliced minced grated crushed peeled fresh large small medium finely roughly thinly
+    cut taste optional needed divided plus more about whole
+""".split())
+_WORD_PATTERN = re.compile(r'[a-z]+')
+
+
+# Function to reduce a word to a common form so "tomatoes" matches "tomato" and "chillies" matches "chilli"
+def normalize_word(word):
+    if len(word) > 4 and word.endswith('ies'):
+        word = word[:-2]
+    elif len(word) > 4 and word.endswith(('oes', 'ches', 'shes', 'sses', 'xes')):
+        word = word[:-2]
+    elif len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        word = word[:-1]
+    # "berry", "berries" and "chilly", "chilli" all end up with a trailing i
+    if len(word) > 2 and word.endswith('y') and word[-2] not in 'aeiou':
+        word = word[:-1] + 'i'
+    return word
+
+
+# Function to split text into normalized index terms
+def tokenize(text, stopwords=frozenset()):
+    return [normalize_word(word) for word in _WORD_PATTERN.findall(str(text).lower())
+            if len(word) > 1 and word not in stopwords]
+
+
+def ingredient_terms(text):
+    return tokenize(text, _INGREDIENT_STOPWORDS)
+
+
+# Function to name a nutrient's numeric index field, e.g. "estimated.protein"
+def nutrient_field(profile, key):
+    name, _ = split_nutrient_key(key)
+    return f"{profile}.{' '.join(name.lower().split())}"
+
+
+# Function to collect the numeric index values of a recipe; unknown times and servings (0) are left out
+def numeric_values(recipe):
+    times = recipe.get("Time") or {}
+    source_times = recipe.get("Time (from Source)") or {}
+    values = {
+        "prep_minutes": to_float(times.get("Preparation Time (Minutes)")),
+        "cook_minutes": to_float(times.get("Cooking Time (Minutes)")),
+        "total_minutes": (to_float(times.get("Total Time (Minutes)"))
+                          or to_float(source_times.get("Total Time (Minutes)"))),
+        "servings": to_float(recipe.get("Servings")),
+    }
+    values = {field: value for field, value in values.items() if value}
+
+    for profile, key in NUTRIENT_PROFILES.items():
+        nutrients = recipe.get(key) or {}
+        if isinstance(nutrients, dict):
+            for name, value in nutrients.items():
+                number = to_float(value)
+                if number is not None:
+                    values[nutrient_field(profile, name)] = number
+    return values
+
+
+class RecipeIndex:
+    """Persistent query index over scraper output, so queries never load the corpus.
+
+    Holds inverted indexes from normalized ingredient, title, state and country
+    terms to recipe IDs, sorted numeric indexes on times, servings and every
+    nutrient, and a compressed copy of each record. It is stored in SQLite as
+    clustered (WITHOUT ROWID) B-trees and read through a memory map of up to
+    `mmap_bytes`. `ingest` is incremental: unchanged files are skipped, grown
+    JSONL parts are read from where the last ingest stopped, compressed parts
+    that are still being written are retried on the next ingest, and a recipe
+    seen again replaces its old entries.
+    """
+
+    def __init__(self, path='recipe_index.db', mmap_bytes=1 << 30, classifier=None):
+        self.path = path
+        self.classifier = classifier or StateClassifier()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(f'PRAGMA mmap_size={int(mmap_bytes)}')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS recipes (
+                recipe_id INTEGER PRIMARY KEY,
+                title TEXT,
+                record BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS terms (
+                field TEXT NOT NULL,
+                term TEXT NOT NULL,
+                recipe_id INTEGER NOT NULL,
+                PRIMARY KEY (field, term, recipe_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS numbers (
+                field TEXT NOT NULL,
+                value REAL NOT NULL,
+                recipe_id INTEGER NOT NULL,
+                PRIMARY KEY (field, value, recipe_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS terms_by_recipe ON terms (recipe_id);
+            CREATE INDEX IF NOT EXISTS numbers_by_recipe ON numbers (recipe_id);
+            CREATE TABLE IF NOT EXISTS ingested_files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                offset INTEGER NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def _terms(self, recipe):
+        terms = set()
+        terms.update((TITLE, term) for term in tokenize(recipe.get("title", "")))
+
+        ingredients = recipe.get("Ingredients") or {}
+        if isinstance(ingredients, dict):
+            for ingredient in ingredients.values():
+                if isinstance(ingredient, dict):
+                    terms.update((INGREDIENT, term) for term in ingredient_terms(ingredient.get("Ingredient Name", "")))
+        for line in recipe.get("Ingredients (from source)") or []:
+            terms.update((INGREDIENT, term) for term in ingredient_terms(line))
+
+        origin = recipe.get("Cuisine Origin") or {}
+        states = origin.get("state") or []
+        if isinstance(states, str):
+            states = [states] if states else []
+        if not states:
+            # Records that were never enriched still get the states the text makes obvious
+            states, confidence = self.classifier.classify(recipe)
+            states = states if confidence >= 0.8 else []
+        terms.update((STATE, state.lower()) for state in states)
+        if origin.get("country"):
+            terms.add((COUNTRY, origin["country"].lower()))
+        return terms
+
+    def _add_locked(self, recipe_id, recipe):
+        if self._conn.execute('SELECT 1 FROM recipes WHERE recipe_id = ?', (recipe_id,)).fetchone():
+            self._conn.execute('DELETE FROM terms WHERE recipe_id = ?', (recipe_id,))
+            self._conn.execute('DELETE FROM numbers WHERE recipe_id = ?', (recipe_id,))
+        body = zlib.compress(json.dumps(recipe, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        self._conn.execute('INSERT OR REPLACE INTO recipes (recipe_id, title, record) VALUES (?, ?, ?)',
+                           (recipe_id, recipe.get("title"), body))
+        self._conn.executemany('INSERT OR IGNORE INTO terms (field, term, recipe_id) VALUES (?, ?, ?)',
+                               [(field, term, recipe_id) for field, term in self._terms(recipe)])
+        self._conn.executemany('INSERT OR IGNORE INTO numbers (field, value, recipe_id) VALUES (?, ?, ?)',
+                               [(field, value, recipe_id) for field, value in numeric_values(recipe).items()])
+
+    def add(self, recipes):
+        """Index `(recipe ID, record)` pairs in one transaction, replacing earlier versions."""
+        count = 0
+        with self._lock:
+            for recipe_id, recipe in recipes:
+                self._add_locked(recipe_id, recipe)
+                count += 1
+            self._conn.commit()
+        return count
+
+    def _records_since(self, path, offset):
+        """Yield `(end offset, record)` for a plain JSONL part starting at byte `offset`."""
+        with open(path, 'rb') as file:
+            file.seek(offset)
+            for line in file:
+                if not line.endswith(b'\n'):
+                    # A part still being written may end in a partial line; pick it up next time
+                    break
+                offset += len(line)
+                if line.strip():
+                    yield offset, json.loads(line)
+
+    def ingest_file(self, path, batch_size=1000):
+        """Index one output file if it changed since the last ingest; returns the number of records read.
+
+        Records without a "Recipe ID" (older outputs) are indexed under their position in the file.
+        """
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute('SELECT size, mtime_ns, offset FROM ingested_files WHERE path = ?',
+                                     (path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return 0
+
+        if path.endswith('.jsonl'):
+            # JSONL parts only ever grow, so continue from the last complete line read
+            start = row[2] if row is not None and stat.st_size >= row[0] else 0
+            pairs = self._records_since(path, start)
+        else:
+            start = 0
+            pairs = ((stat.st_size, record) for record in iter_output_records([path]))
+
+        offset = start
+        count = 0
+        batch = []
+        try:
+            for position, (offset, record) in enumerate(pairs):
+                recipe_id = record.get("Recipe ID")
+                if recipe_id is None:
+                    if start:
+                        # Positions only mean something when the file is read from its first record
+                        print(f"{path} has a record without a Recipe ID past offset {start}; not indexing it")
+                        return count + self.add(batch)
+                    # Older outputs (such as JSON arrays) have no IDs; use the position, as the columnar export does
+                    recipe_id = position
+                batch.append((int(recipe_id), record))
+                if len(batch) >= batch_size:
+                    count += self.add(batch)
+                    batch = []
+        except Exception as e:
+            if path.endswith('.jsonl'):
+                raise
+            # A compressed part the writer still has open ends mid-stream (EOFError, decompression or
+            # JSON errors). Keep what was read and leave the file unrecorded so the next ingest re-reads it.
+            count += self.add(batch)
+            print(f"{path} looks incomplete ({type(e).__name__}: {e}); it will be read again next time")
+            return count
+        count += self.add(batch)
+
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO ingested_files (path, size, mtime_ns, offset) '
+                               'VALUES (?, ?, ?, ?)', (path, stat.st_size, stat.st_mtime_ns, offset))
+            self._conn.commit()
+        return count
+
+    def ingest(self, paths):
+        """Index every changed file in `paths`; returns the number of records read."""
+        total = 0
+        for path in paths:
+            count = self.ingest_file(path)
+            if count:
+                print(f"Indexed {count} recipes from {path}")
+            total += count
+        return total
+
+    def resolve_states(self, names):
+        """Map state names or demonyms such as "Gujarati" to indexed state terms."""
+        states = []
+        for name in names:
+            found = self.classifier.find_states(name)
+            states += [state.lower() for state in found] or [name.lower()]
+        return states
+
+    def query(self, ingredients=(), title=(), states=(), country=None, minimum=None, maximum=None, limit=50):
+        """Return `[(recipe ID, title)]` of recipes matching every condition, by recipe ID.
+
+        `ingredients` and `title` are phrases whose words must all appear; `states`
+        match any of the given states; `minimum` and `maximum` map numeric fields
+        (see `fields`) to inclusive bounds.
+        """
+        parts = []
+        params = []
+        for field, phrases, split in ((INGREDIENT, ingredients, ingredient_terms), (TITLE, title, tokenize)):
+            for phrase in phrases:
+                for term in split(phrase):
+                    parts.append('SELECT recipe_id FROM terms WHERE field = ? AND term = ?')
+                    params += [field, term]
+        if states:
+            resolved = self.resolve_states(states)
+            parts.append(f"SELECT recipe_id FROM terms WHERE field = ? AND term IN ({', '.join('?' * len(resolved))})")
+            params += [STATE] + resolved
+        if country:
+            parts.append('SELECT recipe_id FROM terms WHERE field = ? AND term = ?')
+            params += [COUNTRY, country.lower()]
+        for bounds, operator in ((minimum, '>='), (maximum, '<=')):
+            for field, value in (bounds or {}).items():
+                parts.append(f'SELECT recipe_id FROM numbers WHERE field = ? AND value {operator} ?')
+                params += [field, float(value)]
+
+        if parts:
+            sql = (f"SELECT recipe_id, title FROM recipes WHERE recipe_id IN ({' INTERSECT '.join(parts)}) "
+                   "ORDER BY recipe_id LIMIT ?")
+        else:
+            sql = 'SELECT recipe_id, title FROM recipes ORDER BY recipe_id LIMIT ?'
+        with self._lock:
+            return self._conn.execute(sql, params + [limit]).fetchall()
+
+    def get(self, recipe_id):
+        """Return the stored record for a recipe ID, or None."""
+        with self._lock:
+            row = self._conn.execute('SELECT record FROM recipes WHERE recipe_id = ?', (recipe_id,)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def fields(self):
+        """Return the numeric fields that can be used in `minimum` and `maximum`."""
+        with self._lock:
+            # Skip-scan over the clustered index: one seek per distinct field
+            fields = []
+            row = self._conn.execute('SELECT MIN(field) FROM numbers').fetchone()
+            while row[0] is not None:
+                fields.append(row[0])
+                row = self._conn.execute('SELECT MIN(field) FROM numbers WHERE field > ?', (row[0],)).fetchone()
+        return fields
+
+    def stats(self):
+        with self._lock:
+            return {
+                "recipes": self._conn.execute('SELECT COUNT(*) FROM recipes').fetchone()[0],
+                "files": self._conn.execute('SELECT COUNT(*) FROM ingested_files').fetchone()[0],
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Function to parse "field=value" command-line bounds
+def parse_bounds(items):
+    bounds = {}
+    for item in items or []:
+        field, _, value = item.rpartition('=')
+        if not field:
+            raise argparse.ArgumentTypeError(f"Expected FIELD=VALUE, got {item!r}")
+        bounds[field] = float(value)
+    return bounds
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build and query an index over the scraper's output.")
+    parser.add_argument('--index', default='recipe_index.db')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = commands.add_parser('ingest', help="index new and changed output files")
+    ingest_parser.add_argument('inputs', nargs='+', help="output files or glob patterns, e.g. 'output_*.jsonl*'")
+    ingest_parser.add_argument('--watch', type=float, default=None,
+                               help="keep ingesting new batches every this many seconds")
+
+    query_parser = commands.add_parser('query', help="find recipes, e.g. --state Gujarati --ingredient paneer "
+                                                     "--max total_minutes=30")
+    query_parser.add_argument('--ingredient', action='append', default=[])
+    query_parser.add_argument('--title', action='append', default=[])
+    query_parser.add_argument('--state', action='append', default=[], help="state name or demonym")
+    query_parser.add_argument('--country', default=None)
+    query_parser.add_argument('--min', action='append', default=[], metavar='FIELD=VALUE')
+    query_parser.add_argument('--max', action='append', default=[], metavar='FIELD=VALUE')
+    query_parser.add_argument('--limit', type=int, default=50)
+    query_parser.add_argument('--records', action='store_true', help="print the full records as JSON lines")
+
+    commands.add_parser('fields', help="list the numeric fields usable with --min and --max")
+    args = parser.parse_args()
+
+    index = RecipeIndex(args.index)
+    try:
+        if args.command == 'ingest':
+            while True:
+                paths = sorted({path for pattern in args.inputs for path in glob.glob(pattern)})
+                index.ingest(paths)
+                if args.watch is None:
+                    break
+                time.sleep(args.watch)
+            print(f"Index: {index.stats()}")
+        elif args.command == 'query':
+            start = time.perf_counter()
+            rows = index.query(args.ingredient, args.title, args.state, args.country, parse_bounds(args.min),
+                               parse_bounds(args.max), args.limit)
+            elapsed = time.perf_counter() - start
+            for recipe_id, title in rows:
+                print(json.dumps({"Recipe ID": recipe_id, **index.get(recipe_id)}, ensure_ascii=False)
+                      if args.records else f"{recipe_id}\t{title}")
+            print(f"{len(rows)} recipes in {elapsed * 1000:.1f} ms")
+        else:
+            print('\n'.join(index.fields()))
+    finally:
+        index.close()
@@ -0,0 +1,256 @@
+import re
+from urllib.parse import urljoin
+
+from lxml import etree
+from lxml import html as lxml_html
+
+
+# Nested nutrient dicts in the scraper output, by the profile name they get in the nutrients table
+NUTRIENT_PROFILES = {
+    "estimated": "Estimated Nutritional Profile",
+    "estimated_detailed": "Estimated Nutritional Profile detailed",
+    "source": "Nutritional Profile (from Source)",
+    "source_detailed": "Nutritional Profile Detailed (from Source)",
+}
+
+_number_pattern = re.compile(r'-?\d+(?:\.\d+)?')
+_fraction_pattern = re.compile(r'^(?:(\d+)\s+)?(\d+)\s*/\s*(\d+)$')
+_unit_pattern = re.compile(r'^(.*?)\s*\(([^()]*)\)\s*$')
+
+
+# Function to read a number stored as a number or a string such as "103.7" or "12g"
+def to_float(value):
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _number_pattern.search(str(value).replace(',', ''))
+    return float(match.group(0)) if match else None
+
+
+def to_int(value):
+    number = to_float(value)
+    return int(number) if number is not None else None
+
+
+# Function to read an ingredient quantity such as "2", "1.5", "1/2" or "1 1/2"
+def parse_quantity(text):
+    text = str(text or '').strip()
+    match = _fraction_pattern.match(text)
+    if match:
+        whole, numerator, denominator = match.groups()
+        if int(denominator) == 0:
+            return None
+        return int(whole or 0) + int(numerator) / int(denominator)
+    return to_float(text)
+
+
+# Function to split a nutrient key such as "Protein (g)" or "Protein(g)" into name and unit
+def split_nutrient_key(key):
+    match = _unit_pattern.match(key)
+    if match:
+        return match.group(1).strip(), match.group(2).strip()
+    return key.strip(), ""
+
+
+# Cell texts pandas.read_html treats as missing, and numbers with optional thousands separators
+_MISSING_CELLS = {'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>',
+                  'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'}
+_int_cell_pattern = re.compile(r'^[-+]?\d{1,3}(?:,\d{3})+$|^[-+]?\d+$')
+_float_cell_pattern = re.compile(r'^[-+]?(?:\d{1,3}(?:,\d{3})+|\d*)(?:\.\d*)?(?:[eE][-+]?\d+)?$')
+_cell_whitespace_pattern = re.compile(r'[\r\n]+|\s{2,}')
+
+# Block elements that start a new line in rendered text, as in a browser's element.text
+_BLOCK_TAGS = {'address', 'article', 'aside', 'blockquote', 'dd', 'div', 'dl', 'dt', 'footer', 'form', 'h1', 'h2',
+               'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'tr', 'ul'}
+
+
+# Function to read a table's rows as cell texts, splitting off the leading all-<th> header rows
+def _table_rows(table):
+    header = [tr.xpath('./th|./td') for tr in table.xpath('./thead/tr')]
+    body = [tr.xpath('./th|./td') for tr in table.xpath('./tr|./tbody/tr')]
+    while not header and body and all(cell.tag == 'th' for cell in body[0]):
+        header.append(body.pop(0))
+    while len(header) > 1:
+        # Only single-row headers are used on recipe pages
+        header.pop(0)
+    text = lambda cell: _cell_whitespace_pattern.sub(' ', cell.text_content().strip())
+    return [text(cell) for row in header for cell in row], [[text(cell) for cell in row] for row in body]
+
+
+# Function to convert a column of cell texts the way pandas.read_html does: all ints, else all floats, else text
+def _convert_column(values):
+    present = [value for value in values if value not in _MISSING_CELLS]
+    if present and all(_int_cell_pattern.match(value) for value in present):
+        convert = int if len(present) == len(values) else float
+    elif present and all(_float_cell_pattern.match(value) and any(c.isdigit() for c in value) for value in present):
+        convert = float
+    else:
+        return [None if value in _MISSING_CELLS else value for value in values]
+    return [None if value in _MISSING_CELLS else convert(value.replace(',', '')) for value in values]
+
+
+# Function to read an HTML table as a list of row dicts without the empty cells
+def _table_records(table):
+    columns, rows = _table_rows(table)
+    rows = [row + [''] * (len(columns) - len(row)) for row in rows]
+    converted = [_convert_column(list(column)) for column in zip(*rows)] if rows else []
+    return [{name: value for name, value in zip(columns, values) if value is not None} for values in zip(*converted)]
+
+
+# Function to parse the nutrient and ingredient tables of a recipe page's HTML
+def parse_recipe_tables(html):
+    # Parsed with lxml rather than pandas.read_html, which takes seconds to import, with the same
+    # cell conversion: numeric columns become numbers and empty cells are left out
+    tables = [table for table in lxml_html.fromstring(html).iter('table')
+              if table.text_content().strip() and 'display:none' not in table.get('style', '').replace(' ', '')]
+    if len(tables) < 2:
+        raise ValueError(f"Expected the nutrient and ingredient tables, found {len(tables)} tables")
+    nutrients = _table_records(tables[0])
+    ingredients = _table_records(tables[1])
+
+    nutritional_profile = {row.get('Nutrient'): row.get('Quantity') for row in nutrients}
+    ingredient_rows = {index: {'index': index, **row} for index, row in enumerate(ingredients)}
+    return nutritional_profile, ingredient_rows
+
+
+# Function to get an element's text as a browser renders it: one line per block or <br>, whitespace collapsed
+def _rendered_text(element):
+    parts = []
+
+    def walk(node):
+        if not isinstance(node.tag, str) or node.tag in ('script', 'style'):
+            return
+        block = node.tag in _BLOCK_TAGS or node.tag == 'br'
+        if block:
+            parts.append('\n')
+        parts.append(node.text or '')
+        for child in node:
+            walk(child)
+            parts.append(child.tail or '')
+        if block:
+            parts.append('\n')
+
+    walk(element)
+    lines = (' '.join(line.split()) for line in ''.join(parts).split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+def _inner_html(element):
+    return (element.text or '') + ''.join(etree.tostring(child, encoding='unicode', method='html') for child in element)
+
+
+# Function to read the recipe details from a recipe page's DOM after "Show More" was clicked
+def parse_recipe_details(html, url):
+    """Return the detailed data dict read from the post-click DOM; `url` resolves the relative source link."""
+    root = lxml_html.fromstring(html)
+    h3 = root.find('.//h3')
+    if h3 is None:
+        raise LookupError("Unable to locate element: h3")
+    collections = root.xpath(".//ul[contains(concat(' ', normalize-space(@class), ' '), ' collection ')]")
+    if not collections:
+        raise LookupError("Unable to locate element: ul.collection")
+    li_elements = collections[0].findall('li')
+
+    source_info = ""
+    if len(li_elements) > 3:
+        links = li_elements[3].xpath('.//a')
+        if not links:
+            raise LookupError("Unable to locate element: a")
+        href = links[0].get('href')
+        source_info = urljoin(url, href.strip()) if href is not None else None
+
+    dietary_details = ""
+    if len(li_elements) > 1:
+        dietary = root.xpath(".//*[@id='dietary-text']")
+        if not dietary:
+            raise LookupError("Unable to locate element: #dietary-text")
+        dietary_details = _rendered_text(dietary[0]).strip()
+
+    big_rows = root.xpath(".//*[contains(concat(' ', normalize-space(@class), ' '), ' bigRows ')]")
+    steps = root.xpath(".//*[@id='steps']")
+    return {
+        "title": _rendered_text(h3),
+        "Cuisine Origin": _rendered_text(li_elements[0]).strip() if len(li_elements) > 0 else "",
+        "Dietary Details": dietary_details,
+        "Preparation Time": _rendered_text(li_elements[2]).strip() if len(li_elements) > 2 else "",
+        "Source Info": source_info,
+        "details": [_rendered_text(element) for element in big_rows],
+        "Instructions": [_inner_html(p) for p in steps[0].iter('p')] if steps else [],
+    }
+
+
+# Function to parse the detailed nutritional data
+def parse_nutritional_data(data_list):
+    nutritional_dict = {}
+    for item in data_list:
+        # Use regular expression to separate the key and value
+        match = re.match(r'(.+)\s\((g|mg)\)\s(.+)', item)
+        if match:
+            key = match.group(1).strip()
+            unit = match.group(2)
+            value = match.group(3).strip()
+            nutritional_dict[f"{key} ({unit})"] = value
+    return nutritional_dict
+
+# Function to parse the Cuisine Origin into nested structure
+def parse_cuisine_origin(cuisine_origin):
+    cuisine_origin = cuisine_origin.replace("Cuisine\n", "").strip()  # Clean up the input
+    parts = cuisine_origin.split(" >> ")
+    cuisine_dict = {
+        "continent": parts[0] if len(parts) > 0 else "",
+        "region": parts[1] if len(parts) > 1 else "",
+        "country": parts[2] if len(parts) > 2 else ""
+    }
+    if cuisine_dict["country"] == "Indian":
+        cuisine_dict["state"] = ""
+    return cuisine_dict
+
+# Function to parse the preparation time into a nested structure
+def parse_preparation_time(preparation_time):
+    preparation_time = preparation_time.replace("Preparation Time\n", "").strip()
+    cooking_time_match = re.search(r'Cooking Time - (\d+) minutes', preparation_time)
+    prep_time_match = re.search(r'Preparation Time - (\d+) minutes', preparation_time)
+    
+    cooking_time = int(cooking_time_match.group(1)) if cooking_time_match else 0
+    prep_time = int(prep_time_match.group(1)) if prep_time_match else 0
+    total_time = cooking_time + prep_time
+    
+    return {
+        "Cooking Time (Minutes)": cooking_time,
+        "Preparation Time (Minutes)": prep_time,
+        "Total Time (Minutes)": total_time
+    }
+
+# Function to combine the outputs of every stage into the final JSON structure
+def build_recipe_record(nutritional_profile, ingredients, detailed_data, servings_data):
+    # Parse the detailed nutritional data
+    detailed_nutritional_profile = parse_nutritional_data(detailed_data["details"])
+    title = detailed_data["title"]
+    cuisine_origin = parse_cuisine_origin(detailed_data["Cuisine Origin"])
+    time_data = parse_preparation_time(detailed_data["Preparation Time"])
+    dietary_details = detailed_data["Dietary Details"]
+    source_info = detailed_data["Source Info"]
+    instructions = detailed_data["Instructions"]
+
+    # Combine everything into the final JSON structure
+    final_json = {
+        "title": title,
+        "Cuisine Origin": cuisine_origin,
+        "Dietary Details": dietary_details,
+        "Time": time_data,
+        "Source Info": source_info,
+        "Servings": servings_data["Servings"],
+        "Yield": servings_data["Yield"],
+        "Time (from Source)": servings_data["Time (from Source)"],
+        "Nutritional Profile (from Source)": servings_data["Nutritional Profile (from Source)"],
+        "Nutritional Profile Detailed (from Source)": servings_data["Nutritional Profile Detailed (from Source)"],
+        "Estimated Nutritional Profile": nutritional_profile,
+        "Ingredients": ingredients,
+        "Ingredients (from source)": servings_data["Ingredients (from source)"],
+        "Estimated Nutritional Profile detailed": detailed_nutritional_profile,
+        "Instructions": instructions,
+        "About Recipe": servings_data["About Recipe"]
+    }
+
+    return final_json
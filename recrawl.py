@@ -0,0 +1,415 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import metrics
+from crawl_logger import close_loggers
+from fetcher import fetch_page
+from id_discovery import IdIndex
+from output_writer import JsonlWriter, OutputWriterError
+from recipeDbParser_v0 import (
+    driver_pool,
+    fetch_and_extract_source,
+    log_url_status,
+    process_url,
+    recipe_stage_seconds,
+    recipe_url,
+    source_cache,
+)
+from resilience import is_transient
+from source_cache import normalize_source_url
+
+# Kinds of change recorded for each recipe ID in a refresh
+NEW = 'new'
+MODIFIED = 'modified'
+REMOVED = 'removed'
+UNCHANGED = 'unchanged'
+MISSING = 'missing'
+FAILED = 'failed'
+
+refresh_changes_total = metrics.counter('refresh_changes_total', "Recipe IDs checked by incremental refreshes, "
+                                        "by change", ['change'])
+
+# Validators and normalized content hash stored for a page
+PageState = namedtuple('PageState', ['etag', 'last_modified', 'content_hash'])
+# What the last successful extraction of a recipe was built from
+RecipeState = namedtuple('RecipeState', ['source_url', 'page_hash', 'source_hash', 'record_hash', 'live'])
+
+_COMMENTS = re.compile(r'<!--.*?-->', re.DOTALL)
+_CSRF_INPUTS = re.compile(r'<input[^>]*name="[^"]*(?:csrf|token)[^"]*"[^>]*>', re.IGNORECASE)
+
+
+# Function to hash a page with comments, CSRF tokens and whitespace differences removed
+def content_hash(text):
+    normalized = ' '.join(_CSRF_INPUTS.sub('', _COMMENTS.sub('', text)).split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+# Function to hash an extracted record independently of key order
+def record_hash(record):
+    return hashlib.sha256(json.dumps(record, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+# Function to build If-None-Match / If-Modified-Since headers from a stored page state
+def conditional_headers(state):
+    headers = {}
+    if state is not None and state.etag:
+        headers['If-None-Match'] = state.etag
+    if state is not None and state.last_modified:
+        headers['If-Modified-Since'] = state.last_modified
+    return headers
+
+
+class RecrawlState:
+    """What earlier crawls saw, backed by SQLite, so a refresh only re-extracts what changed.
+
+    Keeps the ETag, Last-Modified and content hash of every RecipeDB and source page,
+    the page and record hashes each recipe was last built from, and which recipes each
+    refresh found new, modified, removed or failed. Safe to share between worker threads.
+    """
+
+    def __init__(self, path='recrawl_state.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT NOT NULL,
+                checked_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS recipes (
+                recipe_id INTEGER PRIMARY KEY,
+                source_url TEXT,
+                page_hash TEXT,
+                source_hash TEXT,
+                record_hash TEXT,
+                live INTEGER NOT NULL,
+                changed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at REAL NOT NULL,
+                finished_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS changes (
+                run_id INTEGER NOT NULL,
+                recipe_id INTEGER NOT NULL,
+                change TEXT NOT NULL,
+                PRIMARY KEY (run_id, recipe_id)
+            );
+        """)
+        self._conn.commit()
+
+    def page(self, url):
+        with self._lock:
+            row = self._conn.execute('SELECT etag, last_modified, content_hash FROM pages WHERE url = ?',
+                                     (url,)).fetchone()
+        return PageState(*row) if row else None
+
+    def update_page(self, url, headers, digest):
+        headers = headers or {}
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO pages (url, etag, last_modified, content_hash, checked_at) '
+                               'VALUES (?, ?, ?, ?, ?)',
+                               (url, headers.get('ETag'), headers.get('Last-Modified'), digest, time.time()))
+            self._conn.commit()
+
+    def recipe(self, recipe_id):
+        with self._lock:
+            row = self._conn.execute('SELECT source_url, page_hash, source_hash, record_hash, live FROM recipes '
+                                     'WHERE recipe_id = ?', (recipe_id,)).fetchone()
+        return RecipeState(*row) if row else None
+
+    def save_recipe(self, recipe_id, source_url, page_hash, source_hash, digest):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO recipes (recipe_id, source_url, page_hash, source_hash, '
+                               'record_hash, live, changed_at) VALUES (?, ?, ?, ?, ?, 1, ?)',
+                               (recipe_id, source_url, page_hash, source_hash, digest, time.time()))
+            self._conn.commit()
+
+    def mark_removed(self, recipe_id):
+        with self._lock:
+            self._conn.execute('UPDATE recipes SET live = 0, changed_at = ? WHERE recipe_id = ?',
+                               (time.time(), recipe_id))
+            self._conn.commit()
+
+    def start_run(self):
+        with self._lock:
+            cursor = self._conn.execute('INSERT INTO runs (started_at) VALUES (?)', (time.time(),))
+            self._conn.commit()
+        return cursor.lastrowid
+
+    def finish_run(self, run_id):
+        with self._lock:
+            self._conn.execute('UPDATE runs SET finished_at = ? WHERE run_id = ?', (time.time(), run_id))
+            self._conn.commit()
+
+    def record_change(self, run_id, recipe_id, change):
+        """Remember a new, modified, removed or failed recipe; unchanged and missing IDs are only counted."""
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO changes (run_id, recipe_id, change) VALUES (?, ?, ?)',
+                               (run_id, recipe_id, change))
+            self._conn.commit()
+
+    def changes(self, run_id):
+        """Return `{change: [recipe IDs]}` for one run."""
+        with self._lock:
+            rows = self._conn.execute('SELECT change, recipe_id FROM changes WHERE run_id = ? ORDER BY recipe_id',
+                                      (run_id,)).fetchall()
+        changes = {}
+        for change, recipe_id in rows:
+            changes.setdefault(change, []).append(recipe_id)
+        return changes
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class Refresher:
+    """Re-checks recipes with conditional requests and re-extracts only those whose pages changed.
+
+    A recipe is re-extracted when its RecipeDB page or its source page hashes
+    differently from the versions its last record was built from. Each source page
+    is checked at most once per refresh, however many recipes share it.
+    """
+
+    def __init__(self, state, log_file, source_log_file):
+        self.state = state
+        self.log_file = log_file
+        self.source_log_file = source_log_file
+        self._source_hashes = {}
+        self._source_lock = threading.Lock()
+
+    def check_page(self, url, **fetch_options):
+        """Fetch a page conditionally; returns `(page, content hash)` with the hash None for failed fetches."""
+        stored = self.state.page(url)
+        page = fetch_page(url, headers=conditional_headers(stored), **fetch_options)
+        if page.status_code == 304 and stored is not None:
+            return page, stored.content_hash
+        if not page.ok:
+            return page, None
+        digest = content_hash(page.text)
+        self.state.update_page(url, page.headers, digest)
+        return page, digest
+
+    def _remember_source(self, key, digest):
+        with self._source_lock:
+            self._source_hashes[key] = digest
+
+    def source_hash(self, source_url):
+        """Return the current hash of a source page, checking it once per refresh.
+
+        Raises ConnectionError when the source can't be reached right now, so the
+        recipe is retried instead of being compared against an unknown hash.
+        """
+        if not source_url.strip():
+            return None
+        key = normalize_source_url(source_url)
+        with self._source_lock:
+            if key in self._source_hashes:
+                return self._source_hashes[key]
+        previous = self.state.page(source_url)
+        page, digest = self.check_page(source_url)
+        if is_transient(page):
+            raise ConnectionError(f"Fetching source {source_url} failed: {page.error or f'HTTP {page.status_code}'}")
+        if digest is not None and previous is not None and digest != previous.content_hash:
+            # Don't let a cached extraction of the old page stand in for the new one
+            source_cache.discard(key)
+        self._remember_source(key, digest)
+        return digest
+
+    def extract_source(self, source_url, source_log_file):
+        """Extract a source page for `process_url`, hashing the body that was fetched for the extraction.
+
+        Unlike the shared extraction, a source that can't be reached raises
+        ConnectionError rather than producing a record with blank source data.
+        """
+        key = normalize_source_url(source_url)
+        pages = []
+
+        def on_page(page):
+            pages.append(page)
+            if page.ok:
+                digest = content_hash(page.text)
+                self.state.update_page(source_url, page.headers, digest)
+                self._remember_source(key, digest)
+            elif not is_transient(page):
+                self._remember_source(key, None)
+
+        def compute():
+            data, cacheable = fetch_and_extract_source(source_url, source_log_file, on_page)
+            if pages and is_transient(pages[0]):
+                page = pages[0]
+                raise ConnectionError(f"Fetching source {source_url} failed: "
+                                      f"{page.error or f'HTTP {page.status_code}'}")
+            return data, cacheable
+
+        return source_cache.get_or_compute(key, compute)
+
+    def refresh(self, i):
+        """Return `(change, record, save)` for one recipe ID.
+
+        `record` is only set for new and modified recipes. Their state isn't saved
+        yet: `save()` stores the hashes the record was built from, and should run
+        once the record has reached the output, so a record that never gets written
+        is found changed again by the next refresh.
+        """
+        url = recipe_url(i)
+        previous = self.state.recipe(i)
+        latencies = {}
+        with recipe_stage_seconds.time(latencies, stage='fetch'):
+            page, page_hash = self.check_page(url, wait_if_open=True)
+        if is_transient(page):
+            reason = page.error or f"HTTP {page.status_code}"
+            log_url_status(url, False, self.log_file, i, page.status_code, latencies, reason)
+            raise ConnectionError(f"Fetching {url} failed: {reason}")
+
+        if page_hash is None:
+            log_url_status(url, False, self.log_file, i, page.status_code, latencies, f"HTTP {page.status_code}")
+            if previous is not None and previous.live:
+                self.state.mark_removed(i)
+                return REMOVED, None, None
+            return MISSING, None, None
+
+        if previous is not None and previous.live:
+            # Checked even when the recipe page changed, so a changed source is evicted from the cache first
+            try:
+                source_hash = self.source_hash(previous.source_url or '')
+            except ConnectionError as e:
+                log_url_status(url, True, self.log_file, i, page.status_code, latencies, str(e))
+                raise
+            if previous.page_hash == page_hash and previous.source_hash == source_hash:
+                log_url_status(url, True, self.log_file, i, page.status_code, latencies, "unchanged")
+                return UNCHANGED, None, None
+
+        if page.status_code == 304:
+            # Only the source changed, but rebuilding the record needs the recipe page body
+            with recipe_stage_seconds.time(latencies, stage='refetch'):
+                page = fetch_page(url, wait_if_open=True)
+            if not page.ok:
+                reason = page.error or f"HTTP {page.status_code}"
+                log_url_status(url, False, self.log_file, i, page.status_code, latencies, reason)
+                raise ConnectionError(f"Refetching {url} failed: {reason}")
+
+        try:
+            record = process_url(url, self.source_log_file, page, latencies, self.extract_source)
+            source_url = record["Source Info"]
+            # Usually known already from the extraction's own fetch; only a cached extraction needs a check
+            source_hash = self.source_hash(source_url)
+        except Exception as e:
+            log_url_status(url, True, self.log_file, i, page.status_code, latencies, f"{type(e).__name__}: {e}")
+            raise
+        log_url_status(url, True, self.log_file, i, page.status_code, latencies)
+
+        digest = record_hash(record)
+
+        def save():
+            self.state.save_recipe(i, source_url, page_hash, source_hash, digest)
+
+        if previous is None or not previous.live:
+            return NEW, record, save
+        if previous.record_hash == digest:
+            # The pages changed but nothing we extract from them did; there is nothing to write
+            save()
+            return UNCHANGED, None, None
+        return MODIFIED, record, save
+
+
+# Function to write the change report for a refresh run as JSON
+def write_change_report(state, run_id, counts, path):
+    changes = state.changes(run_id)
+    report = {
+        "run_id": run_id,
+        "generated_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "counts": dict(sorted(counts.items())),
+        **{change: changes.get(change, []) for change in (NEW, MODIFIED, REMOVED, FAILED)},
+    }
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Change report written to {path}: {report['counts']}")
+    return report
+
+
+# Function to refresh a range of IDs, writing only new and modified recipes and a change report
+def refresh_range(start, end, output_file_prefix, log_file, source_log_file, state_file='recrawl_state.db',
+                  report_file='change_report.json', rotate_records=10000, compression=None, id_index_file=None,
+                  workers=40, max_attempts=3):
+    state = RecrawlState(state_file)
+    id_index = IdIndex(id_index_file) if id_index_file else None
+    writer = JsonlWriter(output_file_prefix, rotate_records=rotate_records, compression=compression)
+    run_id = state.start_run()
+    refresher = Refresher(state, log_file, source_log_file)
+    counts = {}
+
+    def record(i, change, result=None, save=None):
+        refresh_changes_total.inc(change=change)
+        counts[change] = counts.get(change, 0) + 1
+        if result is None:
+            if change not in (UNCHANGED, MISSING):
+                # Unchanged and missing IDs are only counted; listing them would dwarf the report
+                state.record_change(run_id, i, change)
+            return
+
+        def on_written():
+            # Only once the record is on disk: if it never gets there, the next refresh sees the change again
+            save()
+            state.record_change(run_id, i, change)
+
+        writer.write({"Recipe ID": i, **result}, on_written=on_written)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for batch_start in range(start, end + 1, 10000):
+                batch_end = min(batch_start + 9999, end)
+                ids = list(range(batch_start, batch_end + 1))
+                if id_index is not None:
+                    live_ids = set(id_index.live_ids(batch_start, batch_end))
+                    ids = [i for i in ids if i in live_ids]
+
+                for attempt in range(1, max_attempts + 1):
+                    futures = {executor.submit(refresher.refresh, i): i for i in ids}
+                    ids = []
+                    for future in as_completed(futures):
+                        i = futures[future]
+                        try:
+                            change, result, save = future.result()
+                        except Exception as e:
+                            print(f"Failed ID {i}: {e}")
+                            if attempt == max_attempts:
+                                record(i, FAILED)
+                            else:
+                                ids.append(i)
+                            continue
+                        try:
+                            record(i, change, result, save)
+                        except OutputWriterError:
+                            # The output is down: stop instead of refreshing records that can't be written
+                            for pending in futures:
+                                pending.cancel()
+                            raise
+                    if not ids:
+                        break
+                print(f"Refreshed IDs {batch_start}-{batch_end}, {writer.records_written} changed recipes written")
+
+        # The changes are recorded as their records are written, so flush everything before reporting
+        writer.close()
+        state.finish_run(run_id)
+        return write_change_report(state, run_id, counts, report_file)
+    finally:
+        writer.close()
+        driver_pool.close()
+        state.close()
+        if id_index is not None:
+            id_index.close()
+        close_loggers()
@@ -0,0 +1,155 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import metrics
+
+# HTTP statuses worth retrying: rate limiting and server-side trouble
+TRANSIENT_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+retries_total = metrics.counter('retries_total', "Requests retried after a transient failure, by host", ['host'])
+circuit_opens_total = metrics.counter('circuit_opens_total', "Times a host's circuit breaker opened", ['host'])
+
+
+def host_of(url):
+    return urlsplit(url).hostname or ''
+
+
+def is_transient(page):
+    """True when a FetchResult failed in a way that may succeed if tried again."""
+    return page.error is not None or page.status_code in TRANSIENT_STATUSES
+
+
+# Function to yield "full jitter" exponential backoff delays: uniform in [0, min(cap, base * 2**attempt)]
+def backoff_delays(retries, base=0.5, cap=30.0):
+    for attempt in range(retries):
+        yield random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+# Function to read a Retry-After header given in seconds; HTTP dates are ignored
+def retry_after_seconds(headers):
+    value = (headers or {}).get('Retry-After')
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveTimeouts:
+    """Per-host timeouts learned from observed latency.
+
+    Keeps a smoothed latency and deviation per host, like TCP's retransmission
+    timer, and uses `smoothed + deviation_factor * deviation`, clamped to
+    `[minimum, maximum]`. Hosts without observations get `default`.
+    """
+
+    def __init__(self, default=30.0, minimum=2.0, maximum=60.0, deviation_factor=4.0, alpha=0.125, beta=0.25):
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.deviation_factor = deviation_factor
+        self.alpha = alpha
+        self.beta = beta
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def observe(self, url, seconds):
+        host = host_of(url)
+        with self._lock:
+            estimate = self._hosts.get(host)
+            if estimate is None:
+                self._hosts[host] = [seconds, seconds / 2]
+            else:
+                smoothed, deviation = estimate
+                estimate[1] = (1 - self.beta) * deviation + self.beta * abs(smoothed - seconds)
+                estimate[0] = (1 - self.alpha) * smoothed + self.alpha * seconds
+
+    def timeout_for(self, url):
+        with self._lock:
+            estimate = self._hosts.get(host_of(url))
+        if estimate is None:
+            return self.default
+        smoothed, deviation = estimate
+        return min(max(smoothed + self.deviation_factor * deviation, self.minimum), self.maximum)
+
+    def reset(self):
+        with self._lock:
+            self._hosts.clear()
+
+
+class _Breaker:
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial_in_progress = False
+
+
+class CircuitBreakers:
+    """One circuit breaker per host.
+
+    After `failure_threshold` consecutive transient failures (or any 429 with a
+    Retry-After) the host's circuit opens and requests are refused for
+    `reset_timeout` seconds (or the Retry-After, if longer). Then a single trial
+    request is let through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _breaker(self, host):
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = _Breaker()
+        return breaker
+
+    def wait_time(self, url):
+        """Seconds until a request to the host may be sent, or 0 to send it now.
+
+        A zero return while the circuit is half-open claims the single trial slot,
+        so every 0 must be followed by record_success or record_failure.
+        """
+        with self._lock:
+            breaker = self._breaker(host_of(url))
+            if breaker.failures < self.failure_threshold:
+                return 0.0
+            remaining = breaker.open_until - time.monotonic()
+            if remaining > 0:
+                return remaining
+            if breaker.trial_in_progress:
+                # Someone else is probing the host; check back shortly
+                return min(1.0, self.reset_timeout)
+            breaker.trial_in_progress = True
+            return 0.0
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+
+    def record_success(self, url):
+        with self._lock:
+            breaker = self._breaker(host_of(url))
+            breaker.failures = 0
+            breaker.trial_in_progress = False
+
+    def record_failure(self, url, retry_after=None):
+        host = host_of(url)
+        delay = max(self.reset_timeout, retry_after or 0.0)
+        with self._lock:
+            breaker = self._breaker(host)
+            was_open = breaker.failures >= self.failure_threshold
+            was_trial = breaker.trial_in_progress
+            breaker.failures += 1
+            if retry_after:
+                # The server asked us to back off, so open right away
+                breaker.failures = max(breaker.failures, self.failure_threshold)
+            breaker.trial_in_progress = False
+            is_open = breaker.failures >= self.failure_threshold
+            if is_open:
+                breaker.open_until = max(breaker.open_until, time.monotonic() + delay)
+        if is_open and (not was_open or was_trial):
+            circuit_opens_total.inc(host=host)
+            print(f"Circuit open for {host}, pausing requests for {delay:.0f}s")
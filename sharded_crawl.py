@@ -0,0 +1,112 @@
+import glob
+import os
+import socket
+import threading
+import time
+
+from json_stream import iter_output_records
+from output_writer import JsonlWriter
+from work_queue import DONE, FAILED, LEASED, PENDING
+
+
+# Function to name this worker when no ID is given
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseKeeper:
+    """Renews a lease from a daemon thread every `interval` seconds while a chunk is crawled."""
+
+    def __init__(self, queue, lease, interval):
+        self.queue = queue
+        self.lease = lease
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='lease-keeper', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.queue.heartbeat(self.lease.token):
+                    # The chunk was requeued; finish anyway, duplicates are dropped when shards are merged
+                    print(f"Lost the lease on IDs {self.lease.start}-{self.lease.end}")
+                    return
+            except Exception as e:
+                # The coordinator may be briefly unreachable; the lease is only lost once it expires
+                print(f"Heartbeat failed: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+
+
+# Function to claim and crawl chunks until the queue is empty; returns the number of chunks completed
+def run_worker(queue, crawl_range, worker_id=None, heartbeat_interval=60.0, idle_wait=30.0):
+    """`crawl_range(start, end)` crawls one chunk, e.g. handle_multiple_urls with this node's output prefix.
+
+    When nothing is pending but other workers still hold leases, the worker waits
+    `idle_wait` seconds and tries again, so it can pick up chunks whose leases expire.
+    """
+    worker_id = worker_id or default_worker_id()
+    completed = 0
+    while True:
+        lease = queue.claim(worker_id)
+        if lease is None:
+            if queue.is_finished():
+                break
+            time.sleep(idle_wait)
+            continue
+
+        print(f"Worker {worker_id} claimed IDs {lease.start}-{lease.end}")
+        try:
+            with LeaseKeeper(queue, lease, heartbeat_interval):
+                crawl_range(lease.start, lease.end)
+        except Exception as e:
+            print(f"Chunk {lease.start}-{lease.end} failed: {e}")
+            queue.release(lease.token, e)
+            continue
+        if queue.complete(lease.token):
+            completed += 1
+        else:
+            print(f"IDs {lease.start}-{lease.end} were handed to another worker before finishing")
+
+    print(f"Worker {worker_id} finished, {completed} chunks completed")
+    return completed
+
+
+# Function to list the JSONL output parts in a shard directory, however they are compressed
+def shard_paths(shard_dir):
+    return sorted(path for pattern in ('*.jsonl', '*.jsonl.gz', '*.jsonl.zst')
+                  for path in glob.glob(os.path.join(shard_dir, '**', pattern), recursive=True))
+
+
+# Function to merge per-shard outputs into one, keeping the first record seen for each recipe ID
+def merge_shards(paths, output_file_prefix, rotate_records=10000, compression=None):
+    seen = set()
+    duplicates = 0
+    with JsonlWriter(output_file_prefix, rotate_records=rotate_records, compression=compression) as writer:
+        for record in iter_output_records(paths):
+            recipe_id = record.get("Recipe ID")
+            if recipe_id is not None:
+                if recipe_id in seen:
+                    duplicates += 1
+                    continue
+                seen.add(recipe_id)
+            writer.write(record)
+    print(f"Merged {len(paths)} shard files: {writer.records_written} recipes, {duplicates} duplicates dropped")
+    return writer.records_written
+
+
+# Function to wait for every chunk to finish, printing progress every `interval` seconds
+def wait_for_queue(queue, interval=30.0):
+    while True:
+        summary = queue.summary()
+        print(f"Work queue: {summary.get(DONE, 0)} done, {summary.get(LEASED, 0)} leased, "
+              f"{summary.get(PENDING, 0)} pending, {summary.get(FAILED, 0)} failed")
+        if not summary.get(PENDING) and not summary.get(LEASED):
+            return summary
+        time.sleep(interval)
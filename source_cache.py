@@ -0,0 +1,175 @@
+import copy
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+# Function to normalize a source URL so trivially different links share one cache entry
+def normalize_source_url(url):
+    url = (url or "").strip()
+    if not url:
+        return ""
+    parts = urlsplit(url)
+    # Tracking parameters don't change the page
+    query = urlencode([(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                       if not key.lower().startswith('utm_')])
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ''))
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SourceCache:
+    """Thread-safe LRU cache for source-page extraction results.
+
+    Concurrent callers asking for the same key share a single computation.
+    Entries expire after `ttl` seconds when set, and with `disk_path` they are
+    also kept in SQLite so later runs start warm.
+    """
+
+    def __init__(self, max_entries=10000, ttl=None, disk_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self._conn = None
+        if disk_path:
+            self.use_disk(disk_path)
+
+    def use_disk(self, disk_path):
+        """Keep entries in SQLite at `disk_path` from now on, so this and later runs start warm."""
+        conn = sqlite3.connect(disk_path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS source_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                stored_at REAL NOT NULL
+            )
+        """)
+        conn.commit()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = conn
+
+    def _expired(self, stored_at):
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def _lookup_locked(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            if not self._expired(stored_at):
+                self._entries.move_to_end(key)
+                return True, value
+            del self._entries[key]
+
+        if self._conn is not None:
+            row = self._conn.execute('SELECT value, stored_at FROM source_cache WHERE key = ?', (key,)).fetchone()
+            if row is not None and not self._expired(row[1]):
+                value = json.loads(row[0])
+                self._remember_locked(key, value, row[1])
+                return True, value
+        return False, None
+
+    def _remember_locked(self, key, value, stored_at):
+        self._entries[key] = (value, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return `(found, value)` for a key. Values are copies, safe to modify."""
+        with self._lock:
+            found, value = self._lookup_locked(key)
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found, copy.deepcopy(value)
+
+    def put(self, key, value):
+        stored_at = time.time()
+        with self._lock:
+            self._remember_locked(key, value, stored_at)
+            if self._conn is not None:
+                self._conn.execute('INSERT OR REPLACE INTO source_cache (key, value, stored_at) VALUES (?, ?, ?)',
+                                   (key, json.dumps(value), stored_at))
+                self._conn.commit()
+
+    def discard(self, key):
+        """Forget a key, e.g. because its source page is known to have changed."""
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._conn is not None:
+                self._conn.execute('DELETE FROM source_cache WHERE key = ?', (key,))
+                self._conn.commit()
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for `key`, or run `compute()` once for all concurrent callers.
+
+        `compute` returns `(value, cacheable)`; values from transient failures can be
+        shared with waiting callers without being stored.
+        """
+        with self._lock:
+            found, value = self._lookup_locked(key)
+            if found:
+                self.hits += 1
+                return copy.deepcopy(value)
+            in_flight = self._in_flight.get(key)
+            leader = in_flight is None
+            if leader:
+                in_flight = _InFlight()
+                self._in_flight[key] = in_flight
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if not leader:
+            in_flight.done.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return copy.deepcopy(in_flight.value)
+
+        try:
+            value, cacheable = compute()
+            in_flight.value = value
+            if cacheable:
+                self.put(key, value)
+            return copy.deepcopy(value)
+        except Exception as e:
+            in_flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            in_flight.done.set()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
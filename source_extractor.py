@@ -0,0 +1,364 @@
+import json
+import os
+import re
+import sys
+
+from lxml import html as lxml_html
+
+unicode_fractions = {
+    "\u00bd": "1/2",
+    "\u00bc": "1/4",
+    "\u00be": "3/4",
+    "\u2153": "1/3",
+    "\u2154": "2/3",
+    "\u215b": "1/8",
+    "\u215c": "3/8",
+    "\u215d": "5/8",
+    "\u215e": "7/8"
+}
+
+# Function to build the record returned when the source page has no usable data
+def empty_source_data():
+    return {
+        "Time (from Source)": {
+            "Prep Time (Minutes)": 0,
+            "Cook Time (Minutes)": 0,
+            "Additional Time (Minutes)": 0,
+            "Total Time (Minutes)": 0
+        },
+        "Servings": 0,
+        "Yield": "",
+        "About Recipe": "",
+        "Nutritional Profile (from Source)": {},
+        "Nutritional Profile Detailed (from Source)": {},
+        "Ingredients (from source)": []
+    }
+
+def convert_to_minutes(time_str):
+    """Convert a time string into minutes."""
+    minutes = 0
+    time_parts = re.findall(r'(\d+)\s*(hr|min|hour|minute|hrs|hours|minutes)', time_str.lower())
+    for amount, unit in time_parts:
+        if 'hr' in unit or 'hour' in unit:
+            minutes += int(amount) * 60
+        elif 'min' in unit or 'minute' in unit:
+            minutes += int(amount)
+    return minutes
+
+def convert_to_numeric(servings_str):
+    """Convert servings string to a numeric value."""
+    match = re.search(r'\d+', servings_str)
+    if match:
+        return int(match.group())
+    return 0
+
+# Function to modify the nutritional profile
+def transform_nutritional_profile(nutritional_profile):
+    transformed_profile = {}
+    for key, value in nutritional_profile.items():
+        if key == "Calories":
+            transformed_profile[key] = int(value.replace('g', '').strip())
+        else:
+            new_key = key.replace("Fat", "Fat(g)").replace("Carbs", "Carbs(g)").replace("Protein", "Protein(g)")
+            transformed_profile[new_key] = int(value.replace('g', '').strip())
+    return transformed_profile
+
+def convert_nutritional_profile(nutritional_profile):
+    # Initialize an empty dictionary for the converted profile
+    converted_profile = {}
+
+    # Loop through each key-value pair in the nutritional profile
+    for key, value in nutritional_profile.items():
+        # Split the value to remove the "key\n" part and get the actual value
+        key_base, actual_value = value.split('\n')
+
+        # Separate the numeric part from the unit
+        numeric_value = ''.join([char for char in actual_value if char.isdigit() or char == '.'])
+        unit = ''.join([char for char in actual_value if not char.isdigit() and char != '.'])
+
+        # Create the new key by appending the unit in parentheses to the original key
+        new_key = "{}({})".format(key_base, unit)
+
+        # Convert the numeric value to a float
+        numeric_value = float(numeric_value)
+
+        # Add the new key-value pair to the converted profile
+        converted_profile[new_key] = numeric_value
+
+    # Return the updated dictionary
+    return converted_profile
+
+# Function to apply a parsed "Prep Time:" / "Servings:" style detail to the record
+def apply_recipe_detail(data, label_text, value_text):
+    if label_text == "Prep Time:":
+        data["Time (from Source)"]["Prep Time (Minutes)"] = convert_to_minutes(value_text)
+    elif label_text == "Cook Time:":
+        data["Time (from Source)"]["Cook Time (Minutes)"] = convert_to_minutes(value_text)
+    elif label_text == "Additional Time:":
+        data["Time (from Source)"]["Additional Time (Minutes)"] = convert_to_minutes(value_text)
+    elif label_text == "Total Time:":
+        data["Time (from Source)"]["Total Time (Minutes)"] = convert_to_minutes(value_text)
+    elif label_text == "Servings:":
+        data["Servings"] = convert_to_numeric(value_text)
+    elif label_text == "Yield:":
+        data["Yield"] = value_text
+
+# Function to format one structured ingredient from its quantity, unit and name spans
+def format_ingredient(quantity, unit, name):
+    # Replace Unicode fractions with their textual representation
+    for unicode_char, fraction in unicode_fractions.items():
+        quantity = quantity.replace(unicode_char, fraction)
+    return f"{quantity} {unit} {name}".strip()
+
+# XPath equivalent of a CSS class selector
+def _by_class(class_name):
+    return f".//*[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+
+def _by_id(element_id):
+    return f".//*[@id='{element_id}']"
+
+# Return the first match like WebDriver's find_element, raising when nothing matches
+def _find(element, xpath):
+    matches = element.xpath(xpath)
+    if not matches:
+        raise LookupError(f"Unable to locate element: {xpath}")
+    return matches[0]
+
+def _text_content(element):
+    return element.text_content().strip()
+
+# Function to extract the source data from server-rendered HTML without a browser
+def extract_source_data_from_html(page_html):
+    """Return the source data dict, or None when the required recipe details block is missing."""
+    try:
+        root = lxml_html.fromstring(page_html)
+    except Exception as e:
+        print(f"Error parsing source HTML: {e}")
+        return None
+
+    details_divs = root.xpath(_by_id('mntl-recipe-details_1-0'))
+    content_divs = details_divs[0].xpath(_by_class('mntl-recipe-details__content')) if details_divs else []
+    if not content_divs:
+        return None
+
+    data = {
+        "Time (from Source)": {
+            "Prep Time (Minutes)": 0,
+            "Cook Time (Minutes)": 0,
+            "Additional Time (Minutes)": 0,
+            "Total Time (Minutes)": 0
+        },
+        "Servings": 0,
+        "Yield": "",
+        "About Recipe": ""
+    }
+
+    for item_div in content_divs[0].xpath(_by_class('mntl-recipe-details__item')):
+        try:
+            label_text = _text_content(_find(item_div, _by_class('mntl-recipe-details__label')))
+            value_text = _text_content(_find(item_div, _by_class('mntl-recipe-details__value')))
+            apply_recipe_detail(data, label_text, value_text)
+        except Exception as e:
+            print(f"Error processing item_div: {e}")
+
+    # Extract nutritional information
+    try:
+        nutrition_div = _find(root, _by_id('mntl-nutrition-facts-summary_1-0'))
+        table_body = _find(nutrition_div, _by_class('mntl-nutrition-facts-summary__table-body'))
+
+        nutritional_profile = {}
+        for row in table_body.xpath(_by_class('mntl-nutrition-facts-summary__table-row')):
+            cells = row.xpath('.//td')
+            if len(cells) == 2:
+                key = _text_content(cells[0])
+                value = _text_content(cells[1])
+                if key and value:
+                    nutritional_profile[value] = key  # Swap key and value
+
+        data["Nutritional Profile (from Source)"] = transform_nutritional_profile(nutritional_profile)
+
+        # Extract detailed nutritional information
+        tbody = _find(root, _by_id('mntl-nutrition-facts-label_1-0'))
+        for class_name in ('mntl-nutrition-facts-label__wrapper', 'mntl-nutrition-facts-label__contents',
+                           'mntl-nutrition-facts-label__table', 'mntl-nutrition-facts-label__table-body'):
+            tbody = _find(tbody, _by_class(class_name))
+
+        detailed_nutritional_profile = {}
+        for row in tbody.xpath('.//tr'):
+            td_elements = row.xpath('.//td')
+            if len(td_elements) == 2:
+                span_element = _find(td_elements[0], _by_class('mntl-nutrition-facts-label__nutrient-name'))
+                detailed_nutritional_profile[_text_content(span_element)] = _text_content(td_elements[0])
+
+        data["Nutritional Profile Detailed (from Source)"] = convert_nutritional_profile(detailed_nutritional_profile)
+
+    except Exception as e:
+        print(f"Error extracting nutritional information: {e}")
+        data["Nutritional Profile (from Source)"] = {}
+        data["Nutritional Profile Detailed (from Source)"] = {}
+
+    # Extract ingredient information
+    try:
+        ingredients_div = _find(root, _by_class('mntl-structured-ingredients__list'))
+        ingredients = []
+        for item in ingredients_div.xpath(_by_class('mntl-structured-ingredients__list-item')):
+            spans = [_text_content(span) for span in item.xpath('.//span')]
+            spans += [""] * (3 - len(spans))
+            ingredients.append(format_ingredient(spans[0], spans[1], spans[2]))
+        data["Ingredients (from source)"] = ingredients
+
+    except Exception as e:
+        print(f"Error extracting ingredients information: {e}")
+        data["Ingredients (from source)"] = []
+
+    # Extract the text inside <p> element with class "article-subheading type--dog"
+    about_elements = root.xpath(f"{_by_class('article-subheading')}[contains(concat(' ', normalize-space(@class), ' '), ' type--dog ')]")
+    if about_elements:
+        # Collapse whitespace the way the browser renders it
+        data["About Recipe"] = ' '.join(about_elements[0].text_content().split())
+    else:
+        print("Error extracting about recipe information: element not found")
+        data["About Recipe"] = ""
+
+    return data
+
+# Function to extract the source data from a page already loaded in a WebDriver
+def extract_source_data_from_driver(driver):
+    from selenium.webdriver.common.by import By
+
+    details_div = driver.find_element(By.ID, 'mntl-recipe-details_1-0')
+
+    # Navigate to the required element
+    content_div = details_div.find_element(By.CLASS_NAME, 'mntl-recipe-details__content')
+    items = content_div.find_elements(By.CLASS_NAME, 'mntl-recipe-details__item')
+
+    data = {
+        "Time (from Source)": {
+            "Prep Time (Minutes)": 0,
+            "Cook Time (Minutes)": 0,
+            "Additional Time (Minutes)": 0,
+            "Total Time (Minutes)": 0
+        },
+        "Servings": 0,
+        "Yield": "",
+        "About Recipe": ""
+    }
+
+    for item_div in items:
+        try:
+            label_div = item_div.find_element(By.CLASS_NAME, 'mntl-recipe-details__label')
+            value_div = item_div.find_element(By.CLASS_NAME, 'mntl-recipe-details__value')
+
+            # Use get_attribute('textContent') to capture the text
+            label_text = label_div.get_attribute('textContent').strip()
+            value_text = value_div.get_attribute('textContent').strip()
+            apply_recipe_detail(data, label_text, value_text)
+
+        except Exception as e:
+            print(f"Error processing item_div: {e}")
+
+    # Extract nutritional information
+    try:
+        nutrition_div = driver.find_element(By.ID, 'mntl-nutrition-facts-summary_1-0')
+        table_body = nutrition_div.find_element(By.CLASS_NAME, 'mntl-nutrition-facts-summary__table-body')
+        rows = table_body.find_elements(By.CLASS_NAME, 'mntl-nutrition-facts-summary__table-row')
+
+        nutritional_profile = {}
+        for row in rows:
+            cells = row.find_elements(By.TAG_NAME, 'td')
+            if len(cells) == 2:
+                key = cells[0].get_attribute('textContent').strip()
+                value = cells[1].get_attribute('textContent').strip()
+                if key and value:
+                    nutritional_profile[value] = key  # Swap key and value
+
+        # Transform the nutritional profile
+        data["Nutritional Profile (from Source)"] = transform_nutritional_profile(nutritional_profile)
+
+        # Extract detailed nutritional information
+        detailed_nutrition_div = driver.find_element(By.ID, 'mntl-nutrition-facts-label_1-0')
+        wrapper_div = detailed_nutrition_div.find_element(By.CLASS_NAME, 'mntl-nutrition-facts-label__wrapper')
+        contents_div = wrapper_div.find_element(By.CLASS_NAME, 'mntl-nutrition-facts-label__contents')
+        table = contents_div.find_element(By.CLASS_NAME, 'mntl-nutrition-facts-label__table')
+        tbody = table.find_element(By.CLASS_NAME, 'mntl-nutrition-facts-label__table-body')
+        rows = tbody.find_elements(By.TAG_NAME, 'tr')
+
+        detailed_nutritional_profile = {}
+
+        for row in rows:
+            td_elements = row.find_elements(By.TAG_NAME, 'td')
+            # Extract the text from the <span> element
+            if len(td_elements) == 2:
+                span_element = td_elements[0].find_element(By.CLASS_NAME, 'mntl-nutrition-facts-label__nutrient-name')
+                key = span_element.get_attribute('textContent').strip()
+                detailed_nutritional_profile[key] = td_elements[0].get_attribute('textContent').strip()
+
+        data["Nutritional Profile Detailed (from Source)"] = convert_nutritional_profile(detailed_nutritional_profile)
+
+    except Exception as e:
+        print(f"Error extracting nutritional information: {e}")
+        data["Nutritional Profile (from Source)"] = {}
+        data["Nutritional Profile Detailed (from Source)"] = {}
+
+    # Extract ingredient information
+    try:
+        ingredients_div = driver.find_element(By.CLASS_NAME, 'mntl-structured-ingredients__list')
+        ingredient_items = ingredients_div.find_elements(By.CLASS_NAME, 'mntl-structured-ingredients__list-item')
+
+        ingredients = []
+        for item in ingredient_items:
+            spans = item.find_elements(By.TAG_NAME, 'span')
+            quantity = spans[0].get_attribute('textContent').strip() if len(spans) > 0 else ""
+            unit = spans[1].get_attribute('textContent').strip() if len(spans) > 1 else ""
+            name = spans[2].get_attribute('textContent').strip() if len(spans) > 2 else ""
+            ingredients.append(format_ingredient(quantity, unit, name))
+
+        data["Ingredients (from source)"] = ingredients
+
+    except Exception as e:
+        print(f"Error extracting ingredients information: {e}")
+        data["Ingredients (from source)"] = []
+
+    # Extract the text inside <p> element with class "article-subheading type--dog"
+    try:
+        about_recipe_element = driver.find_element(By.CLASS_NAME, 'article-subheading.type--dog')
+        data["About Recipe"] = about_recipe_element.text.strip()
+    except Exception as e:
+        print(f"Error extracting about recipe information: {e}")
+        data["About Recipe"] = ""
+
+    return data
+
+# Function to compare the static and browser extractors on saved source pages
+def compare_extractors(page_paths, driver):
+    """Return {path: (static_data, browser_data)} for every page where the extractors disagree."""
+    mismatches = {}
+    for path in page_paths:
+        with open(path, 'r', encoding='utf-8') as file:
+            static_data = extract_source_data_from_html(file.read())
+
+        driver.get('file://' + os.path.abspath(path))
+        browser_data = extract_source_data_from_driver(driver)
+
+        if static_data != browser_data:
+            mismatches[path] = (static_data, browser_data)
+    return mismatches
+
+if __name__ == '__main__':
+    # Usage: python source_extractor.py <directory of saved source pages>
+    from driver_pool import create_headless_driver
+
+    pages_dir = sys.argv[1]
+    paths = sorted(os.path.join(pages_dir, name) for name in os.listdir(pages_dir) if name.endswith('.html'))
+    driver = create_headless_driver()
+    try:
+        mismatches = compare_extractors(paths, driver)
+    finally:
+        driver.quit()
+
+    for path, (static_data, browser_data) in mismatches.items():
+        print(f"Mismatch in {path}")
+        print(f"  static:  {json.dumps(static_data)}")
+        print(f"  browser: {json.dumps(browser_data)}")
+    print(f"{len(paths) - len(mismatches)}/{len(paths)} pages match")
+    sys.exit(1 if mismatches else 0)
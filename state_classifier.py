@@ -0,0 +1,154 @@
+import json
+import re
+
+INDIAN_STATES = [
+    "Andhra Pradesh", "Arunachal Pradesh", "Assam", "Bihar", "Chhattisgarh", "Goa", "Gujarat",
+    "Haryana", "Himachal Pradesh", "Jharkhand", "Karnataka", "Kerala", "Madhya Pradesh", "Maharashtra",
+    "Manipur", "Meghalaya", "Mizoram", "Nagaland", "Odisha", "Punjab", "Rajasthan", "Sikkim", "Tamil Nadu",
+    "Telangana", "Tripura", "Uttar Pradesh", "Uttarakhand", "West Bengal", "Andaman and Nicobar Islands",
+    "Chandigarh", "Dadra and Nagar Haveli and Daman and Diu", "Lakshadweep", "Delhi", "Puducherry", "Ladakh", "Jammu and Kashmir"
+]
+
+# Demonyms, old names and regional styles that point at a single state
+STATE_ALIASES = {
+    "gujarati": ["Gujarat"], "punjabi": ["Punjab"], "bengali": ["West Bengal"], "kolkata": ["West Bengal"],
+    "goan": ["Goa"], "keralan": ["Kerala"], "malabar": ["Kerala"], "rajasthani": ["Rajasthan"],
+    "marwari": ["Rajasthan"], "maharashtrian": ["Maharashtra"], "kolhapuri": ["Maharashtra"],
+    "malvani": ["Maharashtra"], "mumbai": ["Maharashtra"], "kashmiri": ["Jammu and Kashmir"],
+    "hyderabadi": ["Telangana"], "chettinad": ["Tamil Nadu"], "tamil": ["Tamil Nadu"],
+    "mangalorean": ["Karnataka"], "udupi": ["Karnataka"], "mysore": ["Karnataka"], "coorg": ["Karnataka"],
+    "andhra": ["Andhra Pradesh"], "awadhi": ["Uttar Pradesh"], "lucknowi": ["Uttar Pradesh"],
+    "bihari": ["Bihar"], "assamese": ["Assam"], "odia": ["Odisha"], "oriya": ["Odisha"], "orissa": ["Odisha"],
+    "sikkimese": ["Sikkim"], "naga": ["Nagaland"], "manipuri": ["Manipur"], "himachali": ["Himachal Pradesh"],
+    "garhwali": ["Uttarakhand"], "kumaoni": ["Uttarakhand"], "pondicherry": ["Puducherry"],
+}
+
+# Dish names that are strongly tied to one or more states; extend with add_dishes()
+DISH_STATES = {
+    "dhokla": ["Gujarat"], "thepla": ["Gujarat"], "khandvi": ["Gujarat"], "undhiyu": ["Gujarat"],
+    "handvo": ["Gujarat"], "fafda": ["Gujarat"],
+    "appam": ["Kerala"], "puttu": ["Kerala"], "avial": ["Kerala"], "aviyal": ["Kerala"],
+    "erissery": ["Kerala"],
+    "vada pav": ["Maharashtra"], "misal pav": ["Maharashtra"], "puran poli": ["Maharashtra"],
+    "pav bhaji": ["Maharashtra"], "sabudana khichdi": ["Maharashtra"], "modak": ["Maharashtra"],
+    "litti chokha": ["Bihar"], "litti": ["Bihar"],
+    "rasgulla": ["West Bengal", "Odisha"], "sandesh": ["West Bengal"], "macher jhol": ["West Bengal"],
+    "shorshe ilish": ["West Bengal"], "mishti doi": ["West Bengal"],
+    "dal baati": ["Rajasthan"], "ghevar": ["Rajasthan"], "gatte": ["Rajasthan"], "laal maas": ["Rajasthan"],
+    "sarson da saag": ["Punjab"], "makki di roti": ["Punjab"], "amritsari": ["Punjab"],
+    "rogan josh": ["Jammu and Kashmir"], "gushtaba": ["Jammu and Kashmir"], "yakhni": ["Jammu and Kashmir"],
+    "pongal": ["Tamil Nadu"], "kothu parotta": ["Tamil Nadu"],
+    "bisi bele bath": ["Karnataka"], "mysore pak": ["Karnataka"], "neer dosa": ["Karnataka"],
+    "ragi mudde": ["Karnataka"],
+    "pesarattu": ["Andhra Pradesh"], "gongura": ["Andhra Pradesh", "Telangana"],
+    "haleem": ["Telangana"], "qubani ka meetha": ["Telangana"],
+    "bebinca": ["Goa"], "xacuti": ["Goa"], "vindaloo": ["Goa"], "cafreal": ["Goa"],
+    "dalma": ["Odisha"], "chhena poda": ["Odisha"],
+    "masor tenga": ["Assam"],
+    "thukpa": ["Sikkim", "Ladakh"], "phagshapa": ["Sikkim"],
+    "galouti kebab": ["Uttar Pradesh"], "petha": ["Uttar Pradesh"],
+    "chole bhature": ["Delhi", "Punjab"],
+    "siddu": ["Himachal Pradesh"], "chha gosht": ["Himachal Pradesh"],
+}
+
+# How much a match counts depending on where it was found
+FIELD_WEIGHTS = {"title": 1.0, "ingredients": 0.4, "instructions": 0.3}
+# Dish names are slightly weaker evidence than an explicit state or demonym
+DISH_FACTOR = 0.9
+
+
+# Function to compile terms into one case-insensitive, word-boundary regular expression
+def compile_terms(terms):
+    # Longest terms first so "west bengal" wins over a shorter overlapping term
+    alternation = '|'.join(r'\s+'.join(re.escape(word) for word in term.split())
+                           for term in sorted(terms, key=len, reverse=True))
+    return re.compile(rf'\b(?:{alternation})\b', re.IGNORECASE)
+
+
+class StateClassifier:
+    """Single-pass, word-boundary matcher that guesses a recipe's state from its text.
+
+    State names, aliases and dish names are compiled into one regular expression;
+    every field is scanned once. `classify` returns the states and a confidence in
+    [0, 1]; only low-confidence recipes need the LLM.
+    """
+
+    def __init__(self, dishes=None, aliases=None):
+        self.terms = {}
+        for state in INDIAN_STATES:
+            self.terms[state.lower()] = (tuple([state]), 1.0)
+        for alias, states in {**STATE_ALIASES, **(aliases or {})}.items():
+            self.terms[alias.lower()] = (tuple(states), 1.0)
+        self.add_dishes({**DISH_STATES, **(dishes or {})})
+
+    def add_dishes(self, dishes):
+        """Add `{dish name: [states]}` entries and recompile the matcher."""
+        for dish, states in dishes.items():
+            self.terms[dish.lower()] = (tuple(states), DISH_FACTOR)
+        self._pattern = compile_terms(self.terms)
+
+    def load_dishes(self, path):
+        """Extend the dish lexicon from a JSON file of `{dish name: [states]}`."""
+        with open(path, 'r') as file:
+            self.add_dishes(json.load(file))
+
+    def find_states(self, text):
+        """Return every state mentioned in the text, in INDIAN_STATES order."""
+        found = set()
+        for match in self._pattern.finditer(text):
+            found.update(self._lookup(match.group(0))[0])
+        return [state for state in INDIAN_STATES if state in found]
+
+    def _lookup(self, matched_text):
+        return self.terms[' '.join(matched_text.lower().split())]
+
+    def classify(self, recipe):
+        """Return `(states, confidence)` for a recipe dict from the scraper output."""
+        scores = {}
+        evidence = 0.0
+        for field, text in recipe_text_fields(recipe).items():
+            # Each distinct term counts once per field so repetition doesn't inflate the score
+            terms = {' '.join(match.group(0).lower().split()) for match in self._pattern.finditer(text)}
+            for term in terms:
+                states, factor = self._lookup(term)
+                weight = FIELD_WEIGHTS[field] * factor
+                evidence += weight
+                # A term naming several states supports each of them, so agreeing terms add up per state
+                for state in states:
+                    scores[state] = scores.get(state, 0.0) + weight
+
+        if not scores:
+            return [], 0.0
+
+        best_score = max(scores.values())
+        best_states = [state for state, score in scores.items() if score >= best_score - 1e-9]
+        # Confidence combines how strong the best evidence is with the share of all evidence supporting it
+        confidence = min(best_score, 1.0) * best_score / evidence
+        return best_states, round(confidence, 3)
+
+
+# Function to collect the searchable text of a recipe, grouped by field
+def recipe_text_fields(recipe):
+    ingredient_names = []
+    ingredients = recipe.get('Ingredients', {})
+    if isinstance(ingredients, dict):
+        ingredient_names += [str(value.get('Ingredient Name', '')) for value in ingredients.values()
+                             if isinstance(value, dict)]
+    ingredient_names += [str(item) for item in recipe.get('Ingredients (from source)', [])]
+
+    instructions = [re.sub(r'<[^>]+>', ' ', str(step)) for step in recipe.get('Instructions', [])]
+
+    return {
+        "title": recipe.get('title', ''),
+        "ingredients": ' | '.join(ingredient_names),
+        "instructions": ' | '.join(instructions),
+    }
+
+
+_state_name_pattern = compile_terms(INDIAN_STATES)
+
+
+def extract_state_names(response):
+    """Extract state names from the response."""
+    found = {' '.join(match.group(0).lower().split()) for match in _state_name_pattern.finditer(response)}
+    return [state for state in INDIAN_STATES if state.lower() in found]
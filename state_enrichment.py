@@ -0,0 +1,183 @@
+import json
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from state_classifier import extract_state_names
+
+# Words that don't change which state a dish comes from: filler, praise, and how or where it was cooked
+TITLE_STOPWORDS = {
+    "a", "an", "and", "the", "with", "of", "in", "on", "for", "my", "your", "how", "to", "make",
+    "recipe", "recipes", "easy", "quick", "simple", "homemade", "home", "best", "style", "special", "classic",
+    "authentic", "traditional", "delicious", "tasty", "perfect", "ultimate", "favourite", "favorite", "famous",
+    "restaurant", "dhaba", "street", "mom", "moms", "grandma", "healthy", "spicy", "mild", "hot", "crispy",
+    "creamy", "rich", "dum", "instant", "pot", "pressure", "cooker", "slow", "one", "pan",
+    "baked", "fried", "grilled", "roasted", "leftover", "party", "festive", "version", "way",
+}
+
+
+def normalize_title(title):
+    """Reduce a recipe title to a cache key so near-duplicate titles share one entry.
+
+    Filler and descriptor words are dropped and word order is ignored, so "Easy Dum
+    Biryani" and "Biryani (restaurant style)" share the key "biryani". Words naming a
+    main ingredient or a place are kept: "Chicken Biryani" and "Hyderabadi Biryani" get
+    their own entries, because those words can change the answer.
+    """
+    words = re.findall(r'[a-z]+', title.lower())
+    return ' '.join(sorted(set(word for word in words if word not in TITLE_STOPWORDS)))
+
+
+class TitleStateCache:
+    """Persistent normalized-title -> states cache backed by SQLite. Thread-safe."""
+
+    def __init__(self, path='state_cache.db'):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS title_states (
+                title_key TEXT PRIMARY KEY,
+                states TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get_many(self, keys):
+        """Return `{key: states}` for the keys that are cached."""
+        found = {}
+        keys = list(keys)
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT title_key, states FROM title_states WHERE title_key IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchall()
+                found.update((key, json.loads(states)) for key, states in rows)
+        return found
+
+    def put_many(self, states_by_key):
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO title_states (title_key, states) VALUES (?, ?)',
+                                   [(key, json.dumps(states)) for key, states in states_by_key.items()])
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class StateEnricher:
+    """Looks up the Indian state(s) for many recipe titles at once.
+
+    Uncached titles are sent `batch_size` at a time in prompts that ask for a JSON
+    answer, with up to `workers` requests in flight. `host` points the client at any
+    Ollama-compatible server, such as a local stand-in. Titles whose lookup fails get
+    None and are not cached, so a later run asks again.
+    """
+
+    def __init__(self, model='llama3', host=None, batch_size=20, workers=4, cache_path='state_cache.db'):
+        # Imported here so the cache and title helpers work without ollama installed
+        import ollama
+
+        self.model = model
+        self.batch_size = batch_size
+        self.workers = workers
+        self.client = ollama.Client(host=host)
+        self.cache = TitleStateCache(cache_path)
+
+        self._lock = threading.Lock()
+        self.llm_calls = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.failures = 0
+        self.eval_tokens = 0
+        self.eval_seconds = 0.0
+
+    def _generate(self, prompt, **options):
+        response = self.client.generate(model=self.model, prompt=prompt, **options)
+        with self._lock:
+            self.llm_calls += 1
+            self.eval_tokens += response.get('eval_count', 0) or 0
+            self.eval_seconds += (response.get('eval_duration', 0) or 0) / 1e9
+        return response['response']
+
+    def _classify_one(self, title):
+        """Return the states for one title, or None if the model couldn't be asked."""
+        prompt = f"Identify the Indian state(s) associated with the recipe titled '{title}'. If it belongs to multiple states, list them all."
+        try:
+            return extract_state_names(self._generate(prompt))
+        except Exception as e:
+            print(f"State lookup failed for '{title}': {e}")
+            with self._lock:
+                self.failures += 1
+            return None
+
+    def _classify_batch(self, titles):
+        """Return `{title: states}` for a batch of titles using one structured prompt."""
+        numbered = '\n'.join(f"{i + 1}. {title}" for i, title in enumerate(titles))
+        prompt = (
+            "For each recipe title below, identify the Indian state(s) it is associated with. "
+            "Reply with only a JSON object whose keys are the numbers of the titles and whose values are "
+            "lists of state names (an empty list if unknown).\n" + numbered
+        )
+        try:
+            answer = json.loads(self._generate(prompt, format='json'))
+        except Exception as e:
+            print(f"Batch prompt failed, falling back to one title at a time: {e}")
+            answer = {}
+
+        states_by_title = {}
+        for i, title in enumerate(titles):
+            value = answer.get(str(i + 1)) if isinstance(answer, dict) else None
+            if isinstance(value, list):
+                # Keep only real state names, spelled the way INDIAN_STATES spells them
+                states_by_title[title] = extract_state_names(' | '.join(str(item) for item in value))
+            else:
+                states_by_title[title] = self._classify_one(title)
+        return states_by_title
+
+    def enrich(self, titles):
+        """Return `{title: states}` for every title, consulting the cache before the model.
+
+        States are None for titles whose lookup failed.
+        """
+        keys_by_title = {title: normalize_title(title) for title in titles}
+        cached = self.cache.get_many(set(keys_by_title.values()))
+
+        # One representative title per uncached key
+        pending = {}
+        for title, key in keys_by_title.items():
+            if key not in cached and key not in pending:
+                pending[key] = title
+        with self._lock:
+            self.cache_hits += len(keys_by_title) - len(pending)
+            self.cache_misses += len(pending)
+
+        representatives = list(pending.values())
+        batches = [representatives[i:i + self.batch_size] for i in range(0, len(representatives), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for states_by_title in executor.map(self._classify_batch, batches):
+                new_entries = {keys_by_title[title]: states for title, states in states_by_title.items()
+                               if states is not None}
+                self.cache.put_many(new_entries)
+                cached.update(new_entries)
+
+        return {title: cached.get(key) for title, key in keys_by_title.items()}
+
+    def stats(self):
+        with self._lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                "llm_calls": self.llm_calls,
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "cache_hit_rate": self.cache_hits / lookups if lookups else 0.0,
+                "failures": self.failures,
+                "eval_tokens": self.eval_tokens,
+                "tokens_per_second": self.eval_tokens / self.eval_seconds if self.eval_seconds else 0.0,
+            }
+
+    def close(self):
+        self.cache.close()
@@ -0,0 +1,47 @@
+from fixture_server import render_recipe_page
+from recipe_parsers import parse_recipe_details, parse_recipe_tables
+
+# The ingredient table cases pandas.read_html handled: mixed columns stay text, numeric columns with gaps
+# become floats, thousands separators are dropped and empty cells are left out
+TABLES_PAGE = """<html><body>
+<table><thead><tr><th>Nutrient</th><th>Quantity</th></tr></thead><tbody>
+  <tr><td>Protein (g)</td><td>1,234.5</td></tr>
+  <tr><td>Energy (kCal)</td><td>310</td></tr>
+</tbody></table>
+<table>
+  <tr><th>Ingredient Name</th><th>Quantity</th><th>Unit</th><th>State</th><th>Energy (kcal)</th></tr>
+  <tr><td>
+      salt  and pepper</td><td>1/2</td><td>tsp</td><td></td><td>3</td></tr>
+  <tr><td>onion</td><td>2</td><td>NA</td><td>chopped</td><td></td></tr>
+  <tr><td>rice</td><td>1.5</td><td>cup</td><td>raw</td><td>1,200</td></tr>
+</table>
+</body></html>"""
+
+
+def test_parse_recipe_tables_converts_cells_like_pandas():
+    nutrients, ingredients = parse_recipe_tables(TABLES_PAGE)
+
+    assert nutrients == {"Protein (g)": 1234.5, "Energy (kCal)": 310.0}
+    assert ingredients == {
+        0: {"index": 0, "Ingredient Name": "salt and pepper", "Quantity": "1/2", "Unit": "tsp",
+            "Energy (kcal)": 3.0},
+        1: {"index": 1, "Ingredient Name": "onion", "Quantity": "2", "State": "chopped"},
+        2: {"index": 2, "Ingredient Name": "rice", "Quantity": "1.5", "Unit": "cup", "State": "raw",
+            "Energy (kcal)": 1200.0},
+    }
+
+
+def test_parse_recipe_details_reads_the_post_click_dom():
+    page = render_recipe_page(7, "/source/7").replace(
+        '<div id="more"></div>',
+        '<div id="more"><div class="bigRows">Calcium (mg) 12.5</div><div class="bigRows">Iron (mg) 1.0</div></div>')
+
+    details = parse_recipe_details(page, "http://recipedb.test/recipedb/search_recipeInfo/7")
+
+    assert details["title"] == "Fixture Recipe 7"
+    assert details["Cuisine Origin"] == "Cuisine\nAsian >> Indian Subcontinent >> Indian"
+    assert details["Dietary Details"] == "Vegetarian"
+    assert details["Preparation Time"].startswith("Preparation Time\nCooking Time - ")
+    assert details["Source Info"] == "http://recipedb.test/source/7"
+    assert details["details"] == ["Calcium (mg) 12.5", "Iron (mg) 1.0"]
+    assert details["Instructions"][0] == "1. Cook the onion until done."
@@ -0,0 +1,136 @@
+import re
+
+import pytest
+
+from fixture_server import FixtureServer, SOURCE_PATH, render_source_page
+from source_extractor import compare_extractors, extract_source_data_from_html
+
+# A trimmed source page in the layout the extractors expect, with the awkward cases they handle
+SOURCE_PAGE = """<!DOCTYPE html>
+<html><body>
+<p class="article-subheading type--dog">
+  A weeknight   dal,
+  ready in an hour.</p>
+<div id="mntl-recipe-details_1-0"><div class="mntl-recipe-details__content">
+  <div class="mntl-recipe-details__item"><div class="mntl-recipe-details__label">Prep Time:</div>
+    <div class="mntl-recipe-details__value"> 15 mins </div></div>
+  <div class="mntl-recipe-details__item"><div class="mntl-recipe-details__label">Cook Time:</div>
+    <div class="mntl-recipe-details__value">40 mins</div></div>
+  <div class="mntl-recipe-details__item"><div class="mntl-recipe-details__label">Additional Time:</div>
+    <div class="mntl-recipe-details__value">2 hrs</div></div>
+  <div class="mntl-recipe-details__item"><div class="mntl-recipe-details__label">Total Time:</div>
+    <div class="mntl-recipe-details__value">2 hrs 55 mins</div></div>
+  <div class="mntl-recipe-details__item"><div class="mntl-recipe-details__label">Servings:</div>
+    <div class="mntl-recipe-details__value">4 to 6</div></div>
+  <div class="mntl-recipe-details__item"><div class="mntl-recipe-details__label">Yield:</div>
+    <div class="mntl-recipe-details__value">6 cups</div></div>
+</div></div>
+<div id="mntl-nutrition-facts-summary_1-0"><table><tbody class="mntl-nutrition-facts-summary__table-body">
+  <tr class="mntl-nutrition-facts-summary__table-row"><td>310</td><td>Calories</td></tr>
+  <tr class="mntl-nutrition-facts-summary__table-row"><td>9g</td><td>Fat</td></tr>
+  <tr class="mntl-nutrition-facts-summary__table-row"><td>42g</td><td>Carbs</td></tr>
+  <tr class="mntl-nutrition-facts-summary__table-row"><td>16g</td><td>Protein</td></tr>
+</tbody></table></div>
+<div id="mntl-nutrition-facts-label_1-0"><div class="mntl-nutrition-facts-label__wrapper">
+<div class="mntl-nutrition-facts-label__contents"><table class="mntl-nutrition-facts-label__table">
+<tbody class="mntl-nutrition-facts-label__table-body">
+  <tr><td colspan="2">Amount per serving</td></tr>
+  <tr><td><span class="mntl-nutrition-facts-label__nutrient-name">Sodium</span>
+612mg</td><td>27%</td></tr>
+  <tr><td><span class="mntl-nutrition-facts-label__nutrient-name">Dietary Fiber</span>
+11.5g</td><td>41%</td></tr>
+</tbody></table></div></div></div>
+<ul class="mntl-structured-ingredients__list">
+  <li class="mntl-structured-ingredients__list-item"><p><span>1 ½</span> <span>cups</span> <span>toor dal</span></p></li>
+  <li class="mntl-structured-ingredients__list-item"><p><span>¼</span> <span>teaspoon</span> <span>turmeric</span></p></li>
+  <li class="mntl-structured-ingredients__list-item"><p><span>salt, to taste</span></p></li>
+</ul>
+</body></html>"""
+
+EXPECTED = {
+    "Time (from Source)": {
+        "Prep Time (Minutes)": 15,
+        "Cook Time (Minutes)": 40,
+        "Additional Time (Minutes)": 120,
+        "Total Time (Minutes)": 175,
+    },
+    "Servings": 4,
+    "Yield": "6 cups",
+    "About Recipe": "A weeknight dal, ready in an hour.",
+    "Nutritional Profile (from Source)": {"Calories": 310, "Fat(g)": 9, "Carbs(g)": 42, "Protein(g)": 16},
+    "Nutritional Profile Detailed (from Source)": {"Sodium(mg)": 612.0, "Dietary Fiber(g)": 11.5},
+    "Ingredients (from source)": ["1 1/2 cups toor dal", "1/4 teaspoon turmeric", "salt, to taste"],
+}
+
+
+def test_static_extractor_matches_expected_output():
+    assert extract_source_data_from_html(SOURCE_PAGE) == EXPECTED
+
+
+def test_missing_details_block_asks_for_the_browser():
+    page = re.sub(r'<div id="mntl-recipe-details_1-0">.*?</div></div>', '', SOURCE_PAGE, flags=re.DOTALL)
+    assert extract_source_data_from_html(page) is None
+
+
+def test_missing_optional_blocks_leave_them_empty():
+    page = re.sub(r'<ul class="mntl-structured-ingredients__list">.*?</ul>', '', SOURCE_PAGE, flags=re.DOTALL)
+    page = page.replace('id="mntl-nutrition-facts-summary_1-0"', 'id="elsewhere"')
+    data = extract_source_data_from_html(page)
+    assert data["Ingredients (from source)"] == []
+    assert data["Nutritional Profile (from Source)"] == {}
+    assert data["Nutritional Profile Detailed (from Source)"] == {}
+    assert data["Time (from Source)"] == EXPECTED["Time (from Source)"]
+
+
+@pytest.mark.parametrize('recipe_id', [1, 7, 42, 1234])
+def test_fixture_source_pages(recipe_id):
+    page = render_source_page(recipe_id)
+    data = extract_source_data_from_html(page)
+
+    # Expected values read straight off the generated markup
+    details = dict(re.findall(r'details__label">([^<]+)</div><div class="mntl-recipe-details__value">([^<]+)<',
+                              page))
+    hours, minutes = map(int, re.match(r'(\d+) hr (\d+) mins', details["Total Time:"]).groups())
+    assert data["Time (from Source)"] == {
+        "Prep Time (Minutes)": int(details["Prep Time:"].split()[0]),
+        "Cook Time (Minutes)": int(details["Cook Time:"].split()[0]),
+        "Additional Time (Minutes)": 0,
+        "Total Time (Minutes)": hours * 60 + minutes,
+    }
+    assert data["Servings"] == int(details["Servings:"])
+    assert data["Yield"] == details["Yield:"]
+    assert data["About Recipe"] == f"A fixture source page for recipe {recipe_id}."
+    assert list(data["Nutritional Profile (from Source)"]) == ["Calories", "Fat(g)", "Carbs(g)", "Protein(g)"]
+    assert list(data["Nutritional Profile Detailed (from Source)"]) == [
+        "Cholesterol(mg)", "Sodium(mg)", "Potassium(mg)", "Calcium(mg)", "Iron(mg)"]
+    ingredients = re.findall(r'<p><span>(\d+)</span> <span>(\w+)</span> <span>([^<]+)</span></p>', page)
+    assert data["Ingredients (from source)"] == [' '.join(parts) for parts in ingredients]
+
+
+def test_source_stage_uses_the_static_extractor(tmp_path):
+    from recipeDbParser_v0 import fetch_and_extract_source
+
+    with FixtureServer() as server:
+        data, cacheable = fetch_and_extract_source(f'{server.url}{SOURCE_PATH}7', str(tmp_path / 'source_log.csv'))
+    assert cacheable
+    assert data == extract_source_data_from_html(render_source_page(7))
+
+
+def test_static_and_browser_extractors_agree(tmp_path):
+    pytest.importorskip('selenium')
+    from driver_pool import create_headless_driver
+
+    try:
+        driver = create_headless_driver()
+    except Exception as e:
+        pytest.skip(f"No headless browser available: {e}")
+
+    paths = []
+    for name, page in [('hand_written', SOURCE_PAGE)] + [(f'fixture_{i}', render_source_page(i)) for i in (1, 7, 42)]:
+        path = tmp_path / f'{name}.html'
+        path.write_text(page, encoding='utf-8')
+        paths.append(str(path))
+    try:
+        assert compare_extractors(paths, driver) == {}
+    finally:
+        driver.quit()
@@ -0,0 +1,20 @@
+from state_classifier import StateClassifier
+
+
+def test_agreeing_terms_add_up_per_state():
+    # "punjabi" names Punjab and "chole bhature" names Delhi and Punjab: both support Punjab
+    assert StateClassifier().classify({"title": "Punjabi Chole Bhature"}) == (["Punjab"], 1.0)
+
+
+def test_ambiguous_dish_keeps_every_state():
+    states, confidence = StateClassifier().classify({"title": "Chole Bhature"})
+
+    assert sorted(states) == ["Delhi", "Punjab"]
+    assert confidence == 0.9
+
+
+def test_conflicting_terms_lower_the_confidence():
+    states, confidence = StateClassifier().classify({"title": "Punjabi Dhokla"})
+
+    assert states == ["Punjab"]
+    assert confidence < 0.8
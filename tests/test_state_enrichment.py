@@ -0,0 +1,161 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from state_enrichment import StateEnricher, normalize_title
+
+DISH_STATES = {
+    "biryani": ["Telangana"],
+    "dhokla": ["Gujarat"],
+    "thepla": ["Gujarat"],
+    "appam": ["Kerala"],
+    "litti": ["Bihar"],
+}
+
+
+class FakeOllamaServer:
+    """Local HTTP stand-in for an Ollama server's /api/generate, answering from DISH_STATES.
+
+    Records every prompt. `broken_batches` makes multi-title prompts return invalid
+    JSON, and titles in `failing_titles` make single-title prompts fail with HTTP 500.
+    """
+
+    def __init__(self, broken_batches=False, failing_titles=()):
+        self.broken_batches = broken_batches
+        self.failing_titles = set(failing_titles)
+        self.batch_prompts = []
+        self.single_prompts = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @staticmethod
+    def _states(title):
+        return next((states for dish, states in DISH_STATES.items() if dish in title.lower()), [])
+
+    def _respond(self, request):
+        """Return `(status, body)` for a decoded /api/generate request."""
+        prompt = request["prompt"]
+        if request.get("format") == 'json':
+            with self._lock:
+                self.batch_prompts.append(prompt)
+            titles = re.findall(r'^(\d+)\. (.+)$', prompt, re.MULTILINE)
+            answer = "not json" if self.broken_batches else json.dumps(
+                {number: self._states(title) for number, title in titles})
+        else:
+            title = re.search(r"titled '(.+)'", prompt).group(1)
+            with self._lock:
+                self.single_prompts.append(title)
+            if title in self.failing_titles:
+                return 500, {"error": "model runner has unexpectedly stopped"}
+            answer = ', '.join(self._states(title)) or "Unknown"
+        return 200, {"model": request["model"], "response": answer, "done": True,
+                     "eval_count": 10, "eval_duration": 1_000_000}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                status, body = server._respond(request) if self.path == '/api/generate' else (404, {})
+                body = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05}, name='fake-ollama',
+                         daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'state_cache.db')
+
+
+def test_normalize_title_drops_descriptors_but_keeps_ingredients():
+    assert normalize_title("Easy Dum Biryani") == normalize_title("Biryani (Restaurant Style)") == "biryani"
+    assert normalize_title("Chicken Biryani") != normalize_title("Biryani")
+
+
+def test_titles_are_batched(cache_path):
+    with FakeOllamaServer() as server:
+        enricher = StateEnricher(host=server.url, batch_size=20, workers=2, cache_path=cache_path)
+        # Distinct words, so no two titles share a cache key
+        titles = [f"Dhokla {chr(ord('a') + i // 26)}{chr(ord('a') + i % 26)}" for i in range(45)]
+
+        states = enricher.enrich(titles)
+
+    assert all(value == ["Gujarat"] for value in states.values())
+    assert len(server.batch_prompts) == 3
+    assert server.single_prompts == []
+    assert enricher.stats()["llm_calls"] == 3
+    enricher.close()
+
+
+def test_near_duplicate_titles_reach_the_model_once(cache_path):
+    with FakeOllamaServer() as server:
+        enricher = StateEnricher(host=server.url, cache_path=cache_path)
+        states = enricher.enrich(["Easy Dum Biryani", "Biryani (Restaurant Style)", "Best Biryani Recipe"])
+        enricher.close()
+
+    assert set(map(tuple, states.values())) == {("Telangana",)}
+    assert enricher.stats()["cache_misses"] == 1
+
+    # A new run over the same cache doesn't ask again
+    with FakeOllamaServer() as server:
+        enricher = StateEnricher(host=server.url, cache_path=cache_path)
+        assert enricher.enrich(["Homemade Biryani"]) == {"Homemade Biryani": ["Telangana"]}
+    assert server.batch_prompts == [] and server.single_prompts == []
+    assert enricher.stats()["cache_hit_rate"] == 1.0
+    enricher.close()
+
+
+def test_failed_titles_fall_back_and_are_left_unset(cache_path):
+    with FakeOllamaServer(broken_batches=True, failing_titles={"Appam"}) as server:
+        enricher = StateEnricher(host=server.url, cache_path=cache_path)
+        states = enricher.enrich(["Thepla", "Appam", "Litti Chokha"])
+
+    assert states == {"Thepla": ["Gujarat"], "Appam": None, "Litti Chokha": ["Bihar"]}
+    assert sorted(server.single_prompts) == ["Appam", "Litti Chokha", "Thepla"]
+    assert enricher.stats()["failures"] == 1
+    enricher.close()
+
+    # The failed title wasn't cached, so the next run asks for it again
+    with FakeOllamaServer() as server:
+        enricher = StateEnricher(host=server.url, cache_path=cache_path)
+        assert enricher.enrich(["Appam", "Thepla"]) == {"Appam": ["Kerala"], "Thepla": ["Gujarat"]}
+    assert len(server.batch_prompts) == 1 and "Thepla" not in server.batch_prompts[0]
+    enricher.close()
+
+
+def test_unreachable_host_leaves_titles_unset(cache_path):
+    with FakeOllamaServer() as server:
+        host = server.url
+    # The stand-in is shut down, so every request is refused
+
+    enricher = StateEnricher(host=host, cache_path=cache_path)
+    assert enricher.enrich(["Thepla", "Appam"]) == {"Thepla": None, "Appam": None}
+    assert enricher.stats()["failures"] == 2
+    enricher.close()
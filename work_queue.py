@@ -0,0 +1,224 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+# A claimed chunk of recipe IDs [start, end]; `token` identifies this particular lease
+Lease = namedtuple('Lease', ['start', 'end', 'token'])
+
+
+class WorkQueue:
+    """Queue of recipe ID chunks with leases, backed by SQLite.
+
+    Workers `claim` a chunk, renew it with `heartbeat` while crawling and finish
+    with `complete` or `release`. A lease that isn't renewed within
+    `lease_seconds` expires and its chunk goes back to the queue, so a crashed
+    worker's chunk is picked up by another one. Chunks that fail `max_attempts`
+    times are parked as failed. Safe to share between threads and processes on
+    one machine; other machines reach it through `serve_queue`.
+    """
+
+    def __init__(self, path='work_queue.db', lease_seconds=300.0, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # Autocommit mode, so claims can take the write lock up front with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_start INTEGER PRIMARY KEY,
+                chunk_end INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                worker TEXT,
+                token TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+
+    def add_range(self, start, end, chunk_size=1000):
+        """Queue [start, end] in chunks of `chunk_size` IDs. Chunks already queued are left alone."""
+        now = time.time()
+        rows = [(i, min(i + chunk_size - 1, end), PENDING, now) for i in range(start, end + 1, chunk_size)]
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.executemany(
+                    'INSERT OR IGNORE INTO chunks (chunk_start, chunk_end, status, updated_at) VALUES (?, ?, ?, ?)',
+                    rows)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return len(rows)
+
+    def _expire_leases_locked(self, now):
+        self._conn.execute("""
+            UPDATE chunks SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END,
+                              last_error = 'lease expired', worker = NULL, token = NULL, updated_at = ?
+            WHERE status = ? AND lease_expires < ?
+        """, (self.max_attempts, FAILED, PENDING, now, LEASED, now))
+
+    def claim(self, worker):
+        """Lease the next pending chunk to `worker`, or return None when nothing is left to claim."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._expire_leases_locked(now)
+                row = self._conn.execute(
+                    'SELECT chunk_start, chunk_end FROM chunks WHERE status = ? ORDER BY attempts, chunk_start '
+                    'LIMIT 1', (PENDING,)).fetchone()
+                lease = None
+                if row is not None:
+                    lease = Lease(row[0], row[1], uuid.uuid4().hex)
+                    self._conn.execute("""
+                        UPDATE chunks SET status = ?, worker = ?, token = ?, lease_expires = ?,
+                                          attempts = attempts + 1, updated_at = ?
+                        WHERE chunk_start = ?
+                    """, (LEASED, worker, lease.token, now + self.lease_seconds, now, lease.start))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return lease
+
+    def _update_lease(self, token, sql, params):
+        with self._lock:
+            cursor = self._conn.execute(sql + ' WHERE token = ? AND status = ?', params + (token, LEASED))
+        return cursor.rowcount == 1
+
+    def heartbeat(self, token):
+        """Extend a lease. Returns False if it has expired and the chunk may be with another worker."""
+        now = time.time()
+        return self._update_lease(token, 'UPDATE chunks SET lease_expires = ?, updated_at = ?',
+                                  (now + self.lease_seconds, now))
+
+    def complete(self, token):
+        """Mark a leased chunk done. Returns False if the lease was lost first."""
+        return self._update_lease(token, 'UPDATE chunks SET status = ?, token = NULL, updated_at = ?',
+                                  (DONE, time.time()))
+
+    def release(self, token, error=None):
+        """Give a chunk back after a failure; it is retried until it runs out of attempts."""
+        return self._update_lease(token, """
+            UPDATE chunks SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END,
+                              worker = NULL, token = NULL, last_error = ?, updated_at = ?
+        """, (self.max_attempts, FAILED, PENDING, None if error is None else str(error), time.time()))
+
+    def summary(self):
+        """Return the number of chunks in each status, after requeueing expired leases."""
+        with self._lock:
+            self._expire_leases_locked(time.time())
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM chunks GROUP BY status').fetchall()
+        return dict(rows)
+
+    def is_finished(self):
+        summary = self.summary()
+        return not summary.get(PENDING) and not summary.get(LEASED)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Function to serve a queue over HTTP so workers on other machines can use it
+def serve_queue(queue, port, host='0.0.0.0'):
+    """Serve `queue` from a daemon thread and return the server.
+
+    Every call is a POST to `/<method>` with a JSON object of arguments, answered
+    with `{"result": ...}`; see RemoteWorkQueue for the client side.
+    """
+    methods = {
+        'claim': lambda args: queue.claim(args['worker']),
+        'heartbeat': lambda args: queue.heartbeat(args['token']),
+        'complete': lambda args: queue.complete(args['token']),
+        'release': lambda args: queue.release(args['token'], args.get('error')),
+        'summary': lambda args: queue.summary(),
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            method = methods.get(self.path.strip('/'))
+            if method is None:
+                self.send_error(404)
+                return
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                args = json.loads(self.rfile.read(length) or b'{}')
+                body = json.dumps({"result": method(args)}).encode('utf-8')
+            except Exception as e:
+                self.send_error(400, str(e))
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='work-queue-server', daemon=True).start()
+    print(f"Serving work queue at http://{host}:{server.server_address[1]}")
+    return server
+
+
+class RemoteWorkQueue:
+    """Client for a queue served by `serve_queue`, with the same methods as WorkQueue."""
+
+    def __init__(self, url, timeout=30):
+        import requests
+
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def _call(self, method, **args):
+        response = self._session.post(f'{self.url}/{method}', json=args, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["result"]
+
+    def claim(self, worker):
+        result = self._call('claim', worker=worker)
+        return Lease(*result) if result else None
+
+    def heartbeat(self, token):
+        return self._call('heartbeat', token=token)
+
+    def complete(self, token):
+        return self._call('complete', token=token)
+
+    def release(self, token, error=None):
+        return self._call('release', token=token, error=None if error is None else str(error))
+
+    def summary(self):
+        return self._call('summary')
+
+    def is_finished(self):
+        summary = self.summary()
+        return not summary.get(PENDING) and not summary.get(LEASED)
+
+    def close(self):
+        self._session.close()
+
+
+# Function to open a queue from an http(s) URL or a SQLite path
+def open_queue(location, lease_seconds=300.0):
+    if location.startswith(('http://', 'https://')):
+        return RemoteWorkQueue(location)
+    return WorkQueue(location, lease_seconds=lease_seconds)